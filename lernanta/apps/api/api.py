@@ -11,7 +11,8 @@ class UserProfileResource(ModelResource):
     class Meta:
         queryset = UserProfile.objects.all()
         fields = ['username', 'bio', 'gravatar', 'following', 'followers',
-            'skills']
+            'skills', 'followers_count', 'following_count']
+        ordering = ['followers_count', 'following_count', 'username']
         resource_name = 'users'
         
     def dehydrate(self, bundle):
@@ -0,0 +1,79 @@
+"""
+In-process copy of the badge prerequisite graph.
+
+The graph is loaded once per process and loaded again when the version
+stored in the shared cache changes, which happens every time the
+prerequisites of a badge are modified or a badge is deleted (see the
+signals in badges.models).
+"""
+import time
+import threading
+
+from django.core.cache import cache
+
+from badges.models import Badge
+
+
+VERSION_CACHE_KEY = 'badges_prerequisite_graph_version'
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class PrerequisiteGraph(object):
+    """Direct badge prerequisites by badge id."""
+
+    def __init__(self, edges):
+        self.direct = {}
+        for badge_id, prerequisite_id in edges:
+            self.direct.setdefault(badge_id, set()).add(prerequisite_id)
+
+    def get_prerequisites(self, badge_id):
+        """Direct prerequisites of the badge."""
+        return frozenset(self.direct.get(badge_id, ()))
+
+    def get_missing(self, badge_id, awarded_ids):
+        """The direct prerequisites which are not among ``awarded_ids``."""
+        return set(self.direct.get(badge_id, ())).difference(awarded_ids)
+
+    def is_eligible(self, badge_id, awarded_ids):
+        """All the direct prerequisites are among ``awarded_ids``."""
+        return self.direct.get(badge_id, set()).issubset(awarded_ids)
+
+    def get_eligible(self, badge_ids, awarded_ids):
+        """The ids among ``badge_ids`` the user is eligible for."""
+        awarded_ids = set(awarded_ids)
+        return [badge_id for badge_id in badge_ids
+            if self.is_eligible(badge_id, awarded_ids)]
+
+
+_lock = threading.Lock()
+_graph = None
+_version = None
+
+
+def load_graph():
+    edges = Badge.prerequisites.through.objects.values_list(
+        'from_badge_id', 'to_badge_id')
+    return PrerequisiteGraph(edges)
+
+
+def get_graph():
+    """Return the current prerequisite graph."""
+    global _graph, _version
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = str(time.time())
+        cache.add(VERSION_CACHE_KEY, version, VERSION_TIMEOUT)
+        version = cache.get(VERSION_CACHE_KEY, version)
+    with _lock:
+        if _graph is None or _version != version:
+            _graph = load_graph()
+            _version = version
+        return _graph
+
+
+def invalidate_graph():
+    """Make every process load the graph again on next use."""
+    global _graph
+    cache.set(VERSION_CACHE_KEY, str(time.time()), VERSION_TIMEOUT)
+    with _lock:
+        _graph = None
@@ -5,11 +5,12 @@ from django.conf import settings
 from django.db.models import Avg, Q
 from django.utils.translation import ugettext_lazy as _
 from django.template.defaultfilters import slugify
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.contrib.sites.models import Site
 
 from drumbeat import storage
 from drumbeat.utils import get_partition_id, safe_filename, MultiQuerySet
+from drumbeat.utils import save_with_unique_slug
 from drumbeat.models import ModelBase
 from richtext.models import RichTextField
 from notifications.models import send_notifications
@@ -87,27 +88,21 @@ class Badge(ModelBase):
 
     def save(self):
         """Make sure each badge has a unique slug."""
-        count = 1
         if not self.slug:
-            slug = slugify(self.name)
-            self.slug = slug
-            while True:
-                existing = Badge.objects.filter(slug=self.slug)
-                if len(existing) == 0:
-                    break
-                self.slug = "%s-%s" % (slug, count + 1)
-                count += 1
-        super(Badge, self).save()
+            save_with_unique_slug(self, slugify(self.name),
+                super(Badge, self).save)
+        else:
+            super(Badge, self).save()
 
     def is_eligible(self, user):
         """Check if the user eligible for the badge.
 
         If some prerequisite badges have not been
         awarded returns False."""
+        from badges.graph import get_graph
         awarded_badges = Award.objects.filter(
-            user=user).values('badge_id')
-        return not self.prerequisites.exclude(
-            id__in=awarded_badges).exists()
+            user=user).values_list('badge_id', flat=True)
+        return get_graph().is_eligible(self.id, awarded_badges)
 
     def is_awarded_to(self, user):
         """Does the user have the badge?"""
@@ -456,3 +451,13 @@ def post_submission_save(sender, **kwargs):
 
 post_save.connect(post_submission_save, sender=Submission,
     dispatch_uid='badges_post_submission_save')
+
+
+def prerequisites_changed(sender, **kwargs):
+    from badges.graph import invalidate_graph
+    invalidate_graph()
+
+m2m_changed.connect(prerequisites_changed, sender=Badge.prerequisites.through,
+    dispatch_uid='badges_prerequisites_changed')
+post_delete.connect(prerequisites_changed, sender=Badge,
+    dispatch_uid='badges_badge_deleted')
@@ -0,0 +1,137 @@
+"""
+Evaluation of the state of many badges for one user with a fixed number
+of queries: the awards and submissions of the user are loaded once and the
+badges are then classified in memory, using the cached prerequisite graph.
+"""
+from badges.models import Badge, Award, Submission, Logic
+from badges.graph import get_graph
+
+
+class ProjectBadgeState(object):
+    """Badges of a project classified for a user."""
+
+    def __init__(self, awarded=(), upon_completion=(), in_progress=(),
+            non_attempted=()):
+        # Awarded project badges, excluding the completion badges.
+        self.awarded = list(awarded)
+        # Completion badges the user gets when completing all the tasks.
+        self.upon_completion = list(upon_completion)
+        # Badges with a submission pending of review.
+        self.in_progress = list(in_progress)
+        # Badges accepting submissions the user has not applied for.
+        self.non_attempted = list(non_attempted)
+
+    def get_awarded_with_completion(self):
+        """
+        Awarded badges plus the completion ones, so they can be shown
+        before the signal that awards the completion badges has run.
+        """
+        badges = dict((badge.id, badge) for badge in self.awarded)
+        for badge in self.upon_completion:
+            badges.setdefault(badge.id, badge)
+        return [badges[badge_id] for badge_id in sorted(badges)]
+
+
+class BadgeStateEvaluator(object):
+    """
+    Awards, submissions and eligibility of ``profile``. ``profile`` can be
+    None for anonymous users, who have no awards nor submissions.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.awards = {}
+        self.submissions = {}
+        self.pending_ids = set()
+        self.graph = get_graph()
+        if profile is None:
+            return
+        awards = Award.objects.filter(user=profile).select_related(
+            'badge').order_by('id')
+        for award in awards:
+            award.user = profile
+            self.awards.setdefault(award.badge_id, award)
+        submissions = Submission.objects.filter(author=profile).select_related(
+            'badge').order_by('id')
+        for submission in submissions:
+            submission.author = profile
+            self.submissions.setdefault(submission.badge_id, submission)
+            if submission.pending:
+                self.pending_ids.add(submission.badge_id)
+
+    @classmethod
+    def for_user(cls, user):
+        """Evaluator for a django user, anonymous or not."""
+        if user.is_authenticated():
+            return cls(user.get_profile())
+        return cls(None)
+
+    def get_award(self, badge):
+        return self.awards.get(badge.id, None)
+
+    def get_submission(self, badge):
+        return self.submissions.get(badge.id, None)
+
+    def is_awarded(self, badge):
+        return badge.id in self.awards
+
+    def has_applied(self, badge):
+        return badge.id in self.submissions
+
+    def is_eligible(self, badge, also_awarded=()):
+        """
+        Whether all the prerequisites of ``badge`` were awarded (or are in
+        the ``also_awarded`` ids).
+        """
+        missing = self.graph.get_missing(badge.id, self.awards)
+        return not missing.difference(also_awarded)
+
+    def get_eligible(self, badges):
+        """The badges among ``badges`` the user is eligible for."""
+        return [badge for badge in badges if self.is_eligible(badge)]
+
+    def can_apply(self, badge):
+        """The user can submit work for ``badge`` from a task."""
+        return (not self.is_awarded(badge) and not self.has_applied(badge)
+            and self.is_eligible(badge))
+
+    def can_post_submission(self, badge):
+        if self.profile is None:
+            return False
+        if badge.logic.submission_style == Logic.NO_SUBMISSIONS:
+            return False
+        if not self.is_eligible(badge):
+            return False
+        return not (badge.logic.unique and self.is_awarded(badge))
+
+    def get_badges_can_apply(self, badges, limit=None):
+        """The badges among ``badges`` the user can apply for, in order."""
+        result = []
+        for badge in badges:
+            if limit is not None and len(result) >= limit:
+                break
+            if self.can_apply(badge):
+                result.append(badge)
+        return result
+
+    def evaluate_project(self, project):
+        """Classify the badges of ``project`` (see ProjectBadgeState)."""
+        if self.profile is None:
+            return ProjectBadgeState()
+        project_badges = list(project.get_badges().select_related('logic'))
+        group_ids = set(Badge.groups.through.objects.filter(
+            project=project).values_list('badge_id', flat=True))
+        completion_badges = list(project.completion_badges.all())
+        completion_ids = set(badge.id for badge in completion_badges)
+        awarded = [badge for badge in project_badges
+            if self.is_awarded(badge) and badge.id not in completion_ids]
+        upon_completion = [badge for badge in completion_badges
+            if self.is_eligible(badge, also_awarded=completion_ids)]
+        in_progress = [badge for badge in project_badges
+            if badge.id in group_ids and badge.id in self.pending_ids
+            and not self.is_awarded(badge)]
+        non_attempted = [badge for badge in project_badges
+            if badge.logic.submission_style != Logic.NO_SUBMISSIONS
+            and not self.has_applied(badge) and not self.is_awarded(badge)]
+        return ProjectBadgeState(awarded, upon_completion, in_progress,
+            non_attempted)
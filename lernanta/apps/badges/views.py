@@ -11,13 +11,14 @@ from django.utils import simplejson
 
 from users.decorators import login_required
 from users.models import UserProfile
-from drumbeat import messages
+from drumbeat import messages, autocomplete
 from l10n.urlresolvers import reverse
 from pagination.views import get_pagination_context
 
 from badges import forms as badge_forms
 from badges.pilot import get_badge_url
 from badges.models import Badge, Submission, Assessment, Logic
+from badges.state import BadgeStateEvaluator
 
 log = logging.getLogger(__name__)
 
@@ -35,7 +36,8 @@ def show_badge(request, slug):
         badge = Badge.objects.get(slug=slug)
     except Badge.DoesNotExist:
         return pilot_badge_redirect(request, slug)
-    can_post_submission = badge.can_post_submission(request.user)
+    evaluator = BadgeStateEvaluator.for_user(request.user)
+    can_post_submission = evaluator.can_post_submission(badge)
     can_give_to_peer = badge.can_give_to_peer(request.user)
     submissions = badge.submissions.all().order_by(
         '-created_on')
@@ -334,8 +336,9 @@ def matching_peers(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
     peers = badge.get_peers(request.user.get_profile())
-    matching_peers = peers.filter(username__icontains=request.GET['term'])
-    json = simplejson.dumps([peer.username for peer in matching_peers])
+    matching_peers = autocomplete.usernames.search(request.GET['term'],
+        include=set(peers.values_list('id', flat=True)))
+    json = simplejson.dumps(matching_peers)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from relationships.models import Relationship
+from projects.models import Project
+from schools.models import School
+from users.models import get_changed_project_followers
+
+
+CHANNELS_CACHE_KEY = 'chat_channels_%s'
+CHANNELS_TIMEOUT = 60 * 60 * 24
+
+COMMUNITY_CHANNEL = 'p2pu-community'
+
+
+def get_project_channel(project_id, project_slug):
+    return 'p2pu-%s-%s' % (project_id, project_slug[:10])
+
+
+def get_school_channel(school_slug):
+    return 'p2pu-%s' % school_slug
+
+
+def get_user_channels(profile):
+    """
+    Return the sorted list of chat channels of ``profile``: the community
+    channel, the channels of the listed projects the user follows and of
+    their schools, and the channels of the schools the user organizes.
+    The list is cached until the relationships of the user, the followed
+    projects or the organizers of a school change.
+    """
+    key = CHANNELS_CACHE_KEY % profile.id
+    channels = cache.get(key)
+    if channels is not None:
+        return channels
+    channels = set([COMMUNITY_CHANNEL])
+    project_ids = profile.get_follow_graph().following_project_ids
+    if project_ids:
+        projects = Project.objects.filter(id__in=project_ids,
+            not_listed=False, archived=False).values_list('id', 'slug',
+            'school__slug')
+        for project_id, slug, school_slug in projects:
+            channels.add(get_project_channel(project_id, slug))
+            if school_slug:
+                channels.add(get_school_channel(school_slug))
+    school_slugs = School.objects.filter(organizers=profile).values_list(
+        'slug', flat=True)
+    channels.update(get_school_channel(slug) for slug in school_slugs)
+    channels = sorted(channels)
+    cache.set(key, channels, CHANNELS_TIMEOUT)
+    return channels
+
+
+def invalidate_user_channels(profile_ids):
+    cache.delete_many([CHANNELS_CACHE_KEY % profile_id
+        for profile_id in profile_ids])
+
+
+###########
+# Signals #
+###########
+
+
+def relationship_changed(sender, **kwargs):
+    rel = kwargs.get('instance', None)
+    if isinstance(rel, Relationship) and rel.target_project_id:
+        invalidate_user_channels([rel.source_id])
+
+
+def project_changed(sender, **kwargs):
+    project = kwargs.get('instance', None)
+    created = kwargs.get('created', False)
+    if isinstance(project, Project) and not created:
+        invalidate_user_channels(get_changed_project_followers(project))
+
+
+def school_organizers_changed(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    action = kwargs.get('action', None)
+    if kwargs.get('reverse', False):
+        # The schools organized by a user changed.
+        profile_ids = [instance.pk]
+    elif action == 'pre_clear':
+        instance._cleared_organizer_ids = list(
+            instance.organizers.values_list('id', flat=True))
+        return
+    elif action == 'post_clear':
+        profile_ids = getattr(instance, '_cleared_organizer_ids', [])
+    else:
+        profile_ids = kwargs.get('pk_set', None) or []
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user_channels(profile_ids)
+
+
+post_save.connect(relationship_changed, sender=Relationship,
+    dispatch_uid='chat_relationship_saved')
+post_delete.connect(relationship_changed, sender=Relationship,
+    dispatch_uid='chat_relationship_deleted')
+post_save.connect(project_changed, sender=Project,
+    dispatch_uid='chat_project_changed')
+m2m_changed.connect(school_organizers_changed,
+    sender=School.organizers.through,
+    dispatch_uid='chat_school_organizers_changed')
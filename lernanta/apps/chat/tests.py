@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+
+from users.models import create_profile
+from projects.models import Project
+from relationships.models import Relationship
+from schools.models import School
+from chat.models import get_user_channels
+
+from test_utils import TestCase
+
+
+class ChatTests(TestCase):
+
+    test_username = 'testuser'
+    test_email = 'test@mozillafoundation.org'
+
+    def setUp(self):
+        django_user = User(
+            username=self.test_username,
+            email=self.test_email,
+        )
+        self.user = create_profile(django_user)
+
+    def test_user_channels(self):
+        self.assertEqual(['p2pu-community'], get_user_channels(self.user))
+        project = Project(name='Chat Project',
+            short_description='This is a test project.',
+            long_description='This is a test project.')
+        project.save()
+        Relationship(source=self.user, target_project=project).save()
+        school = School(name='Chat School', short_name='chat',
+            description='<p>A school.</p>')
+        school.save()
+        school.organizers.add(self.user)
+        self.assertEqual(sorted(['p2pu-community', 'p2pu-%s' % school.slug,
+            'p2pu-%s-%s' % (project.id, project.slug[:10])]),
+            get_user_channels(self.user))
+        project.slug = 'renamed'
+        project.save()
+        self.assertTrue('p2pu-%s-renamed' % project.id in
+            get_user_channels(self.user))
@@ -0,0 +1,84 @@
+"""
+Compact storage of the content of page versions.
+
+The content of a version is stored as the difference with the content of
+a full snapshot (an earlier version of the same page). Deltas are lists of
+operations over the tokens of the snapshot, json encoded and compressed:
+an ``[i, j]`` pair copies the tokens ``i`` to ``j`` of the snapshot and a
+string is inserted as is. Since every delta refers to a snapshot directly,
+any version is rebuilt from two rows.
+"""
+import re
+import zlib
+import base64
+from difflib import SequenceMatcher
+
+from django.utils import simplejson
+
+
+# Html is split after each tag and each line, so changes in one paragraph
+# do not make the whole content differ.
+TOKEN_RE = re.compile(r'[^>\n]*[>\n]|[^>\n]+$')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text or '')
+
+
+def make_delta(base, content):
+    """Return the encoded delta that turns ``base`` into ``content``."""
+    base_tokens = tokenize(base)
+    tokens = tokenize(content)
+    operations = []
+    matcher = SequenceMatcher(None, base_tokens, tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j2 > j1:
+            operations.append(''.join(tokens[j1:j2]))
+    data = zlib.compress(simplejson.dumps(operations).encode('utf-8'))
+    return base64.b64encode(data)
+
+
+def apply_delta(base, delta):
+    """Rebuild the content encoded by ``delta`` from ``base``."""
+    base_tokens = tokenize(base)
+    operations = simplejson.loads(zlib.decompress(base64.b64decode(delta)))
+    parts = []
+    for operation in operations:
+        if isinstance(operation, list):
+            parts.extend(base_tokens[operation[0]:operation[1]])
+        else:
+            parts.append(operation)
+    return u''.join(parts)
+
+
+def diff(old, new):
+    """
+    Compare two contents. Return a list of ``(tag, text)`` chunks where
+    ``tag`` is 'equal', 'delete' or 'insert'.
+    """
+    old_tokens = tokenize(old)
+    new_tokens = tokenize(new)
+    chunks = []
+    matcher = SequenceMatcher(None, old_tokens, new_tokens)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            chunks.append(('equal', ''.join(old_tokens[i1:i2])))
+            continue
+        if i2 > i1:
+            chunks.append(('delete', ''.join(old_tokens[i1:i2])))
+        if j2 > j1:
+            chunks.append(('insert', ''.join(new_tokens[j1:j2])))
+    return chunks
+
+
+def compress(base, content):
+    """
+    The delta of ``content`` over ``base``, or None when it would not take
+    less than half the space of the content.
+    """
+    delta = make_delta(base, content)
+    if len(delta) * 2 > len(content or ''):
+        return None
+    return delta
@@ -1,22 +1,26 @@
 import logging
 import datetime
 
-from django.db import models
+from django.db import models, transaction
 from django.template.defaultfilters import slugify
 from django.db.models.signals import post_save
 from django.utils.translation import ugettext_lazy as _
-from django.db.models import Max
+from django.db.models import Max, Count
 from django.contrib.sites.models import Site
 from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
 
 from drumbeat.models import ModelBase
+from drumbeat.utils import save_with_unique_slug, bulk_update
 from activity.models import Activity
 from activity.schema import verbs, object_types
 from notifications.models import send_notifications
-from richtext.models import RichTextField
-from replies.models import PageComment
-from badges.models import Submission, Award
+from richtext.models import RichTextField, JSONField
+from richtext.embeds import track_embeds
+from content.deltas import compress, apply_delta
+from replies.models import PageComment, DailyCommentCount
+from badges.state import BadgeStateEvaluator
 
 
 log = logging.getLogger(__name__)
@@ -49,6 +53,11 @@ class Page(ModelBase):
     # a link to the work they did on the task and apply for skills badges
     badges_to_apply = models.ManyToManyField('badges.Badge',
         null=True, blank=True, related_name='tasks_accepting_submissions')
+    # Embed html of the urls in the content, see richtext.embeds.
+    embeds = JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        unique_together = ('project', 'slug')
 
     def __unicode__(self):
         return self.title
@@ -66,17 +75,6 @@ class Page(ModelBase):
 
     def save(self):
         """Make sure each page has a unique url."""
-        count = 1
-        if not self.slug:
-            slug = slugify(self.title)
-            self.slug = slug
-            while True:
-                existing = Page.objects.filter(
-                    project__slug=self.project.slug, slug=self.slug)
-                if len(existing) == 0:
-                    break
-                self.slug = "%s-%s" % (slug, count + 1)
-                count += 1
         if not self.index:
             if self.listed:
                 max_index = Page.objects.filter(project=self.project,
@@ -84,7 +82,12 @@ class Page(ModelBase):
                 self.index = max_index + 1 if max_index else 1
             else:
                 self.index = 0
-        super(Page, self).save()
+        if not self.slug:
+            save_with_unique_slug(self, slugify(self.title),
+                super(Page, self).save,
+                queryset=Page.objects.filter(project=self.project))
+        else:
+            super(Page, self).save()
 
     def get_next_page(self):
         if self.listed and not self.deleted:
@@ -96,19 +99,11 @@ class Page(ModelBase):
                 pass
         return None
 
-    def get_next_badge_can_apply(self, profile):
-        next_badges = self.badges_to_apply.order_by('id')
-        next_badges_can_apply = []
-        for badge in next_badges:
-            awarded = Award.objects.filter(user=profile,
-                badge=badge).exists()
-            applied = Submission.objects.filter(author=profile,
-                badge=badge).exists()
-            elegible = badge.is_eligible(profile)
-            if not awarded and not applied and elegible:
-                next_badges_can_apply.append(badge)
-            if len(next_badges_can_apply) > 1:
-                break
+    def get_next_badge_can_apply(self, profile, evaluator=None):
+        if evaluator is None:
+            evaluator = BadgeStateEvaluator(profile)
+        next_badges_can_apply = evaluator.get_badges_can_apply(
+            self.badges_to_apply.order_by('id'), limit=2)
         next_badge = next_badges_can_apply[0] if next_badges_can_apply else None
         is_last_badge = not next_badges_can_apply[1:]
         return next_badge, is_last_badge
@@ -158,35 +153,47 @@ class Page(ModelBase):
             id__in=participants.values('user__id'))
 
     def recent_activity(self, min_count=2):
-        comments = self.comments.filter(deleted=False)
-        today = datetime.date.today()
-        day = today.day
-        month = today.month
-        year = today.year
-        # get today's commments count
-        today_comments_count = comments.filter(created_on__day=day,
-            created_on__month=month, created_on__year=year).count()
-        if today_comments_count >= min_count:
-            return today_comments_count, _('today')
-        # get this week comments count
-        week = today.isocalendar()[1]
-        first_day = datetime.date(year, 1, 1)
-        delta_days = first_day.isoweekday() - 1
-        delta_weeks = week
-        if year == first_day.isocalendar()[0]:
-            delta_weeks -= 1
-        week_start_delta = datetime.timedelta(days=-delta_days, weeks=delta_weeks)
-        week_start = first_day + week_start_delta
-        week_end_delta = datetime.timedelta(days=7-delta_days, weeks=delta_weeks)
-        week_end = first_day + week_end_delta
-        this_week_comments_count = comments.filter(created_on__gte=week_start,
-            created_on__lt=week_end).count()
-        if this_week_comments_count >= min_count:
-            return this_week_comments_count, _('this week')
-        # get this month comments count
-        this_month_comments_count = comments.filter(created_on__month=month,
-            created_on__year=year).count()
-        return this_month_comments_count, _('this month')
+        return get_recent_activity([self], min_count)[self.id]
+
+
+def get_recent_activity(pages, min_count=2):
+    """
+    Return a dict with the number of comments posted to each page today,
+    this week or this month (the first period with at least ``min_count``
+    comments, or this month), and the name of the period. The counts of
+    all the pages are read with one query.
+    """
+    today = datetime.date.today()
+    week_start = today - datetime.timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    page_ids = [page.id for page in pages]
+    counts = DailyCommentCount.objects.get_counts(
+        ContentType.objects.get_for_model(Page), page_ids,
+        min(week_start, month_start))
+    activity = {}
+    for page_id in page_ids:
+        days = counts.get(page_id, [])
+        today_count = sum(count for day, count in days if day == today)
+        week_count = sum(count for day, count in days if day >= week_start)
+        month_count = sum(count for day, count in days
+            if day >= month_start)
+        if today_count >= min_count:
+            activity[page_id] = (today_count, _('today'))
+        elif week_count >= min_count:
+            activity[page_id] = (week_count, _('this week'))
+        else:
+            activity[page_id] = (month_count, _('this month'))
+    return activity
+
+
+@transaction.commit_on_success
+def set_page_indexes(indexes):
+    """
+    Set the index of the pages in the ``indexes`` dict, keyed by page id,
+    with a single UPDATE. No activities nor notifications are created.
+    """
+    bulk_update(Page, 'index', indexes)
+    Page.objects.invalidate(*[Page(id=page_id) for page_id in indexes])
 
 
 class PageVersion(ModelBase):
@@ -200,6 +207,11 @@ class PageVersion(ModelBase):
     page = models.ForeignKey('content.Page', related_name='page_versions')
     deleted = models.BooleanField(default=False)
     minor_update = models.BooleanField(default=True)
+    # Versions which are not snapshots have an empty content and store the
+    # difference with the snapshot in base (see content.deltas).
+    base = models.ForeignKey('self', null=True, blank=True, editable=False,
+        related_name='deltas')
+    delta = models.TextField(blank=True, editable=False)
 
     @models.permalink
     def get_absolute_url(self):
@@ -209,6 +221,44 @@ class PageVersion(ModelBase):
             'version_id': self.id,
         })
 
+    def save(self):
+        if not self.id and not self.base_id:
+            self.store_as_delta()
+        super(PageVersion, self).save()
+
+    def store_as_delta(self):
+        """
+        Keep only the difference with the last snapshot of the page, unless
+        PAGE_VERSION_SNAPSHOT_INTERVAL versions refer to it already or the
+        delta is not much smaller than the content.
+        """
+        snapshots = list(PageVersion.objects.filter(page=self.page_id,
+            base__isnull=True).order_by('-id').values_list('id',
+            'content')[:1])
+        if not snapshots:
+            return
+        base_id, base_content = snapshots[0]
+        deltas_count = PageVersion.objects.filter(base=base_id).aggregate(
+            count=Count('id'))['count']
+        interval = getattr(settings, 'PAGE_VERSION_SNAPSHOT_INTERVAL', 20)
+        if deltas_count + 1 >= interval:
+            return
+        delta = compress(base_content, self.content)
+        if delta is not None:
+            self._content = self.content
+            self.base_id = base_id
+            self.delta = delta
+            self.content = ''
+
+    def get_content(self):
+        """The full content of the version."""
+        if not hasattr(self, '_content'):
+            if self.base_id:
+                self._content = apply_delta(self.base.content, self.delta)
+            else:
+                self._content = self.content
+        return self._content
+
 
 def send_email_notification(instance):
     project = instance.project
@@ -259,3 +309,4 @@ def fire_activity(sender, **kwargs):
 
 post_save.connect(fire_activity, sender=Page,
     dispatch_uid='content_page_fire_activity')
+track_embeds(Page)
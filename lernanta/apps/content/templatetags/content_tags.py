@@ -5,7 +5,8 @@ from content.forms import TaskLinkSubmitForm, TaskBadgeApplyForm
 from content.models import Page
 from replies.models import PageComment
 from projects.models import PerUserTaskCompletion
-from badges.models import Badge, Submission, Award
+from badges.models import Badge
+from badges.state import BadgeStateEvaluator
 
 
 register = template.Library()
@@ -28,9 +29,7 @@ def task_toggle_completion(request, page, ignore_post_data=False):
     badges_to_apply = list(page.badges_to_apply.order_by('id'))
     if request.user.is_authenticated():
         profile = request.user.get_profile()
-        ajax_data['completed_count'] = PerUserTaskCompletion.objects.filter(
-            page__project__slug=project.slug, page__deleted=False,
-            unchecked_on__isnull=True, user=profile).count()
+        ajax_data['completed_count'] = project.get_completed_count(profile)
         if total_count:
             progressbar_value = (ajax_data['completed_count'] * 100 / total_count)
         try:
@@ -38,8 +37,10 @@ def task_toggle_completion(request, page, ignore_post_data=False):
                 user=profile, page=page, unchecked_on__isnull=True)[0]
         except IndexError:
             pass
+        evaluator = BadgeStateEvaluator(profile)
         if badges_to_apply and task_completion:
-            next_badge, is_last_badge = page.get_next_badge_can_apply(profile)
+            next_badge, is_last_badge = page.get_next_badge_can_apply(
+                profile, evaluator)
             if not task_completion.url:
                 if not ignore_post_data and request.method == 'POST':
                     task_link_submit_form = TaskLinkSubmitForm(bool(next_badge), request.POST,
@@ -73,7 +74,9 @@ def task_toggle_completion(request, page, ignore_post_data=False):
                         submission.badge = badge
                         submission.author = profile
                         submission.save()
-                        next_badge, is_last_badge = page.get_next_badge_can_apply(profile)
+                        evaluator = BadgeStateEvaluator(profile)
+                        next_badge, is_last_badge = page.get_next_badge_can_apply(
+                            profile, evaluator)
                         if next_badge:
                             task_badge_apply_form = TaskBadgeApplyForm(
                                 initial={'badge_slug': next_badge.slug})
@@ -83,18 +86,9 @@ def task_toggle_completion(request, page, ignore_post_data=False):
                         task_badge_apply_form = None
 
         for badge in badges_to_apply:
-            try:
-                badge.awarded = Award.objects.filter(user=profile,
-                    badge=badge)[0]
-            except IndexError:
-                badge.awarded = False
-            try:
-                badge.applied = Submission.objects.filter(author=profile,
-                    badge=badge)[0]
-            except IndexError:
-                badge.applied = False
-            elegible = badge.is_eligible(profile)
-            badge.show_apply = (not badge.awarded and not badge.applied and elegible)
+            badge.awarded = evaluator.get_award(badge) or False
+            badge.applied = evaluator.get_submission(badge) or False
+            badge.show_apply = evaluator.can_apply(badge)
 
     ajax_data.update({
         'stay_on_page': bool(task_link_submit_form or task_badge_apply_form),
@@ -1,9 +1,14 @@
 from django.test import Client
+from django.template import Template, Context
 from django.contrib.auth.models import User
 
 from users.models import create_profile
 from projects.models import Project, Participation
-from content.models import Page
+from activity.models import Activity
+from activity.schema import verbs
+from content.models import Page, PageVersion
+from richtext import embeds
+from richtext.models import EmbeddedUrl
 
 from test_utils import TestCase
 
@@ -99,3 +104,90 @@ class PageTests(TestCase):
 
         self.assertTrue(page1.index < page3.index)
         self.assertTrue(page3.index < page2.index)
+
+    def test_page_index_up(self):
+        """Moving a task swaps the indexes without saving the pages."""
+        self.client.login(username=self.test_username,
+            password=self.test_password)
+        page1, page2 = self.project.pages.order_by('index')[:2]
+        activities = list(Activity.objects.filter(
+            verb=verbs['update']).values_list('id', flat=True))
+        url = '/%s/groups/%s/content/index/%s/up/' % (self.locale,
+            self.project.slug, page2.slug)
+        response = self.client.get(url)
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(page2.index, Page.objects.get(id=page1.id).index)
+        self.assertEqual(page1.index, Page.objects.get(id=page2.id).index)
+        self.assertEqual(activities, list(Activity.objects.filter(
+            verb=verbs['update']).values_list('id', flat=True)))
+
+    def test_unique_slugs_per_project(self):
+        """Page slugs are unique inside a project only."""
+        page = Page(author=self.user, project=self.project,
+            title='Old Title 1', content='Same title')
+        page.save()
+        self.assertEqual('old-title-1-2', page.slug)
+        other_project = Project(name='Other Project',
+            short_description='Other', long_description='Other')
+        other_project.save()
+        page = Page(author=self.user, project=other_project,
+            title='Old Title 1', content='Same title')
+        page.save()
+        self.assertEqual('old-title-1', page.slug)
+
+    def test_page_versions(self):
+        """Versions between snapshots are stored as deltas."""
+        page = Page.objects.get(id=1)
+        paragraphs = ['<p>Paragraph %s of the task.</p>\n' % i
+            for i in xrange(50)]
+        contents = []
+        for i in xrange(3):
+            paragraphs[i] = '<p>Edit %s.</p>\n' % i
+            contents.append(''.join(paragraphs))
+            PageVersion(title=page.title, content=contents[-1],
+                author=self.user, date=page.last_update, page=page).save()
+        versions = PageVersion.objects.filter(page=page).order_by('id')
+        self.assertEqual(None, versions[0].base_id)
+        self.assertEqual(versions[0].id, versions[1].base_id)
+        self.assertEqual(versions[0].id, versions[2].base_id)
+        self.assertEqual('', versions[2].content)
+        self.assertEqual(contents,
+            [version.get_content() for version in versions])
+        url = '/%s/groups/%s/content/%s/history/%s/diff/' % (self.locale,
+            self.project.slug, page.slug, versions[0].id)
+        response = self.client.get(url, {'to': versions[2].id},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(200, response.status_code)
+        self.assertTrue('Edit 2.' in response.content)
+
+    def test_page_embeds(self):
+        """Test the embeds are stored with the page and rendered as is."""
+        queued = []
+        queue_embeds = embeds.queue_embeds
+        # The urls are not resolved until the worker runs.
+        embeds.queue_embeds = lambda urls, instance=None: queued.extend(urls)
+        try:
+            EmbeddedUrl(original_url='http://example.com/video',
+                html='<iframe></iframe>',
+                extra_data={'url': 'http://example.com/video'}).save()
+            page = Page(author=self.user, project=self.project,
+                title='Embeds', content='[youtube:http://example.com/video]')
+            page.save()
+            other = Page(author=self.user, project=self.project,
+                title='Link', content='[embed:http://example.com/other]')
+            other.save()
+        finally:
+            embeds.queue_embeds = queue_embeds
+        self.assertEqual(['http://example.com/other'], queued)
+        page = Page.objects.get(id=page.id)
+        self.assertEqual({'http://example.com/video': '<iframe></iframe>'},
+            page.embeds)
+        other = Page.objects.get(id=other.id)
+        self.assertEqual({}, other.embeds)
+        template = Template('{% load embed %}'
+            '{{ page.content|embed:page.embeds|safe }}')
+        with self.assertNumQueries(0):
+            rendered = template.render(Context({'page': page}))
+            linked = template.render(Context({'page': other}))
+        self.assertTrue('<iframe></iframe>' in rendered)
+        self.assertTrue('href="http://example.com/other"' in linked)
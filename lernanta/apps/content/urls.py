@@ -23,6 +23,9 @@ urlpatterns = patterns('content.views',
       
   url(r'^(?P<page_slug>[\w-]+)/history/(?P<version_id>\d+)/restore/$',
       'restore_version', name='version_restore'),
+
+  url(r'^(?P<page_slug>[\w-]+)/history/(?P<version_id>\d+)/diff/$',
+      'diff_page', name='page_diff'),
       
   url(r'^(?P<page_slug>[\w-]+)/link_submit/$', 'link_submit',
       name='task_link_submit'),
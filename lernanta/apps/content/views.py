@@ -20,7 +20,8 @@ from tracker.models import get_google_tracking_context
 
 from content.forms import PageForm, NotListedPageForm
 from content.forms import OwnersPageForm, OwnersNotListedPageForm
-from content.models import Page, PageVersion
+from content.models import Page, PageVersion, set_page_indexes
+from content.deltas import diff
 from content.templatetags.content_tags import task_toggle_completion
 
 import logging
@@ -326,7 +327,11 @@ def delete_page(request, slug, page_slug):
 @hide_deleted_projects
 def history_page(request, slug, page_slug):
     page = get_object_or_404(Page, project__slug=slug, slug=page_slug)
-    versions = PageVersion.objects.filter(page=page).order_by('-date')
+    # Only the metadata of the versions is displayed.
+    versions = PageVersion.objects.filter(page=page).defer('content',
+        'delta').select_related('author').order_by('-date')
+    for version in versions:
+        version.page = page
     return render_to_response('content/history_page.html', {
         'page': page,
         'versions': versions,
@@ -336,23 +341,67 @@ def history_page(request, slug, page_slug):
 
 @hide_deleted_projects
 def version_page(request, slug, page_slug, version_id):
-    version = get_object_or_404(PageVersion, page__project__slug=slug,
-        page__slug=page_slug, id=version_id, deleted=False)
+    version = get_object_or_404(PageVersion.objects.select_related('base'),
+        page__project__slug=slug, page__slug=page_slug, id=version_id,
+        deleted=False)
     page = version.page
     return render_to_response('content/version_page.html', {
         'page': page,
         'version': version,
+        'content': version.get_content(),
         'project': page.project,
         'can_edit': page.can_edit(request.user),
     }, context_instance=RequestContext(request))
 
 
+@hide_deleted_projects
+def diff_page(request, slug, page_slug, version_id):
+    """
+    Compare a version with the version in the ``to`` parameter, or with
+    the current page.
+    """
+    page = get_object_or_404(Page, project__slug=slug, slug=page_slug)
+    to_id = request.GET.get('to', None)
+    ids = [version_id]
+    if to_id:
+        if not to_id.isdigit():
+            raise http.Http404
+        ids.append(to_id)
+    versions = PageVersion.objects.filter(page=page, id__in=ids,
+        deleted=False).select_related('base').in_bulk(ids)
+    version = versions.get(int(version_id), None)
+    if version is None:
+        raise http.Http404
+    if to_id:
+        to_version = versions.get(int(to_id), None)
+        if to_version is None:
+            raise http.Http404
+        new_content = to_version.get_content()
+    else:
+        to_version = None
+        new_content = page.content
+    chunks = diff(version.get_content(), new_content)
+    if request.is_ajax():
+        json = simplejson.dumps(chunks)
+        return http.HttpResponse(json, mimetype="application/json")
+    version.page = page
+    if to_version:
+        to_version.page = page
+    return render_to_response('content/diff_page.html', {
+        'page': page,
+        'version': version,
+        'to_version': to_version,
+        'chunks': chunks,
+        'project': page.project,
+    }, context_instance=RequestContext(request))
+
+
 @hide_deleted_projects
 @login_required
 @participation_required
 def restore_version(request, slug, page_slug, version_id):
-    version = get_object_or_404(PageVersion, page__project__slug=slug,
-        page__slug=page_slug, id=version_id)
+    version = get_object_or_404(PageVersion.objects.select_related('base'),
+        page__project__slug=slug, page__slug=page_slug, id=version_id)
     page = version.page
     if version.deleted:
         return http.HttpResponseForbidden(_("You can't restore this page"))
@@ -385,7 +434,7 @@ def restore_version(request, slug, page_slug, version_id):
             messages.error(request, _('Please correct errors below.'))
     else:
         page.title = version.title
-        page.content = version.content
+        page.content = version.get_content()
         form = form_cls(instance=page, initial={'minor_update': True})
     return render_to_response('content/restore_version.html', {
         'form': form,
@@ -414,11 +463,12 @@ def _move_page(request, slug, page_slug, direction='up'):
         messages.error(request, _('You can not change tasks order.'))
         return http.HttpResponseRedirect(redirect_to)
         
-    content_pages = Page.objects.filter(project__pk=project.pk,
-        listed=True, deleted=False).order_by('index')
+    content_pages = list(Page.objects.filter(project__pk=project.pk,
+        listed=True, deleted=False).order_by('index').values_list('id',
+        'slug', 'index'))
 
     #find page we want to move
-    index = [i for i,x in enumerate(content_pages) if x.slug == page_slug]
+    index = [i for i, x in enumerate(content_pages) if x[1] == page_slug]
     if len(index) != 1 or direction=='up' and index[0] == 0 or direction=='down' and index[0] == len(content_pages)-1:
         return http.HttpResponseRedirect(redirect_to)
 
@@ -428,14 +478,9 @@ def _move_page(request, slug, page_slug, direction='up'):
     else:
         prev_page = content_pages[index[0] + 1]
         page = content_pages[index[0]]
-    prev_page.index, page.index = page.index, prev_page.index
-    # TODO: Fix this so no update messages are added to the wall but
-    # we don't loose the data for the minor_update field of PageVersion.
-    # For now relly on the Activity model to store this information.
-    page.minor_update = prev_page.minor_update = True
-    page.save()
-    prev_page.save()
-    
+    # The pages are not saved, so no update messages are added to the wall.
+    set_page_indexes({page[0]: prev_page[2], prev_page[0]: page[2]})
+
     if referer:
         return http.HttpResponseRedirect(redirect_to)
 
@@ -468,19 +513,18 @@ def page_index_reorder(request, slug):
         return http.HttpResponseRedirect(project.get_absolute_url())
 
     # newIndex = int(request.POST['newIndex']) + 1  # task indices are 1-based
-    content_pages = Page.objects.filter(project__pk=project.pk, listed=True,
-        deleted=False,
-    )
-    if content_pages.count() <= 0:
+    page_ids = dict(Page.objects.filter(project__pk=project.pk, listed=True,
+        deleted=False).values_list('slug', 'id'))
+    if not page_ids:
         raise http.Http404
 
     task_new_order = request.POST.getlist('tasks[]')
-    for i in range(len(task_new_order)):
-        task = content_pages.filter(slug=task_new_order[i])
-        if (len(task) > 1):
+    indexes = {}
+    for i, page_slug in enumerate(task_new_order):
+        if page_slug not in page_ids:
             raise http.Http404
-        task[0].index = i + 1
-        task[0].save()
+        indexes[page_ids[page_slug]] = i + 1
+    set_page_indexes(indexes)
     #refresh tasks
     content_pages = Page.objects.filter(project__pk=project.pk, listed=True,
         deleted=False,
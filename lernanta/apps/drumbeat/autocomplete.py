@@ -0,0 +1,191 @@
+"""
+In-memory prefix indexes shared by the autocomplete views.
+
+Each index keeps a sorted list of (key, id) pairs so prefix queries are a
+bisection followed by a short scan. Indexes are loaded on first use,
+updated by the model signals of this process and loaded again every
+AUTOCOMPLETE_MAX_AGE seconds to pick up changes done by other processes.
+"""
+import re
+import time
+import bisect
+import threading
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+
+from projects.models import Project
+from users.models import UserProfile
+
+
+KEY_SEPARATORS = re.compile(r'[-_.\s]+')
+
+
+def get_keys(*values):
+    """
+    Return the lowercase keys under which the values can be found: the
+    whole value and every suffix starting after a separator, so "kn"
+    matches "open-knitting".
+    """
+    keys = set()
+    for value in values:
+        if not value:
+            continue
+        value = value.lower()
+        keys.add(value)
+        for match in KEY_SEPARATORS.finditer(value):
+            if match.end() < len(value):
+                keys.add(value[match.end():])
+    return keys
+
+
+class PrefixIndex(object):
+    model = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded_on = None
+        self.keys = []
+        # id -> (value, keys, hidden)
+        self.entries = {}
+
+    def get_entries(self):
+        """Return an iterable of (id, value, keys, hidden) tuples."""
+        raise NotImplementedError
+
+    def get_entry(self, instance):
+        """Return the (value, keys, hidden) tuple for ``instance``."""
+        raise NotImplementedError
+
+    def load(self):
+        keys = []
+        entries = {}
+        for pk, value, entry_keys, hidden in self.get_entries():
+            entries[pk] = (value, entry_keys, hidden)
+            keys.extend((key, pk) for key in entry_keys)
+        keys.sort()
+        with self.lock:
+            self.keys, self.entries = keys, entries
+            self.loaded_on = time.time()
+
+    def ensure_loaded(self):
+        max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300)
+        if self.loaded_on is None or time.time() - self.loaded_on > max_age:
+            self.load()
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if not entry:
+            return
+        value, entry_keys, hidden = entry
+        for key in entry_keys:
+            i = bisect.bisect_left(self.keys, (key, pk))
+            if i < len(self.keys) and self.keys[i] == (key, pk):
+                del self.keys[i]
+
+    def update(self, instance):
+        if self.loaded_on is None:
+            # Nothing to update until the index is used.
+            return
+        value, entry_keys, hidden = self.get_entry(instance)
+        with self.lock:
+            self._remove(instance.pk)
+            self.entries[instance.pk] = (value, entry_keys, hidden)
+            for key in entry_keys:
+                bisect.insort(self.keys, (key, instance.pk))
+
+    def remove(self, instance):
+        if self.loaded_on is None:
+            return
+        with self.lock:
+            self._remove(instance.pk)
+
+    def search(self, prefix, limit=None, exclude=None, include=None):
+        """
+        Return up to ``limit`` values with a key starting with ``prefix``.
+        Ids in ``exclude`` are skipped and, when ``include`` is given, only
+        ids in it are returned.
+        """
+        self.ensure_loaded()
+        if limit is None:
+            limit = getattr(settings, 'AUTOCOMPLETE_LIMIT', 20)
+        exclude = exclude or ()
+        prefix = prefix.lower()
+        results = []
+        seen = set()
+        with self.lock:
+            i = bisect.bisect_left(self.keys, (prefix,))
+            while i < len(self.keys) and len(results) < limit:
+                key, pk = self.keys[i]
+                i += 1
+                if not key.startswith(prefix):
+                    break
+                if pk in seen or pk in exclude:
+                    continue
+                seen.add(pk)
+                if include is not None and pk not in include:
+                    continue
+                value, entry_keys, hidden = self.entries[pk]
+                if not hidden:
+                    results.append(value)
+        return results
+
+
+class UsernameIndex(PrefixIndex):
+    model = UserProfile
+
+    def get_entries(self):
+        profiles = UserProfile.objects.values_list('id', 'username',
+            'deleted')
+        for pk, username, deleted in profiles:
+            yield pk, username, get_keys(username), deleted
+
+    def get_entry(self, instance):
+        return (instance.username, get_keys(instance.username),
+            instance.deleted)
+
+
+class ProjectIndex(PrefixIndex):
+    """Project slugs, found by slug and by name."""
+    model = Project
+
+    def get_entries(self):
+        projects = Project.objects.values_list('id', 'slug', 'name',
+            'deleted')
+        for pk, slug, name, deleted in projects:
+            yield pk, slug, get_keys(slug, name), deleted
+
+    def get_entry(self, instance):
+        return (instance.slug, get_keys(instance.slug, instance.name),
+            instance.deleted)
+
+
+usernames = UsernameIndex()
+projects = ProjectIndex()
+
+
+###########
+# Signals #
+###########
+
+
+def update_indexes(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    for index in (usernames, projects):
+        if isinstance(instance, index.model):
+            index.update(instance)
+
+
+def remove_from_indexes(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    for index in (usernames, projects):
+        if isinstance(instance, index.model):
+            index.remove(instance)
+
+
+for model in (UserProfile, Project):
+    name = model._meta.object_name.lower()
+    post_save.connect(update_indexes, sender=model,
+        dispatch_uid='drumbeat_autocomplete_update_%s' % name)
+    post_delete.connect(remove_from_indexes, sender=model,
+        dispatch_uid='drumbeat_autocomplete_remove_%s' % name)
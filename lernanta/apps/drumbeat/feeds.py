@@ -0,0 +1,177 @@
+"""
+Fetching of feeds and of the pages linked from projects and profiles.
+
+Feeds are requested in parallel by a bounded pool of threads and with
+conditional requests: the ETag and Last-Modified validators of the last
+response are kept in the cache (see ``store_validators``) and sent back,
+so feeds that did not change answer 304 and are neither downloaded nor
+parsed again. Requests to the
+same host are spaced by at least FEED_HOST_DELAY seconds.
+
+Pages are streamed (see ``stream``) so only the part that is needed, up
+to a number of bytes, is downloaded and kept in memory.
+"""
+import time
+import socket
+import urllib2
+import httplib
+import hashlib
+import logging
+import urlparse
+import threading
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+log = logging.getLogger(__name__)
+
+VALIDATORS_CACHE_KEY = 'drumbeat_feed_validators_%s'
+VALIDATORS_TIMEOUT = 60 * 60 * 24 * 7
+
+CHUNK_SIZE = 8 * 1024
+
+
+class FeedResponse(object):
+    """
+    The result of a request. ``status`` is the http status (304 when the
+    content did not change, in which case ``content`` is None).
+    """
+
+    def __init__(self, url, status, content=None, etag=None, modified=None):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.etag = etag
+        self.modified = modified
+
+    @property
+    def changed(self):
+        return self.status != 304
+
+
+class HostThrottle(object):
+    """Space the requests to each host by FEED_HOST_DELAY seconds."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_request = {}
+
+    def wait(self, url):
+        host = urlparse.urlparse(url).netloc.lower()
+        self.lock.acquire()
+        try:
+            now = time.time()
+            start = max(now, self.next_request.get(host, now))
+            self.next_request[host] = start + getattr(settings,
+                'FEED_HOST_DELAY', 1)
+        finally:
+            self.lock.release()
+        if start > now:
+            time.sleep(start - now)
+
+
+throttle = HostThrottle()
+
+
+def fetch(url, etag=None, modified=None, timeout=None):
+    """
+    Request ``url``, sending the given validators. Network and http errors
+    (other than 304) are raised.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'FEED_FETCH_TIMEOUT', 10)
+    request = urllib2.Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+    if modified:
+        request.add_header('If-Modified-Since', modified)
+    throttle.wait(url)
+    try:
+        response = urllib2.urlopen(request, timeout=timeout)
+    except urllib2.HTTPError, e:
+        if e.code == 304:
+            return FeedResponse(url, 304, etag=etag, modified=modified)
+        raise
+    try:
+        content = response.read()
+    finally:
+        response.close()
+    headers = response.info()
+    return FeedResponse(url, response.getcode() or 200, content,
+        headers.getheader('ETag'), headers.getheader('Last-Modified'))
+
+
+def stream(url, max_bytes, timeout=None):
+    """
+    Yield the content of ``url`` in chunks, stopping after ``max_bytes``.
+    Network and http errors are raised.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'FEED_FETCH_TIMEOUT', 10)
+    throttle.wait(url)
+    response = urllib2.urlopen(url, timeout=timeout)
+    try:
+        size = 0
+        while size < max_bytes:
+            chunk = response.read(min(CHUNK_SIZE, max_bytes - size))
+            if not chunk:
+                break
+            size += len(chunk)
+            yield chunk
+    finally:
+        response.close()
+
+
+def get_validators_key(url):
+    return VALIDATORS_CACHE_KEY % hashlib.md5(url).hexdigest()
+
+
+def fetch_feeds(urls, conditional=True):
+    """
+    Fetch ``urls`` in parallel. Return a dict with the FeedResponse of each
+    url, without the urls which failed. With ``conditional``, the requests
+    send the validators stored by ``store_validators``.
+    """
+    urls = list(set(urls))
+    if not urls:
+        return {}
+    validators = {}
+    if conditional:
+        keys = dict((get_validators_key(url), url) for url in urls)
+        for key, value in cache.get_many(keys.keys()).iteritems():
+            validators[keys[key]] = value
+
+    def fetch_feed(url):
+        etag, modified = validators.get(url, (None, None))
+        try:
+            return fetch(url, etag, modified)
+        except (urllib2.URLError, socket.error, ValueError,
+                httplib.HTTPException), e:
+            log.warn("Can't fetch feed %s: %s" % (url, e))
+            return None
+
+    threads = min(len(urls), getattr(settings, 'FEED_FETCH_THREADS', 4))
+    pool = ThreadPool(threads)
+    try:
+        results = pool.map(fetch_feed, urls)
+    finally:
+        pool.close()
+    return dict((url, response) for url, response in zip(urls, results)
+        if response is not None)
+
+
+def store_validators(responses):
+    """
+    Keep the validators of ``responses`` for the next conditional requests.
+    Only call it once the content of the responses is processed, otherwise
+    a failure would leave the feeds unchanged until they are updated.
+    """
+    validators = {}
+    for response in responses:
+        if response.changed and (response.etag or response.modified):
+            validators[get_validators_key(response.url)] = (response.etag,
+                response.modified)
+    if validators:
+        cache.set_many(validators, VALIDATORS_TIMEOUT)
@@ -0,0 +1,98 @@
+"""
+Resized copies of the uploaded images.
+
+Images are stored as uploaded and the worker creates a derivative for
+each size in IMAGE_DERIVATIVE_SIZES (the longest side, in pixels) next to
+the original: ``<name>.<size>.<ext>``. The names of the originals include
+a hash of their content (see drumbeat.storage.ImageStorage), so the urls
+of the derivatives never point to different images and can be cached for
+long. ``get_image_url`` picks the smallest derivative that fits the space
+an image is shown in, falling back to the original until it is generated.
+"""
+import os
+import re
+import logging
+
+import Image
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+log = logging.getLogger(__name__)
+
+GRAVATAR_SIZE_RE = re.compile(
+    r'^(https?://[\w.]*gravatar\.com/avatar/\w+\?s=)\d+')
+
+
+def get_sizes():
+    return sorted(getattr(settings, 'IMAGE_DERIVATIVE_SIZES',
+        (60, 160, 240)))
+
+
+def get_derivative_name(name, size):
+    root, ext = os.path.splitext(name)
+    return '%s.%s%s' % (root, size, ext)
+
+
+def pick_size(size):
+    """The smallest derivative size not smaller than ``size``."""
+    sizes = get_sizes()
+    for derivative_size in sizes:
+        if derivative_size >= size:
+            return derivative_size
+    return None
+
+
+def get_image_url(url, size, storage=default_storage):
+    """
+    Return the url of the derivative of the image at ``url`` to display
+    in a ``size`` pixels box. Gravatar urls ask for that size and other
+    urls outside MEDIA_URL are returned as is.
+    """
+    if not url:
+        return url
+    if GRAVATAR_SIZE_RE.match(url):
+        return GRAVATAR_SIZE_RE.sub(r'\g<1>%d' % size, url)
+    if not url.startswith(settings.MEDIA_URL):
+        return url
+    derivative_size = pick_size(size)
+    if derivative_size is None:
+        return url
+    name = url[len(settings.MEDIA_URL):]
+    derivative_name = get_derivative_name(name, derivative_size)
+    if not storage.exists(derivative_name):
+        return url
+    return settings.MEDIA_URL + derivative_name
+
+
+def create_derivatives(name, storage=default_storage, overwrite=False):
+    """Create the missing derivatives of the image ``name``."""
+    path = storage.path(name)
+    try:
+        image = Image.open(path)
+        image.load()
+    except IOError, e:
+        log.warn("Can't open image %s: %s" % (name, e))
+        return []
+    image_format = image.format
+    if image.mode not in ('L', 'RGB', 'RGBA'):
+        image = image.convert('RGBA' if image_format == 'PNG' else 'RGB')
+    created = []
+    for size in get_sizes():
+        derivative_name = get_derivative_name(name, size)
+        if storage.exists(derivative_name) and not overwrite:
+            continue
+        derivative = image.copy()
+        # Images smaller than the size are only re-encoded.
+        derivative.thumbnail((size, size), Image.ANTIALIAS)
+        if image_format == 'JPEG' and derivative.mode != 'RGB':
+            derivative = derivative.convert('RGB')
+        derivative.save(storage.path(derivative_name), image_format)
+        created.append(derivative_name)
+    return created
+
+
+def queue_derivatives(name):
+    from drumbeat.tasks import CreateImageDerivatives
+    CreateImageDerivatives.apply_async(args=(name,))
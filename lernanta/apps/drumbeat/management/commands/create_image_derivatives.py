@@ -0,0 +1,41 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db.models import get_models, FileField
+
+from drumbeat.storage import ImageStorage
+from drumbeat.images import create_derivatives, queue_derivatives
+
+
+class Command(BaseCommand):
+    help = ('Create the resized copies of the images uploaded before they '
+        'were generated on upload.')
+    option_list = BaseCommand.option_list + (
+        make_option('--queue', action='store_true', dest='queue',
+            default=False, help='Leave the images to the worker.'),
+        make_option('--overwrite', action='store_true', dest='overwrite',
+            default=False, help='Create again the existing copies.'),
+    )
+
+    def handle(self, *args, **options):
+        count = 0
+        for model in get_models():
+            for field in model._meta.fields:
+                if not isinstance(field, FileField):
+                    continue
+                if not isinstance(field.storage, ImageStorage):
+                    continue
+                names = model._default_manager.exclude(**{
+                    field.name: ''}).exclude(**{
+                    '%s__isnull' % field.name: True}).values_list(
+                    field.name, flat=True).distinct()
+                for name in names:
+                    if not field.storage.exists(name):
+                        continue
+                    if options['queue']:
+                        queue_derivatives(name)
+                    else:
+                        create_derivatives(name, field.storage,
+                            options['overwrite'])
+                    count += 1
+        self.stdout.write('Processed %d images.\n' % count)
@@ -1,9 +1,12 @@
 import os
 import Image
+import hashlib
 import logging
 
 from django.core.files.storage import FileSystemStorage
 
+from drumbeat.images import queue_derivatives
+
 log = logging.getLogger(__name__)
 
 
@@ -18,13 +21,20 @@ class ImageStorage(FileSystemStorage):
 
     def _save(self, name, content):
         name, ext = os.path.splitext(name)
+        # Only the header is read to find the format.
         image = Image.open(content)
         if image.format in self.format_extensions:
-            name = "%s.%s" % (name, self.format_extensions[image.format])
+            content_hash = hashlib.md5()
+            for chunk in content.chunks():
+                content_hash.update(chunk)
+            name = "%s.%s.%s" % (name, content_hash.hexdigest()[:12],
+                self.format_extensions[image.format])
         else:
             log.warn("Attempt to upload image of unknown format: %s" % (
                 image.format,))
             raise Exception("Unknown image format: %s" % (image.format,))
+        # The original is stored as uploaded and the resized copies
+        # are created by the worker.
         name = super(ImageStorage, self)._save(name, content)
-        image.save(self.path(name), image.format)
+        queue_derivatives(name)
         return name
@@ -0,0 +1,13 @@
+from celery.task import Task
+
+from drumbeat.images import create_derivatives
+
+
+class CreateImageDerivatives(Task):
+    """Create the resized copies of an uploaded image."""
+    name = 'drumbeat.tasks.CreateImageDerivatives'
+
+    def run(self, name, **kwargs):
+        log = self.get_logger(**kwargs)
+        created = create_derivatives(name)
+        log.debug('created %d derivatives of %s' % (len(created), name))
@@ -0,0 +1,24 @@
+from django.template import Library
+from django.template.defaultfilters import stringfilter
+
+from drumbeat.images import get_image_url
+
+register = Library()
+
+
+def image_size(url, arg):
+    """
+    Template filter returning the url of the smallest copy of an image
+    that fills a box of ``arg`` pixels.
+
+    Usage: {{ profile.image_or_default|image_size:54 }}
+    """
+    try:
+        size = int(float(arg))
+    except ValueError:
+        return url
+    return get_image_url(url, size)
+image_size.is_safe = True
+image_size = stringfilter(image_size)
+
+register.filter(image_size)
@@ -0,0 +1,33 @@
+"""Helpers shared by the tests which request a local http server."""
+import threading
+from contextlib import contextmanager
+from BaseHTTPServer import HTTPServer
+
+from django.conf import settings
+from django.core.cache import get_cache
+
+
+@contextmanager
+def serve(handler, *modules):
+    """
+    Serve the requests with ``handler`` on a local port inside the block,
+    which gets the base url of the server. Meanwhile the requests are not
+    spaced (see drumbeat.feeds.HostThrottle) and the ``cache`` of each of
+    ``modules`` is a local memory cache.
+    """
+    server = HTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    host_delay = getattr(settings, 'FEED_HOST_DELAY', 1)
+    settings.FEED_HOST_DELAY = 0
+    caches = [module.cache for module in modules]
+    for module in modules:
+        module.cache = get_cache('locmem://')
+    try:
+        yield 'http://127.0.0.1:%s/' % server.server_port
+    finally:
+        server.shutdown()
+        settings.FEED_HOST_DELAY = host_delay
+        for module, cache in zip(modules, caches):
+            module.cache = cache
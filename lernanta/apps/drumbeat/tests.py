@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+from BaseHTTPServer import BaseHTTPRequestHandler
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from drumbeat.images import get_image_url, get_derivative_name
+from drumbeat import feeds
+from drumbeat.feeds import fetch_feeds, store_validators
+from drumbeat.testing import serve
+
+from test_utils import TestCase
+
+
+FEED = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Feed</title></channel></rss>"""
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves the feeds of test_fetch_feeds, with an ETag."""
+    requests = []
+
+    def do_GET(self):
+        FeedHandler.requests.append(self.path)
+        if self.path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+        elif self.path == '/broken':
+            self.wfile.write('HTTP/1.1 OK\r\n\r\n')
+        elif self.headers.getheader('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/rss+xml')
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(FEED)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(location=self.media_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_get_image_url(self):
+        name = 'images/profiles/0/picture.0123456789ab.png'
+        url = settings.MEDIA_URL + name
+        # The original is used until the derivative is created.
+        self.assertEqual(url, get_image_url(url, 54, self.storage))
+        derivative_name = get_derivative_name(name, 60)
+        os.makedirs(os.path.dirname(self.storage.path(derivative_name)))
+        open(self.storage.path(derivative_name), 'wb').close()
+        self.assertEqual(settings.MEDIA_URL + derivative_name,
+            get_image_url(url, 54, self.storage))
+        # No derivative is as large as the box.
+        self.assertEqual(url, get_image_url(url, 1000, self.storage))
+        gravatar = ('https://secure.gravatar.com/avatar/0a1b?s=240&amp;'
+            'd=default&amp;r=g')
+        self.assertEqual(gravatar.replace('s=240', 's=54'),
+            get_image_url(gravatar, 54))
+        static = settings.STATIC_URL + 'images/member-missing.png'
+        self.assertEqual(static, get_image_url(static, 54))
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        FeedHandler.requests = []
+
+    def test_fetch_feeds(self):
+        # The validators need a real cache.
+        with serve(FeedHandler, feeds) as base_url:
+            urls = [base_url + 'a', base_url + 'b', base_url + 'missing']
+            responses = fetch_feeds(urls)
+            # The failed requests are left out.
+            self.assertEqual(sorted(urls[:2]), sorted(responses.keys()))
+            for url in urls[:2]:
+                self.assertTrue(responses[url].changed)
+                self.assertEqual(FEED, responses[url].content)
+            # Until their validators are stored the feeds are downloaded again.
+            responses = fetch_feeds(urls[:2])
+            for url in urls[:2]:
+                self.assertTrue(responses[url].changed)
+            store_validators(responses.values())
+            # The second time the feeds did not change.
+            responses = fetch_feeds(urls[:2])
+            for url in urls[:2]:
+                self.assertFalse(responses[url].changed)
+                self.assertEqual(None, responses[url].content)
+            self.assertEqual(7, len(FeedHandler.requests))
+            responses = fetch_feeds(urls[:1], conditional=False)
+            self.assertTrue(responses[urls[0]].changed)
+            # A malformed response only leaves out its feed.
+            responses = fetch_feeds([base_url + 'broken', urls[0]])
+            self.assertEqual([urls[0]], responses.keys())
@@ -5,12 +5,17 @@ import hashlib
 import unicodedata
 
 from django.core.validators import ValidationError, validate_slug
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, AutoField
 from django.utils.encoding import smart_unicode
 
 
 # Extra characters outside of alphanumerics that we'll allow.
 SLUG_OK = '-_'
 
+# Times save_with_unique_slug picks a new slug after losing a race for it.
+SLUG_SAVE_ATTEMPTS = 5
+
 
 def slugify(s, ok=SLUG_OK, lower=True):
     # L and N signify letter/number.
@@ -38,6 +43,116 @@ def slug_validator(s, ok=SLUG_OK, lower=True):
                               code=validate_slug.code)
 
 
+def get_taken_slugs(queryset, bases, field='slug'):
+    """
+    Return the values of ``field`` in ``queryset`` equal to one of
+    ``bases`` or starting with ``base-``, fetched in a single query.
+    """
+    if not bases:
+        return set()
+    query = Q()
+    for base in set(bases):
+        query |= Q(**{field: base})
+        query |= Q(**{'%s__startswith' % field: '%s-' % base})
+    return set(queryset.filter(query).values_list(field, flat=True))
+
+
+def next_free_slug(base, taken):
+    """Return ``base`` or the first ``base-N`` (N >= 2) not in ``taken``."""
+    slug = base
+    count = 1
+    while slug in taken:
+        count += 1
+        slug = "%s-%s" % (base, count)
+    return slug
+
+
+def get_unique_slugs(queryset, bases, field='slug'):
+    """
+    Return a slug for each of ``bases`` that is free in ``queryset`` and
+    not repeated in the returned list, using a single query.
+    """
+    taken = get_taken_slugs(queryset, bases, field)
+    slugs = []
+    for base in bases:
+        slug = next_free_slug(base, taken)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_unique_slug(instance, base, save, queryset=None, field='slug'):
+    """
+    Set a free slug derived from ``base`` on ``instance`` and call
+    ``save``. If a concurrent insert takes the slug first the unique
+    constraint fails and the next free slug is tried.
+    """
+    if queryset is None:
+        queryset = instance.__class__._default_manager.all()
+    taken = get_taken_slugs(queryset, [base], field)
+    for attempt in xrange(SLUG_SAVE_ATTEMPTS):
+        slug = next_free_slug(base, taken)
+        setattr(instance, field, slug)
+        sid = transaction.savepoint()
+        try:
+            save()
+        except IntegrityError:
+            transaction.savepoint_rollback(sid)
+            taken = get_taken_slugs(queryset, [base], field)
+            if slug not in taken or attempt + 1 == SLUG_SAVE_ATTEMPTS:
+                # Not a slug collision or too much contention.
+                raise
+        else:
+            transaction.savepoint_commit(sid)
+            return
+
+
+def bulk_insert(objects):
+    """
+    Insert ``objects``, instances of the same model, with a single
+    executemany. ``save`` is not called, no signals are sent and the
+    primary keys of the instances are not set.
+    """
+    if not objects:
+        return
+    opts = objects[0]._meta
+    fields = [field for field in opts.local_fields
+        if not isinstance(field, AutoField)]
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (qn(opts.db_table),
+        ', '.join(qn(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)))
+    rows = [[field.get_db_prep_save(field.pre_save(obj, True),
+        connection=connection) for field in fields] for obj in objects]
+    connection.cursor().executemany(sql, rows)
+    transaction.commit_unless_managed()
+
+
+def bulk_update(model, field_name, values):
+    """
+    Set ``field_name`` of the rows of ``model`` to the values of the
+    ``values`` dict, keyed by primary key, with a single UPDATE. ``save``
+    is not called, no signals are sent and cached queries are not
+    invalidated.
+    """
+    if not values:
+        return
+    opts = model._meta
+    field = opts.get_field(field_name)
+    qn = connection.ops.quote_name
+    sql = 'UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)' % (
+        qn(opts.db_table), qn(field.column), qn(opts.pk.column),
+        ' '.join(['WHEN %s THEN %s'] * len(values)), qn(opts.pk.column),
+        ', '.join(['%s'] * len(values)))
+    params = []
+    for pk, value in values.items():
+        params.append(pk)
+        params.append(field.get_db_prep_save(value, connection=connection))
+    params.extend(values.keys())
+    connection.cursor().execute(sql, params)
+    transaction.commit_unless_managed()
+
+
 def get_partition_id(pk, chunk_size=1000):
     """
     Given a primary key and optionally the number of models that will get
@@ -1,5 +1,8 @@
-from django.db.models.signals import post_save
+import time
+
+from django.db.models.signals import post_save, post_delete
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 
 from l10n.urlresolvers import reverse
 from messages.models import Message
@@ -11,6 +14,70 @@ import logging
 
 log = logging.getLogger(__name__)
 
+VERSION_CACHE_KEY = 'drumbeatmail_version_%s'
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def get_mailbox_version(user_id):
+    """
+    Version of the mailbox of the user, part of the keys of everything
+    cached about it. It changes every time a message of the user is saved
+    or deleted.
+    """
+    key = VERSION_CACHE_KEY % user_id
+    version = cache.get(key)
+    if version is None:
+        version = str(time.time())
+        cache.add(key, version, VERSION_TIMEOUT)
+        version = cache.get(key, version)
+    return version
+
+
+def invalidate_mailboxes(user_ids):
+    version = str(time.time())
+    cache.set_many(dict((VERSION_CACHE_KEY % user_id, version)
+        for user_id in user_ids if user_id), VERSION_TIMEOUT)
+    invalidate_inbox_summaries(user_ids)
+
+
+SUMMARY_CACHE_KEY = 'drumbeatmail_summary_%s'
+SUMMARY_TIMEOUT = 60 * 60 * 24
+SUMMARY_LATEST = 3
+
+
+def get_inbox_summary(user):
+    """
+    Return a dict with the number of unread messages of ``user`` and the
+    headers of the latest messages received, as shown in the header of
+    every page. It is kept in the cache until a message of the user is
+    saved, deleted or read.
+    """
+    key = SUMMARY_CACHE_KEY % user.id
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+    inbox = Message.objects.inbox_for(user)
+    latest = []
+    for message in inbox.select_related('sender')[:SUMMARY_LATEST]:
+        latest.append({
+            'id': message.id,
+            'subject': message.subject,
+            'sender': message.sender.username,
+            'sent_at': message.sent_at,
+            'new': message.new(),
+        })
+    summary = {
+        'unread_count': inbox.filter(read_at__isnull=True).count(),
+        'latest': latest,
+    }
+    cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_inbox_summaries(user_ids):
+    cache.delete_many([SUMMARY_CACHE_KEY % user_id
+        for user_id in user_ids if user_id])
+
 
 def message_sent_handler(sender, **kwargs):
     message = kwargs.get('instance', None)
@@ -38,3 +105,14 @@ def message_sent_handler(sender, **kwargs):
 
 post_save.connect(message_sent_handler, sender=Message,
     dispatch_uid='drumbeatmail_message_sent_handler')
+
+
+def mailbox_changed(sender, **kwargs):
+    message = kwargs.get('instance', None)
+    if isinstance(message, Message):
+        invalidate_mailboxes([message.sender_id, message.recipient_id])
+
+post_save.connect(mailbox_changed, sender=Message,
+    dispatch_uid='drumbeatmail_mailbox_saved')
+post_delete.connect(mailbox_changed, sender=Message,
+    dispatch_uid='drumbeatmail_mailbox_deleted')
@@ -1,8 +1,11 @@
 from django.conf import settings
+from django.utils import simplejson
 from django.contrib.auth.models import User
 
 from users.models import create_profile
 from drumbeatmail.forms import ComposeForm
+from drumbeatmail.views import get_sorted_senders
+from drumbeatmail.models import get_inbox_summary
 from relationships.models import Relationship
 from messages.models import Message
 
@@ -60,3 +63,41 @@ class TestDrumbeatMail(test_utils.TestCase):
                           password=self.test_password)
         response = self.client.get("/%s/messages/inbox/" % (self.locale,))
         self.assertContains(response, 'test message body')
+
+    def test_sorted_senders(self):
+        """Test senders are counted with the inbox messages."""
+        for subject in ('first', 'second'):
+            Message(sender=self.user_two.user, recipient=self.user.user,
+                subject=subject, body='test message body').save()
+        Message(sender=self.user.user, recipient=self.user_two.user,
+            subject='reply', body='test message body').save()
+        self.assertEqual([(self.user_two, 2)],
+            get_sorted_senders(self.user.user))
+
+    def test_view_message_page(self):
+        """Test the next pages of the inbox are served as json."""
+        for i in range(12):
+            Message(sender=self.user_two.user, recipient=self.user.user,
+                subject='subject %s' % i, body='body %s' % i).save()
+        self.client.login(username=self.test_username,
+                          password=self.test_password)
+        response = self.client.get("/%s/messages/inbox/2/" % (self.locale,),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(2, len(simplejson.loads(response.content)))
+        self.assertEqual(2, Message.objects.filter(
+            read_at__isnull=False).count())
+
+    def test_inbox_summary(self):
+        """Test the cached inbox summary follows the received messages."""
+        self.assertEqual(0, get_inbox_summary(self.user.user)['unread_count'])
+        message = Message(sender=self.user_two.user,
+            recipient=self.user.user, subject='summary subject',
+            body='test message body')
+        message.save()
+        summary = get_inbox_summary(self.user.user)
+        self.assertEqual(1, summary['unread_count'])
+        self.assertEqual('summary subject', summary['latest'][0]['subject'])
+        self.client.login(username=self.test_username,
+                          password=self.test_password)
+        self.client.get("/%s/messages/inbox/" % (self.locale,))
+        self.assertEqual(0, get_inbox_summary(self.user.user)['unread_count'])
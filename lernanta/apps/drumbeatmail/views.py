@@ -4,15 +4,21 @@ import datetime
 import operator
 
 from django import http
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
 from django.db.models.fields.files import ImageFieldFile
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
 from django.utils import simplejson
 from django.utils.translation import ugettext as _
+from django.utils.translation import get_language
 
 from l10n.urlresolvers import reverse
 from drumbeat import messages
 from drumbeatmail import forms
+from drumbeatmail.models import get_mailbox_version
+from drumbeatmail.models import invalidate_inbox_summaries
 from messages.models import Message
 from users.models import UserProfile
 from users.decorators import login_required
@@ -27,13 +33,38 @@ def get_sorted_senders(user):
     Helper function. Return a list of distinct senders, sorted by
     the number of messages received from them.
     """
-    msgs = Message.objects.inbox_for(user).select_related('sender')
-    senders = {}
+    counts = Message.objects.inbox_for(user).values_list(
+        'sender').annotate(Count('id')).order_by()
+    counts = dict(counts)
+    profiles = UserProfile.objects.filter(user__in=counts.keys())
+    senders = [(profile, counts[profile.user_id]) for profile in profiles]
+    return sorted(senders, key=operator.itemgetter(1))
+
+
+def prefetch_profiles(msgs):
+    """
+    Helper function. Load the profiles of the senders and recipients of
+    ``msgs`` with one query, so ``get_profile`` does not hit the database.
+    """
+    users = {}
     for msg in msgs:
-        sender = msg.sender.get_profile()
-        senders.setdefault(sender, 0)
-        senders[sender] += 1
-    return sorted(senders.iteritems(), key=operator.itemgetter(1))
+        for user in (msg.sender, msg.recipient):
+            if user is not None:
+                users.setdefault(user.id, []).append(user)
+    if not users:
+        return
+    for profile in UserProfile.objects.filter(user__in=users.keys()):
+        for user in users[profile.user_id]:
+            user._profile_cache = profile
+
+
+def get_page_cache_key(user, view_name, filter, page_number):
+    """Helper function. Cache key of a serialized page of messages."""
+    filter = ','.join('%s=%s' % (name, getattr(value, 'pk', value))
+        for name, value in sorted((filter or {}).items()))
+    return 'drumbeatmail_page_%s_%s_%s_%s_%s_%s' % (user.id,
+        get_mailbox_version(user.id), view_name, filter, page_number,
+        get_language())
 
 
 def get_pagination_options(count, page_number):
@@ -54,7 +85,8 @@ def serialize(inbox, sent_view=False):
         sender = msg.sender
         if sent_view:
             sender = msg.recipient
-        img = sender.get_profile().image_or_default()
+        profile = sender.get_profile()
+        img = profile.image_or_default()
         if isinstance(img, ImageFieldFile):
             img = img.name
         serialized = {
@@ -62,9 +94,9 @@ def serialize(inbox, sent_view=False):
                 model='message', app_label='messages', pk=msg.id)),
             'reply_url': reverse('drumbeatmail_reply', kwargs=dict(
                 message=msg.id)),
-            'sender_url': sender.get_profile().get_absolute_url(),
+            'sender_url': profile.get_absolute_url(),
             'sender_img': img,
-            'sender_name': unicode(sender.get_profile()),
+            'sender_name': unicode(profile),
             'subject': msg.subject,
             'body': msg.body,
             'sent_at': msg.sent_at.strftime('%b. %d, %Y, %I:%M %p').replace(
@@ -99,6 +131,13 @@ def generic_inbox(request, query_method, query_args, page_number,
                     the sender.
     """
     page_number = int(page_number)
+    if request.is_ajax():
+        # The "more" pages are cached until a message of the user changes.
+        cache_key = get_page_cache_key(request.user, more_link_name, filter,
+            page_number)
+        data = cache.get(cache_key)
+        if data is not None:
+            return http.HttpResponse(data, 'application/json')
     msgs = query_method(*query_args)
     if filter:
         msgs = msgs.filter(**filter)
@@ -108,18 +147,27 @@ def generic_inbox(request, query_method, query_args, page_number,
     if n_pages > 0 and page_number > n_pages:
         return http.HttpResponseRedirect(redirect)
 
-    inbox = msgs.select_related('sender')[start:end]
-    senders = get_sorted_senders(request.user)
+    inbox = list(msgs.select_related('sender', 'recipient')[start:end])
+    prefetch_profiles(inbox)
 
-    for msg in inbox:
-        if not msg.read_at:
-            msg.read_at = datetime.datetime.now()
-            msg.save()
+    unread_ids = [msg.id for msg in inbox if not msg.read_at
+        and msg.recipient_id == request.user.id]
+    if unread_ids:
+        now = datetime.datetime.now()
+        Message.objects.filter(id__in=unread_ids).update(read_at=now)
+        invalidate_inbox_summaries([request.user.id])
+        for msg in inbox:
+            if msg.id in unread_ids:
+                msg.read_at = now
 
     if request.is_ajax():
         data = serialize(inbox, sent_view)
+        cache.set(cache_key, data, getattr(settings,
+            'DRUMBEATMAIL_CACHE_TIMEOUT', 60 * 60))
         return http.HttpResponse(data, 'application/json')
 
+    senders = get_sorted_senders(request.user)
+
     page_number += 1
     more_link_kwargs['page_number'] = page_number
     more_link = reverse(more_link_name, kwargs=more_link_kwargs)
@@ -2,10 +2,11 @@ import re
 
 from django.conf import settings
 from django.test import Client
+from django.test.client import RequestFactory
 from django.contrib.auth.models import User
 
 from users.models import create_profile
-from l10n import locales
+from l10n import locales, urlresolvers
 
 import test_utils
 
@@ -79,3 +80,36 @@ class TestLocaleURLs(test_utils.TestCase):
         })
         self.assertRedirects(response, '/en/dashboard/', status_code=302,
                              target_status_code=200)
+
+
+class TestReverse(test_utils.TestCase):
+
+    def tearDown(self):
+        urlresolvers.set_url_prefix(None)
+
+    def test_reverse_per_locale(self):
+        """Cached urls are not shared between locales."""
+        factory = RequestFactory()
+        for locale in ('en', 'es', 'en'):
+            prefixer = urlresolvers.Prefixer(factory.get('/%s/' % locale))
+            urlresolvers.set_url_prefix(prefixer)
+            for i in range(2):
+                self.assertEqual('/%s/dashboard/' % locale,
+                    urlresolvers.reverse('dashboard'))
+        # Without locale in the path, Accept-Language is used.
+        prefixer = urlresolvers.Prefixer(factory.get('/',
+            HTTP_ACCEPT_LANGUAGE='es'))
+        urlresolvers.set_url_prefix(prefixer)
+        self.assertEqual('/es/dashboard/', urlresolvers.reverse('dashboard'))
+        self.assertEqual('es', prefixer.language)
+
+    def test_lru_cache(self):
+        cache = urlresolvers.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        # 'b' was the least recently used item.
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
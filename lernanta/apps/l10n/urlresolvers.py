@@ -2,9 +2,10 @@
 Taken from kitsune.sumo.urlresolvers
 """
 import threading
+from collections import OrderedDict
 
 from django.conf import settings
-from django.core.urlresolvers import reverse as django_reverse
+from django.core.urlresolvers import reverse as django_reverse, get_urlconf
 from django.utils.translation.trans_real import parse_accept_lang_header
 
 import l10n.locales
@@ -23,18 +24,81 @@ def get_url_prefix():
     return getattr(_locals, 'prefix', None)
 
 
+class LRUCache(object):
+    """
+    A thread safe mapping of at most ``size`` items, which drops the least
+    recently used items first.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                return default
+            self.items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+# Reversed urls, by arguments, locale and script name. Created on first
+# use since this module is imported while the settings are loaded.
+_reverse_cache = None
+
+
+def get_reverse_cache():
+    global _reverse_cache
+    if _reverse_cache is None:
+        _reverse_cache = LRUCache(getattr(settings, 'REVERSE_CACHE_SIZE',
+            2000))
+    return _reverse_cache
+
+
 def reverse(viewname, urlconf=None, args=None, kwargs=None,
             prefix=None, current_app=None):
-    """Wraps Django's reverse to prepend the correct locale."""
+    """
+    Wraps Django's reverse to prepend the correct locale. The urls are
+    cached, so the url patterns are only matched once per locale.
+    """
     prefixer = get_url_prefix()
 
     if prefixer:
         prefix = prefix or '/'
-    url = django_reverse(viewname, urlconf, args, kwargs, prefix, current_app)
-    if prefixer:
-        return prefixer.fix(url)
+        locale = prefixer.locale or prefixer.get_language()
+        script_name = prefixer.request.META['SCRIPT_NAME']
     else:
-        return url
+        locale = script_name = None
+    key = (viewname, urlconf or get_urlconf() or settings.ROOT_URLCONF,
+        tuple(args or ()), tuple(sorted((kwargs or {}).items())), prefix,
+        current_app, locale, script_name)
+    try:
+        url = get_reverse_cache().get(key)
+    except TypeError:
+        # Unhashable arguments, the url is not cached.
+        key = url = None
+    if url is None:
+        url = django_reverse(viewname, urlconf, args, kwargs, prefix,
+            current_app)
+        if prefixer:
+            url = prefixer.fix(url)
+        if key is not None:
+            get_reverse_cache().set(key, url)
+    return url
 
 
 def find_supported(test):
@@ -49,6 +113,7 @@ class Prefixer(object):
         self.request = request
         split = self.split_path(request.path_info)
         self.locale, self.shortened_path = split
+        self.language = None
 
     def split_path(self, path_):
         """
@@ -75,8 +140,14 @@ class Prefixer(object):
         """
         Return a locale code we support on the site using the
         user's Accept-Language header to determine which is best. This
-        mostly follows the RFCs but read bug 439568 for details.
+        mostly follows the RFCs but read bug 439568 for details. The
+        language is only looked up once per request.
         """
+        if self.language is None:
+            self.language = self.find_language()
+        return self.language
+
+    def find_language(self):
         if 'lang' in self.request.GET:
             lang = self.request.GET['lang'].lower()
             if lang in l10n.locales.LANGUAGE_URL_MAP:
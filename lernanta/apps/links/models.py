@@ -1,11 +1,13 @@
 import logging
 
-from django.db import models
+from django.db import models, transaction
 # from django.db.models.signals import post_save, post_delete
 
 from django_push.subscriber.models import Subscription
 # from django_push.subscriber.signals import updated
 from django.db.models import Max
+
+from drumbeat.utils import bulk_update
 from links.tasks import SubscribeToFeed, UnsubscribeFromFeed, HandleNotification
 
 
@@ -37,6 +39,15 @@ class Link(models.Model):
         super(Link, self).save(*args, **kwargs)
 
 
+@transaction.commit_on_success
+def swap_link_indexes(link, other):
+    """
+    Swap the indexes of two links, given as (id, index) pairs, with a
+    single UPDATE.
+    """
+    bulk_update(Link, 'index', {link[0]: other[1], other[0]: link[1]})
+
+
 def link_create_handler(sender, **kwargs):
     """Check for a feed and subscribe to it if it exists."""
     link = kwargs.get('instance', None)
@@ -1,10 +1,11 @@
-import urllib2
-
 from django.conf import settings
+from django.db import transaction
+from django.contrib.contenttypes.models import ContentType
 
 from celery.task import Task
 from django_push.subscriber.models import Subscription, SubscriptionError
 
+from drumbeat.utils import bulk_insert
 from links import utils
 from activity.models import RemoteObject, Activity
 from activity.schema import verbs, object_types
@@ -28,8 +29,7 @@ class SubscribeToFeed(Task):
 
         try:
             log.debug("Attempting feed discovery on %s" % (link.url,))
-            html = urllib2.urlopen(link.url).read()
-            feed_url = utils.parse_feed_url(html, link.url)
+            feed_url = utils.discover_feed_url(link.url)
             log.debug("Found feed URL %s for %s" % (feed_url, link.url))
         except:
             log.warning("Error discovering feed URL for %s. Retrying." % (
@@ -41,8 +41,7 @@ class SubscribeToFeed(Task):
 
         try:
             log.debug("Attempting hub discovery on %s" % (feed_url,))
-            feed = urllib2.urlopen(feed_url).read()
-            hub_url = utils.parse_hub_url(feed, feed_url)
+            hub_url = utils.discover_hub_url(feed_url)
             log.debug("Found hub %s for %s" % (hub_url, feed_url))
         except:
             log.warning("Error discovering hub URL for %s. Retrying." % (
@@ -97,8 +96,8 @@ class HandleNotification(Task):
         qname = '_'.join((prefix, attr))
         return getattr(entry, qname, None)
 
-    def create_activity_entry(self, entry, sender, activity_prefix=None):
-        """Create activity feed entries for the provided feed entry."""
+    def parse_entry(self, entry, activity_prefix=None):
+        """Return the (uri, title, object type) of a feed entry."""
         object_type = None
         if activity_prefix:
             object_type = self.get_namespaced_attr(
@@ -114,19 +113,56 @@ class HandleNotification(Task):
             if uris:
                 uri = uris[0].get('href')
         if not (title and uri):
-            return
-        for link in sender.link_set.all():
-            remote_obj = RemoteObject(
-                link=link, title=title, uri=uri, object_type=object_type)
-            remote_obj.save()
-            activity = Activity(
-                actor=link.user, verb=verbs['share'], target_object=remote_obj)
-            if link.project:
-                activity.scope_object = link.project
-            activity.save()
+            return None
+        return uri, title, object_type
 
     def run(self, notification, sender, **kwargs):
         """Parse feed and create activity entries."""
         prefix = self.get_activity_namespace_prefix(notification)
+        entries = []
         for entry in notification.entries:
-            self.create_activity_entry(entry, sender, activity_prefix=prefix)
+            parsed = self.parse_entry(entry, activity_prefix=prefix)
+            if parsed:
+                entries.append(parsed)
+        store_entries(sender, entries)
+
+
+@transaction.commit_on_success
+def store_entries(subscription, entries):
+    """
+    Create a remote object and a share activity for each link subscribed
+    to ``subscription`` and each (uri, title, object type) entry, with
+    bulk inserts. Entries already received (hubs retry notifications)
+    are skipped. The cached queries of the activities are invalidated
+    once for the whole batch.
+    """
+    links = list(subscription.link_set.filter(user__isnull=False))
+    uris = [uri for uri, title, object_type in entries]
+    if not (links and uris):
+        return
+    received = set(RemoteObject.objects.filter(link__subscription=subscription,
+        uri__in=uris).values_list('uri', flat=True))
+    new_entries = {}
+    for uri, title, object_type in entries:
+        if uri not in received and uri not in new_entries:
+            new_entries[uri] = (title, object_type)
+    if not new_entries:
+        return
+    bulk_insert([RemoteObject(link=link, title=title, uri=uri,
+        object_type=object_type) for link in links
+        for uri, (title, object_type) in new_entries.items()])
+    # The ids of the remote objects are needed by the activities.
+    remote_objects = RemoteObject.objects.filter(link__in=links,
+        uri__in=new_entries.keys()).values_list('id', 'link')
+    links_by_id = dict((link.id, link) for link in links)
+    content_type = ContentType.objects.get_for_model(RemoteObject)
+    activities = [Activity(actor_id=links_by_id[link_id].user_id,
+        verb=verbs['share'], target_content_type=content_type,
+        target_id=remote_object_id,
+        scope_object_id=links_by_id[link_id].project_id)
+        for remote_object_id, link_id in remote_objects]
+    bulk_insert(activities)
+    # The activities of a link share their actor and project, so one of
+    # them invalidates the queries they could appear in.
+    Activity.objects.invalidate(*[Activity(actor_id=link.user_id,
+        scope_object_id=link.project_id) for link in links])
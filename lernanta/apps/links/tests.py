@@ -2,10 +2,12 @@ import os
 import urllib2
 import feedparser
 from StringIO import StringIO
+from BaseHTTPServer import BaseHTTPRequestHandler
 
 from django_push.subscriber.models import Subscription
 from django.contrib.auth.models import User
 
+from drumbeat.testing import serve
 from links import utils
 from links.tasks import HandleNotification
 from links.models import Link
@@ -18,13 +20,32 @@ from users.models import create_profile
 def mock_open(r):
     return urllib2.HTTPError('request', 204, 'no-op', {}, StringIO(''))
 
-urllib2.urlopen = mock_open
-urllib2.Request = lambda x, y, z: 'request'
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves a page with a large body to test_feed_discovery."""
+    requests = 0
+
+    def do_GET(self):
+        PageHandler.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.end_headers()
+        self.wfile.write('<html><head><link rel="alternate" '
+            'type="application/rss+xml" href="/rss"></head><body>')
+        self.wfile.write('<p>Text</p>' * 10000)
+        self.wfile.write('</body></html>')
+
+    def log_message(self, *args):
+        pass
 
 
 class TestLinkParsing(TestCase):
 
     def setUp(self):
+        # The hub requests are not sent.
+        self.urlopen, self.request = urllib2.urlopen, urllib2.Request
+        urllib2.urlopen = mock_open
+        urllib2.Request = lambda x, y, z: 'request'
         self.fixtures = {}
         root = os.path.dirname(os.path.abspath(__file__))
         fixture_dir = os.path.join(root, 'fixtures')
@@ -37,6 +58,9 @@ class TestLinkParsing(TestCase):
         self.user.set_password('testpassword')
         self.user.save()
 
+    def tearDown(self):
+        urllib2.urlopen, urllib2.Request = self.urlopen, self.request
+
     def test_feed_parser(self):
         """Perform a straightforward test of the feed url parser."""
         html = """
@@ -87,6 +111,24 @@ class TestLinkParsing(TestCase):
         feed_url = utils.parse_feed_url(html)
         self.assertEqual('http://foo.com/atom', feed_url)
 
+    def test_feed_parser_head_only(self):
+        """Test that the links of the body are ignored."""
+        html = """<html><head><title>Test</title></head><body>
+        <link rel="alternate" type="application/rss+xml"
+          href="http://foo.com/rss"></body></html>"""
+        self.assertEqual(None, utils.parse_feed_url(html))
+
+    def test_feed_discovery(self):
+        """Test that only the head is read and the feed url is cached."""
+        urllib2.urlopen, urllib2.Request = self.urlopen, self.request
+        # The second discovery must be answered by the cache.
+        with serve(PageHandler, utils) as base_url:
+            PageHandler.requests = 0
+            for i in range(2):
+                self.assertEqual(base_url + 'rss',
+                    utils.discover_feed_url(base_url + 'blog/'))
+            self.assertEqual(1, PageHandler.requests)
+
     def test_hub_parser(self):
         """Test that we find a hub for a sample hosted WP rss feed."""
         rss = self.fixtures['rss_hub.rss']
@@ -174,3 +216,7 @@ class TestLinkParsing(TestCase):
         handler = HandleNotification()
         handler.run(parsed, sub)
         self.assertEqual(Activity.objects.count(), count + 1)
+        # Notifications sent again by the hub are ignored.
+        handler.run(parsed, sub)
+        self.assertEqual(len(Activity.objects.values_list('id', flat=True)),
+            count + 1)
@@ -1,15 +1,19 @@
+import hashlib
 import urlparse
+from HTMLParser import HTMLParser, HTMLParseError
 
 from xml import sax
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from StringIO import StringIO
 
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.encoding import smart_str
 
-from BeautifulSoup import BeautifulSoup
+from drumbeat import feeds
 
-from django.conf import settings
+
+FEED_URL_CACHE_KEY = 'links_feed_url_%s'
+HUB_URL_CACHE_KEY = 'links_hub_url_%s'
+DISCOVERY_TIMEOUT = 60 * 60 * 24
 
 
 def normalize_url(url, base_url):
@@ -62,46 +66,74 @@ class FeedHandler(sax.ContentHandler):
         raise sax.SAXException('done')  # hacky way to signal that we're done.
 
 
-def parse_feed_url(content, url=None):
+class HeadParser(HTMLParser):
     """
-    Parse the provided html and return the first Atom or RSS feed we find.
-    Note that a preference is given to Atom if the HTML contains links to
-    both.
+    Collect the attributes of the link elements of an html page. Parsing
+    is done once the head is over.
     """
-    soup = BeautifulSoup(content)
-    links = soup.findAll('link')
-
-    # BeautifulSoup instances are not actually dictionaries, so
-    # we can't use the more proper 'key in dict' syntax and
-    # must instead use the deprecated 'has_key()' method.
-    alternates = [link for link in links
-                  if link.has_key('rel') and link['rel'] == 'alternate']
-    get_by_type = lambda t, links: [l for l in links
-                           if l.has_key('type') and l['type'] == t]
-    get_hrefs = lambda links: [l['href'] for l in links if l.has_key('href')]
-    atom = get_by_type('application/atom+xml', alternates)
-    if atom:
-        hrefs = get_hrefs(atom)
-        if hrefs:
-            return normalize_url(hrefs[0], url)
-    rss = get_by_type('application/rss+xml', alternates)
-    if rss:
-        hrefs = get_hrefs(rss)
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.links = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        # The rest of the chunk is still fed to the parser.
+        if self.done:
+            return
+        if tag == 'link':
+            self.links.append(dict(attrs))
+        elif tag == 'body':
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+
+
+def parse_links(chunks):
+    """Return the link elements found in the head of the html ``chunks``."""
+    parser = HeadParser()
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if parser.done:
+                break
+    except HTMLParseError:
+        pass
+    return parser.links
+
+
+def find_feed_url(links, url=None):
+    """
+    Return the first Atom or RSS feed of ``links``. Note that a preference
+    is given to Atom if there are links to both.
+    """
+    alternates = [link for link in links if link.get('rel') == 'alternate'
+        and link.get('href')]
+    for feed_type in ('application/atom+xml', 'application/rss+xml'):
+        hrefs = [link['href'] for link in alternates
+            if link.get('type') == feed_type]
         if hrefs:
             return normalize_url(hrefs[0], url)
     return None
 
 
-def parse_hub_url(content, base_url=None):
-    """Parse the provided xml and find a hub link."""
+def parse_feed_url(content, url=None):
+    """Parse the provided html and return the first feed we find."""
+    return find_feed_url(parse_links([content]), url)
+
+
+def find_hub_url(chunks, base_url=None):
+    """Parse the xml ``chunks`` and find a hub link."""
     handler = FeedHandler()
     parser = sax.make_parser()
     parser.setContentHandler(handler)
     parser.setFeature(sax.handler.feature_namespaces, 1)
-    inpsrc = sax.xmlreader.InputSource()
-    inpsrc.setByteStream(StringIO(content))
     try:
-        parser.parse(inpsrc)
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
     except sax.SAXException:
         pass
     if handler.href is None:
@@ -109,6 +141,42 @@ def parse_hub_url(content, base_url=None):
     return normalize_url(handler.href, base_url)
 
 
+def parse_hub_url(content, base_url=None):
+    """Parse the provided xml and find a hub link."""
+    return find_hub_url([content], base_url)
+
+
+def discover(url, cache_key, find):
+    """
+    Stream the beginning of ``url`` to ``find`` and cache the result.
+    Network errors are raised and not cached.
+    """
+    key = cache_key % hashlib.md5(smart_str(url)).hexdigest()
+    found = cache.get(key)
+    if found is not None:
+        return found or None
+    chunks = feeds.stream(url, getattr(settings,
+        'FEED_DISCOVERY_MAX_BYTES', 64 * 1024))
+    try:
+        found = find(chunks, url)
+    finally:
+        chunks.close()
+    # Urls without a feed or hub are cached too.
+    cache.set(key, found or '', DISCOVERY_TIMEOUT)
+    return found
+
+
+def discover_feed_url(url):
+    """Return the feed of the page at ``url``, reading only its head."""
+    return discover(url, FEED_URL_CACHE_KEY,
+        lambda chunks, url: find_feed_url(parse_links(chunks), url))
+
+
+def discover_hub_url(feed_url):
+    """Return the hub of the feed at ``feed_url``, up to its first entry."""
+    return discover(feed_url, HUB_URL_CACHE_KEY, find_hub_url)
+
+
 def hub_credentials(hub_url):
     """Credentials callback for django_push.subscribers"""
     if hub_url == settings.SUPERFEEDR_URL:
@@ -8,7 +8,7 @@ from projects.models import Project
 from projects.decorators import participation_required, restrict_project_kind
 from projects.decorators import hide_deleted_projects
 
-from links.models import Link
+from links.models import Link, swap_link_indexes
 
 
 @hide_deleted_projects
@@ -26,14 +26,11 @@ def link_index_up(request, slug, counter):
     if not organizing and project.category != Project.STUDY_GROUP:
         messages.error(request, _('You can not change links order.'))
         return http.HttpResponseRedirect(project.get_absolute_url())
-    links = Link.objects.filter(project__pk=project.pk).order_by('index')
-    if counter < 1 or links.count() <= counter:
+    links = list(Link.objects.filter(project__pk=project.pk).order_by(
+        'index').values_list('id', 'index'))
+    if counter < 1 or len(links) <= counter:
         raise http.Http404
-    prev_link = links[counter - 1]
-    link = links[counter]
-    prev_link.index, link.index = link.index, prev_link.index
-    link.save()
-    prev_link.save()
+    swap_link_indexes(links[counter - 1], links[counter])
     return http.HttpResponseRedirect(project.get_absolute_url() + '#links')
 
 
@@ -52,12 +49,9 @@ def link_index_down(request, slug, counter):
     if not organizing and project.category != Project.STUDY_GROUP:
         messages.error(request, _('You can not change links order.'))
         return http.HttpResponseRedirect(project.get_absolute_url())
-    links = Link.objects.filter(project__pk=project.pk).order_by('index')
-    if counter < 0 or links.count() - 1 <= counter:
+    links = list(Link.objects.filter(project__pk=project.pk).order_by(
+        'index').values_list('id', 'index'))
+    if counter < 0 or len(links) - 1 <= counter:
         raise http.Http404
-    next_link = links[counter + 1]
-    link = links[counter]
-    next_link.index, link.index = link.index, next_link.index
-    link.save()
-    next_link.save()
+    swap_link_indexes(links[counter], links[counter + 1])
     return http.HttpResponseRedirect(project.get_absolute_url() + '#links')
@@ -1,5 +1,4 @@
 import time
-import urllib2
 import logging
 import hashlib
 import feedparser
@@ -11,6 +10,7 @@ from django.utils.encoding import smart_str
 from celery.schedules import crontab
 from celery.decorators import periodic_task
 
+from drumbeat.feeds import fetch_feeds, store_validators
 from news.models import FeedEntry
 
 log = logging.getLogger(__name__)
@@ -50,27 +50,24 @@ def parse_entry(entry):
     }
 
 
-def get_feed_entries(feed_url):
-    """Grab the 4 most recent feed entries from the splash page feed URL."""
-    log.debug('Fetching feed from URL %s' % (feed_url,))
-    if not feed_url:
-        log.warn('No feed url defined. Cannot update splash page feed.')
-        return []
-    data = urllib2.urlopen(feed_url).read()
-    feed = feedparser.parse(data)
-    entries = feed.entries[0:4]
-    return entries
-
+def get_feed_entries(content):
+    """Return the 4 most recent entries of the feed ``content``."""
+    feed = feedparser.parse(content)
+    return feed.entries[0:4]
 
-def parse_feed(feed_url, page):
-    ids = []
-    entries = get_feed_entries(feed_url)
 
-    for entry in entries:
+def parse_feed(content, page):
+    """
+    Return the entries of the feed ``content`` as unsaved FeedEntry
+    instances for ``page``.
+    """
+    entries = []
+    for entry in get_feed_entries(content):
         parsed = parse_entry(entry)
         if not parsed:
             log.warn("Parsing feed failed. continuing")
             continue
+        body = None
         if isinstance(parsed['content'], feedparser.FeedParserDict):
             if 'value' in parsed['content'].keys():
                 body = parsed['content']['value']
@@ -81,38 +78,63 @@ def parse_feed(feed_url, page):
             continue
         cleaned_body = smart_str(bleach.clean(body, tags=(), strip=True,
             strip_comments=True))
-        try:
-            checksum = hashlib.md5(cleaned_body).hexdigest()
-            exists = FeedEntry.objects.filter(checksum=checksum)
-            if not exists:
-                entry = FeedEntry(
-                    title=parsed['title'].encode('utf-8'),
-                    link=parsed['link'].encode('utf-8'),
-                    body=cleaned_body,
-                    page=page,
-                    checksum=checksum,
-                    created_on=time.strftime(
-                        "%Y-%m-%d %H:%M:%S", parsed['updated']))
+        entries.append(FeedEntry(
+            title=parsed['title'].encode('utf-8'),
+            link=parsed['link'].encode('utf-8'),
+            body=cleaned_body,
+            page=page,
+            checksum=hashlib.md5(cleaned_body).hexdigest(),
+            created_on=time.strftime(
+                "%Y-%m-%d %H:%M:%S", parsed['updated'])))
+    return entries
+
+
+def store_entries(entries):
+    """
+    Save the ``entries`` which are not stored yet, looking up the existing
+    checksums with one query. Return the ids of all the entries.
+    """
+    existing = dict(FeedEntry.objects.filter(checksum__in=[
+        entry.checksum for entry in entries]).values_list('checksum', 'id'))
+    ids = []
+    for entry in entries:
+        if entry.checksum not in existing:
+            try:
                 entry.save()
-                ids.append(entry.id)
-            else:
-                ids.append(exists[0].id)
-        except:
-            log.warn("Encountered an error creating FeedEntry. Skipping.")
-            continue
+            except:
+                log.warn("Encountered an error creating FeedEntry. Skipping.")
+                continue
+            existing[entry.checksum] = entry.id
+        ids.append(existing[entry.checksum])
     return ids
 
 
 @periodic_task(run_every=crontab(minute=0, hour=0), name='news.tasks.update_feeds')
 def update_feeds():
-    ids = []
     feeds = getattr(settings, 'FEED_URLS', None)
     if not feeds:
         log.debug("No feeds defined, aborting")
         return
+    responses = fetch_feeds(feeds.values())
+    entries = []
+    changed_pages = []
+    parsed = []
     for page, feed_url in feeds.iteritems():
-        parsed = parse_feed(feed_url, page)
-        if parsed:
-            ids.extend(parsed)
-    if ids:
-        FeedEntry.objects.exclude(id__in=ids).delete()
+        response = responses.get(feed_url, None)
+        # Feeds which failed or did not change keep their entries.
+        if response is None or not response.changed:
+            continue
+        log.debug('Parsing feed from URL %s' % (feed_url,))
+        page_entries = parse_feed(response.content, page)
+        if page_entries:
+            changed_pages.append(page)
+            entries.extend(page_entries)
+            parsed.append(response)
+    if entries:
+        ids = store_entries(entries)
+        FeedEntry.objects.filter(page__in=changed_pages).exclude(
+            id__in=ids).delete()
+        # Feeds without entries are requested in full again next time.
+        store_validators(parsed)
+    if responses:
+        FeedEntry.objects.exclude(page__in=feeds.keys()).delete()
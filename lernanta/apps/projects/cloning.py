@@ -0,0 +1,104 @@
+"""
+Creation of a project together with its tasks, links and signup, used when
+cloning a project or importing a course from the old site.
+
+Tasks and links are inserted in bulk, without the per-row post_save
+signals: instead of an activity and a notification email per task a
+single activity is posted for the new project.
+"""
+import datetime
+
+from django.db import transaction
+from django.template.defaultfilters import slugify
+from django.utils.translation import ugettext as _
+
+from drumbeat.utils import bulk_insert, next_free_slug
+from activity.models import Activity
+from activity.schema import verbs
+from content.models import Page
+from links.models import Link
+from relationships.models import Relationship
+from signups.models import Signup
+
+from projects.models import Project, Participation
+
+
+@transaction.commit_on_success
+def create_project(project, user, detailed_description, tasks=(), links=(),
+        sign_up=None):
+    """
+    Save the new ``project`` organized by ``user`` with its content.
+
+    ``tasks`` is a list of (title, content) pairs, ``links`` a list of
+    (name, url) pairs and ``sign_up`` a dict of Signup field values.
+    Everything is created inside one transaction. The creation
+    notification is left to the caller (see ``Project.create``).
+    """
+    project.save()
+    act = Activity(actor=user, verb=verbs['post'], scope_object=project,
+        target_object=project)
+    act.save()
+    participation = Participation(project=project, user=user,
+        organizing=True)
+    participation.save()
+    new_rel, created = Relationship.objects.get_or_create(source=user,
+        target_project=project)
+    new_rel.deleted = False
+    new_rel.save()
+
+    # The project is new so slugs and indexes can be computed in memory.
+    now = datetime.datetime.now()
+    # The full description is looked up by its slug, which must not
+    # depend on the language of the request.
+    pages = [Page(title=_('Full Description'), slug='full-description',
+        content=detailed_description, listed=False, index=0, author=user,
+        project=project, last_update=now)]
+    taken = set([pages[0].slug])
+    for index, (title, content) in enumerate(tasks, 1):
+        slug = next_free_slug(slugify(title), taken)
+        taken.add(slug)
+        pages.append(Page(title=title, slug=slug, content=content,
+            listed=True, index=index, author=user, project=project,
+            last_update=now))
+    bulk_insert(pages)
+    bulk_insert([Link(name=name, url=url, user=user, project=project,
+        index=index) for index, (name, url) in enumerate(links, 1)])
+
+    sign_up = Signup(author=user, project=project, **(sign_up or {}))
+    sign_up.save()
+    project.detailed_description_id = Page.objects.filter(project=project,
+        slug=pages[0].slug).values_list('id', flat=True)[0]
+    project.save()
+    index_pages(project)
+    return project
+
+
+def index_pages(project):
+    """Add the bulk inserted pages of ``project`` to the search index."""
+    from search.indexes import index_object
+    for page in Page.objects.filter(project=project).select_related(
+            'project'):
+        index_object(page)
+
+
+def clone_project(base_project, user):
+    """Create a copy of ``base_project`` organized by ``user``."""
+    project = Project(name=base_project.name,
+        category=base_project.category,
+        other=base_project.other,
+        other_description=base_project.other_description,
+        short_description=base_project.short_description,
+        long_description=base_project.long_description,
+        clone_of=base_project)
+    tasks = Page.objects.filter(project=base_project, listed=True,
+        deleted=False).order_by('index').values_list('title', 'content')
+    links = Link.objects.filter(project=base_project).order_by(
+        'index').values_list('name', 'url')
+    base_sign_up = base_project.sign_up.get()
+    sign_up = {
+        'public': base_sign_up.public,
+        'between_participants': base_sign_up.between_participants,
+    }
+    return create_project(project, user,
+        base_project.detailed_description.content, tasks=list(tasks),
+        links=list(links), sign_up=sign_up)
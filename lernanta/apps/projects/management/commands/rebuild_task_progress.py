@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import Project, TaskProgress
+
+
+class Command(BaseCommand):
+    args = '[project_slug ...]'
+    help = ('Recompute the task progress of the users of the given '
+        'challenges (all challenges by default).')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.filter(category=Project.CHALLENGE)
+        if args:
+            projects = projects.filter(slug__in=args)
+        count = 0
+        for project in projects.iterator():
+            count += len(TaskProgress.objects.refresh(project))
+        self.stdout.write('Updated the progress of %d users.\n' % count)
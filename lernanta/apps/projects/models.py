@@ -5,19 +5,20 @@ from django.core.cache import cache
 from django.core.validators import MaxLengthValidator
 from django.conf import settings
 from django.db import models
-from django.db.models import Count, Max, Q
+from django.db.models import Count, Max, Q, F
 from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext_lazy as _
 from django.template.loader import render_to_string
 from django.contrib.sites.models import Site
 from django.core.mail import send_mail
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 
 from taggit.managers import TaggableManager
 
 from drumbeat import storage
 from drumbeat.utils import get_partition_id, safe_filename
+from drumbeat.utils import save_with_unique_slug
 from drumbeat.models import ModelBase
 from relationships.models import Relationship
 from activity.models import Activity, RemoteObject, register_filter
@@ -242,17 +243,11 @@ class Project(ModelBase):
 
     def save(self):
         """Make sure each project has a unique slug."""
-        count = 1
         if not self.slug:
-            slug = slugify(self.name)
-            self.slug = slug
-            while True:
-                existing = Project.objects.filter(slug=self.slug)
-                if len(existing) == 0:
-                    break
-                self.slug = "%s-%s" % (slug, count + 1)
-                count += 1
-        super(Project, self).save()
+            save_with_unique_slug(self, slugify(self.name),
+                super(Project, self).save)
+        else:
+            super(Project, self).save()
 
     def set_duration(self, value):
         """Sets (without saving) duration in hours and minutes given a decimal value.
@@ -301,27 +296,20 @@ class Project(ModelBase):
         return self.school
 
     def check_tasks_completion(self, user):
-        total_count = self.pages.filter(listed=True,
-            deleted=False).count()
-        completed_count = PerUserTaskCompletion.objects.filter(
-            page__project=self, page__deleted=False,
-            unchecked_on__isnull=True, user=user).count()
-        if total_count == completed_count:
+        progress = TaskProgress.objects.get_progress(self, user)
+        if progress.completed_on:
             for badge in self.completion_badges.all():
                 badge.award_to(user)
 
+    def get_completed_count(self, user):
+        """Number of tasks of the project completed by ``user``."""
+        return TaskProgress.objects.get_progress(self, user).completed_count
+
     def completed_tasks_users(self):
-        total_count = self.pages.filter(listed=True,
-            deleted=False).count()
-        completed_stats = PerUserTaskCompletion.objects.filter(
-            page__project=self, page__deleted=False,
-            unchecked_on__isnull=True).values(
-            'user__username').annotate(completed_count=Count('page')).filter(
-            completed_count=total_count)
-        usernames = completed_stats.values(
-            'user__username')
-        return Relationship.objects.filter(source__username__in=usernames,
-            target_project=self, source__deleted=False)
+        # Not cached: saving the task progress does not invalidate it.
+        return Relationship.objects.filter(target_project=self,
+            source__deleted=False, source__task_progress__project=self,
+            source__task_progress__completed_on__isnull=False).no_cache()
 
     def get_badges(self):
         from badges.models import Badge
@@ -339,71 +327,6 @@ class Project(ModelBase):
             logic__min_votes=1, logic__min_avg_rating=0).exclude(
             logic__submission_style=Logic.SUBMISSION_REQUIRED)
 
-    def get_upon_completion_badges(self, user):
-        from badges.models import Badge, Award
-        if user.is_authenticated():
-            profile = user.get_profile()
-            awarded_badges = Award.objects.filter(
-                user=profile).values('badge_id')
-            self_completion_badges = self.completion_badges.all()
-            upon_completion_badges = []
-            for badge in self_completion_badges:
-                missing_prerequisites = badge.prerequisites.exclude(
-                    id__in=awarded_badges).exclude(
-                    id__in=self_completion_badges.values('id'))
-                if not missing_prerequisites.exists():
-                    upon_completion_badges.append(badge.id)
-            return Badge.objects.filter(id__in=upon_completion_badges)
-        else:
-            return Badge.objects.none()
-
-    def get_awarded_badges(self, user, exclude_completion_badges=False):
-        from badges.models import Badge, Award
-        if user.is_authenticated():
-            profile = user.get_profile()
-            project_badges = self.get_badges()
-            if exclude_completion_badges:
-                completion_badges = self.completion_badges.all()
-                project_badges = project_badges.exclude(
-                    id__in=completion_badges.values('id'))
-            awarded_badges = Award.objects.filter(
-                user=profile).values('badge_id')
-            return project_badges.filter(
-                id__in=awarded_badges)
-        else:
-            return Badge.objects.none()
-
-    def get_badges_in_progress(self, user):
-        from badges.models import Badge, Award, Submission
-        if user.is_authenticated():
-            profile = user.get_profile()
-            awarded_badges = Award.objects.filter(
-                user=profile).values('badge_id')
-            attempted_badges = Submission.objects.filter(
-                author=profile, pending=True).values('badge_id')
-            return self.badges.filter(
-                id__in=attempted_badges).exclude(
-                id__in=awarded_badges)
-        else:
-            return Badge.objects.none()
-
-    def get_non_attempted_badges(self, user):
-        from badges.models import Badge, Award, Submission
-        if user.is_authenticated():
-            profile = user.get_profile()
-            awarded_badges = Award.objects.filter(
-                user=profile).values('badge_id')
-            attempted_badges = Submission.objects.filter(
-                author=profile).values('badge_id')
-            project_badges = self.get_submission_enabled_badges()
-            # Excluding both awarded and attempted badges
-            # In case honorary award do not rely on submissions.
-            return project_badges.exclude(
-                id__in=attempted_badges).exclude(
-                id__in=awarded_badges)
-        else:
-            return Badge.objects.none()
-
     def get_non_started_next_projects(self, user):
         """To be displayed in the Join Next Challenges section."""
         if user.is_authenticated():
@@ -531,22 +454,159 @@ class PerUserTaskCompletion(ModelBase):
     url = models.URLField(max_length=1023, blank=True, null=True)
 
 
+class TaskProgressManager(models.Manager):
+
+    def get_progress(self, project, user):
+        """Return the progress of ``user``, computing it if missing."""
+        try:
+            return self.get(project=project, user=user)
+        except TaskProgress.DoesNotExist:
+            return self.refresh(project, users=[user])[0]
+
+    def add_completed(self, project, user, delta):
+        """Add ``delta`` to the completed tasks count of ``user``."""
+        updated = self.filter(project=project, user=user).update(
+            completed_count=F('completed_count') + delta)
+        if not updated:
+            return self.refresh(project, users=[user])[0]
+        progress = self.get(project=project, user=user)
+        if progress.is_completed() != bool(progress.completed_on):
+            progress.completed_on = (datetime.datetime.now()
+                if progress.is_completed() else None)
+            progress.save()
+        return progress
+
+    def get_total_count(self, project):
+        """
+        The number of listed tasks of ``project``. An aggregate, since the
+        cached ``count()`` is not invalidated when a task is added.
+        """
+        return project.pages.filter(listed=True,
+            deleted=False).aggregate(total=Count('id'))['total']
+
+    def refresh(self, project, users=None):
+        """
+        Recompute the progress of ``users`` (all users with progress or
+        completed tasks by default) in the project from the task
+        completions. Returns the list of progress rows.
+        """
+        total_count = self.get_total_count(project)
+        completions = PerUserTaskCompletion.objects.filter(
+            page__project=project, page__listed=True, page__deleted=False,
+            unchecked_on__isnull=True)
+        progress_list = self.filter(project=project)
+        if users is not None:
+            completions = completions.filter(user__in=users)
+            progress_list = progress_list.filter(user__in=users)
+        completed = dict(completions.values_list('user').annotate(
+            Count('page')).order_by())
+        existing = dict((progress.user_id, progress)
+            for progress in progress_list)
+        if users is None:
+            user_ids = set(completed) | set(existing)
+        else:
+            user_ids = set(user.id for user in users)
+        now = datetime.datetime.now()
+        result = []
+        for user_id in user_ids:
+            progress = existing.get(user_id, None)
+            if progress is None:
+                progress = TaskProgress(project=project, user_id=user_id)
+            old = (progress.completed_count, progress.total_count,
+                progress.completed_on)
+            progress.completed_count = completed.get(user_id, 0)
+            progress.total_count = total_count
+            if not progress.is_completed():
+                progress.completed_on = None
+            elif not progress.completed_on:
+                progress.completed_on = now
+            if not progress.id or old != (progress.completed_count,
+                    progress.total_count, progress.completed_on):
+                progress.save()
+            result.append(progress)
+        return result
+
+
+class TaskProgress(models.Model):
+    """
+    Number of listed tasks of a challenge completed by a user. Kept up to
+    date from the task completions and the task list. Not cached by
+    cache-machine since the counters are updated in place.
+    """
+    user = models.ForeignKey('users.UserProfile',
+        related_name='task_progress')
+    project = models.ForeignKey('projects.Project',
+        related_name='task_progress')
+    completed_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+    # When the user completed all the tasks.
+    completed_on = models.DateTimeField(blank=True, null=True)
+
+    objects = TaskProgressManager()
+
+    class Meta:
+        unique_together = (('user', 'project'),)
+
+    def is_completed(self):
+        return bool(self.total_count) and (
+            self.completed_count >= self.total_count)
+
+    def get_progressbar_value(self):
+        if not self.total_count:
+            return 0
+        return min(self.completed_count, self.total_count) * 100 / (
+            self.total_count)
+
+
 ###########
 # Signals #
 ###########
 
 def check_tasks_completion(sender, **kwargs):
     instance = kwargs.get('instance', None)
+    created = kwargs.get('created', False)
     if isinstance(instance, PerUserTaskCompletion):
+        if created and not instance.unchecked_on:
+            delta = 1
+        elif not created and instance.unchecked_on:
+            delta = -1
+        else:
+            # Only the submitted url changed.
+            return
         project = instance.page.project
         user = instance.user
-        project.check_tasks_completion(user)
+        TaskProgress.objects.add_completed(project, user, delta)
+        if delta > 0:
+            project.check_tasks_completion(user)
 
 
 post_save.connect(check_tasks_completion, sender=PerUserTaskCompletion,
     dispatch_uid='projects_check_tasks_completion')
 
 
+def update_tasks_total(sender, **kwargs):
+    """Refresh the progress of the project's users when tasks are added,
+    deleted or unlisted."""
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, Page):
+        try:
+            project = instance.project
+        except Project.DoesNotExist:
+            # The whole project is being deleted.
+            return
+        total_count = TaskProgress.objects.get_total_count(project)
+        stale = TaskProgress.objects.filter(project=project).exclude(
+            total_count=total_count)
+        if stale.exists():
+            TaskProgress.objects.refresh(project)
+
+
+post_save.connect(update_tasks_total, sender=Page,
+    dispatch_uid='projects_update_tasks_total')
+post_delete.connect(update_tasks_total, sender=Page,
+    dispatch_uid='projects_update_tasks_total_delete')
+
+
 def post_save_project(sender, **kwargs):
     instance = kwargs.get('instance', None)
     created = kwargs.get('created', False)
@@ -1,10 +1,9 @@
 import datetime
 
 from django import template
-from django.db.models import Q
 from django.contrib.sites.models import Site
 
-from content.models import Page
+from content.models import Page, get_recent_activity
 from signups.models import Signup
 from statuses import forms as statuses_forms
 from activity.views import filter_activities
@@ -14,7 +13,7 @@ from l10n.urlresolvers import reverse
 
 from projects.models import Project, PerUserTaskCompletion
 from projects import drupal
-from badges.models import Badge
+from badges.state import BadgeStateEvaluator
 from schools.models import ProjectSet
 
 
@@ -120,12 +119,18 @@ def task_list(project, user, show_all_tasks=True, short_list_length=3):
         is_organizing = project.organizers().filter(user=profile).exists()
         is_participating = project.participants().filter(user=profile).exists()
         if is_participating:
+            tasks = list(tasks)
+            done = set(PerUserTaskCompletion.objects.filter(user=profile,
+                page__in=[task.id for task in tasks],
+                unchecked_on__isnull=True).values_list('page_id', flat=True))
             for task in tasks:
-                task.is_done = PerUserTaskCompletion.objects.filter(
-                    user=profile, page=task, unchecked_on__isnull=True)
-        completed_count = PerUserTaskCompletion.objects.filter(
-            page__project=project, page__deleted=False,
-            unchecked_on__isnull=True, user=profile).count()
+                task.is_done = (task.id in done)
+        completed_count = project.get_completed_count(profile)
+    if is_challenge:
+        tasks = list(tasks)
+        activity = get_recent_activity(tasks)
+        for task in tasks:
+            task.task_activity = activity[task.id]
     progressbar_value = 0
     if tasks_count:
         progressbar_value = (completed_count * 100 / tasks_count)
@@ -148,18 +153,13 @@ register.inclusion_tag('projects/_task_list.html')(task_list)
 
 def tasks_completed_msg(project, user, start_hidden=True,
         adopter_request=True):
-    awarded_non_completion_badges = project.get_awarded_badges(
-        user, exclude_completion_badges=True)
-    awarded_completion_badges = project.get_upon_completion_badges(
-        user)
+    state = BadgeStateEvaluator.for_user(user).evaluate_project(project)
     # Manually include self+completed badges so they are in the awarded badges
     # list that is displayed when all tasks are completed (even if the django
     # post save signal that awards those badges has not run yet).
-    awarded_badges = Badge.objects.filter(
-        Q(id__in=awarded_non_completion_badges.values('id'))
-        | Q(id__in=awarded_completion_badges.values('id')))
-    badges_in_progress = project.get_badges_in_progress(user)
-    non_attempted_badges = project.get_non_attempted_badges(user)
+    awarded_badges = state.get_awarded_with_completion()
+    badges_in_progress = state.in_progress
+    non_attempted_badges = state.non_attempted
     non_started_challenges = project.get_non_started_next_projects(
         user)
     next_challenges = project.next_projects.all()
@@ -229,9 +229,7 @@ def tasks_list_wall(request, project, user, toggled_tasks=True):
         is_organizing = project.organizers().filter(user=profile).exists()
         adopter = project.adopters().filter(user=profile).exists()
         is_participating = project.participants().filter(user=profile).exists()
-        completed_count = PerUserTaskCompletion.objects.filter(
-            page__project=project, page__deleted=False,
-            unchecked_on__isnull=True, user=profile).count()
+        completed_count = project.get_completed_count(profile)
     progressbar_value = 0
     if tasks_count:
         progressbar_value = (completed_count * 100 / tasks_count)
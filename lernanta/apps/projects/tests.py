@@ -1,12 +1,58 @@
+import os
+import shutil
+import datetime
+import tempfile
+from BaseHTTPServer import BaseHTTPRequestHandler
+
+from lxml import html
+
+from django.conf import settings
 from django.test import Client
 from django.contrib.auth.models import User
+from django.utils import simplejson
 
 from users.models import create_profile
-from projects.models import Project
+from projects.models import Project, PerUserTaskCompletion, TaskProgress
+from projects.cloning import create_project, clone_project
+from projects.utils import strip_remote_images
+from activity.models import Activity
+from relationships.models import Relationship
+from activity.schema import verbs
+from content.models import Page
+from badges.models import Badge, Logic, Submission, Award
+from badges.state import BadgeStateEvaluator
+from badges.graph import PrerequisiteGraph
+from drumbeat.testing import serve
 
 from test_utils import TestCase
 
 
+GIF = ('GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!'
+    '\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00'
+    '\x02\x02D\x01\x00;')
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Serves the images of test_strip_remote_images."""
+
+    def do_GET(self):
+        if self.path.split('?')[0].endswith('.gif'):
+            content_type = 'image/gif'
+            body = GIF
+            if 'large' in self.path:
+                body += '\x00' * settings.MAX_IMAGE_SIZE
+        else:
+            content_type = 'text/html'
+            body = '<p>Not an image</p>'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
 class ProjectTests(TestCase):
 
     test_username = 'testuser'
@@ -106,3 +152,131 @@ class ProjectTests(TestCase):
         self.assertFalse(under_dev_project in listed_projects)
         self.assertFalse(test_project in listed_projects)
         self.assertTrue(project in listed_projects)
+
+    def test_matching_projects(self):
+        project = Project(name='Open Knitting', short_description='Knit',
+            long_description='Knit in the open')
+        project.save()
+        deleted = Project(name='Open Knots', short_description='Knots',
+            long_description='Old knots', deleted=True)
+        deleted.save()
+        self.client.login(username=self.test_username,
+            password=self.test_password)
+        response = self.client.get('/%s/groups/clone/matching_projects/' % (
+            self.locale), {'term': 'kn'})
+        self.assertEqual(['open-knitting'], simplejson.loads(response.content))
+        project.name = 'Open Sewing'
+        project.slug = 'open-sewing'
+        project.save()
+        response = self.client.get('/%s/groups/clone/matching_projects/' % (
+            self.locale), {'term': 'sew'})
+        self.assertEqual(['open-sewing'], simplejson.loads(response.content))
+
+    def test_clone_project(self):
+        base_project = Project(name='Base Project',
+            short_description='Base', long_description='Base project')
+        create_project(base_project, self.user, 'Full description',
+            tasks=[('Task', 'First'), ('Task', 'Second')],
+            links=[('P2PU', 'http://p2pu.org/')],
+            sign_up={'public': 'Sign up'})
+        project = clone_project(base_project, self.user)
+        self.assertEqual(base_project, project.clone_of)
+        self.assertEqual('Full description',
+            project.detailed_description.content)
+        tasks = project.pages.filter(listed=True).order_by('index')
+        self.assertEqual([('task', 1), ('task-2', 2)],
+            [(task.slug, task.index) for task in tasks])
+        self.assertEqual(['http://p2pu.org/'],
+            [link.url for link in project.link_set.all()])
+        self.assertEqual('Sign up', project.sign_up.get().public)
+        self.assertEqual(1, Activity.objects.filter(scope_object=project,
+            verb=verbs['post']).count())
+
+    def test_task_progress(self):
+        project = Project(name='Challenge', short_description='Challenge',
+            long_description='Challenge', category=Project.CHALLENGE)
+        project.save()
+        Relationship(source=self.user, target_project=project).save()
+        tasks = []
+        for i in xrange(2):
+            task = Page(author=self.user, project=project,
+                title='Task %s' % i, content='Task %s' % i)
+            task.save()
+            tasks.append(task)
+        completion = PerUserTaskCompletion(user=self.user, page=tasks[0])
+        completion.save()
+        progress = TaskProgress.objects.get(project=project, user=self.user)
+        self.assertEqual((1, 2), (progress.completed_count,
+            progress.total_count))
+        self.assertFalse(progress.completed_on)
+        PerUserTaskCompletion(user=self.user, page=tasks[1]).save()
+        progress = TaskProgress.objects.get(project=project, user=self.user)
+        self.assertTrue(progress.completed_on)
+        self.assertTrue(project.completed_tasks_users().exists())
+        completion.unchecked_on = datetime.datetime.now()
+        completion.save()
+        self.assertEqual(1, project.get_completed_count(self.user))
+        self.assertFalse(project.completed_tasks_users().exists())
+        tasks[0].deleted = True
+        tasks[0].save()
+        progress = TaskProgress.objects.get(project=project, user=self.user)
+        self.assertEqual((1, 1), (progress.completed_count,
+            progress.total_count))
+        self.assertTrue(progress.completed_on)
+
+    def test_badge_state(self):
+        project = Project(name='Challenge', short_description='Challenge',
+            long_description='Challenge', category=Project.CHALLENGE)
+        project.save()
+        logic = Logic(name='Optional',
+            submission_style=Logic.SUBMISSION_OPTIONAL)
+        logic.save()
+        badges = []
+        for name in ('Completion', 'Skill', 'Advanced'):
+            badge = Badge(name=name, description=name, logic=logic)
+            badge.save()
+            badge.groups.add(project)
+            badges.append(badge)
+        completion, skill, advanced = badges
+        project.completion_badges.add(completion)
+        advanced.prerequisites.add(skill)
+        Submission(url='http://p2pu.org/', content='Work', author=self.user,
+            badge=skill).save()
+        evaluator = BadgeStateEvaluator(self.user)
+        state = evaluator.evaluate_project(project)
+        self.assertEqual([completion], state.get_awarded_with_completion())
+        self.assertEqual([skill], state.in_progress)
+        self.assertEqual(set([completion, advanced]),
+            set(state.non_attempted))
+        self.assertFalse(evaluator.is_eligible(advanced))
+        Award(user=self.user, badge=skill).save()
+        evaluator = BadgeStateEvaluator(self.user)
+        self.assertEqual([advanced],
+            evaluator.get_badges_can_apply([skill, advanced]))
+
+    def test_badge_prerequisite_graph(self):
+        graph = PrerequisiteGraph([(3, 2), (2, 1), (4, 1)])
+        self.assertEqual(set([2]), graph.get_prerequisites(3))
+        self.assertEqual([1, 2, 4], graph.get_eligible([1, 2, 3, 4], [1]))
+        self.assertEqual(set([2]), graph.get_missing(3, [1]))
+
+    def test_strip_remote_images(self):
+        old_media_root = settings.MEDIA_ROOT
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        try:
+            with serve(ImageHandler) as base_url:
+                content = ''.join('<img src="%s%s">' % (base_url, name)
+                    for name in ('a.gif', 'b.gif?x=1&y=2', 'large.gif',
+                    'page.html'))
+                content = strip_remote_images(content)
+            tree = html.fromstring(content)
+            urls = [img.get('src') for img in tree.xpath('//img')]
+            # The two copies of the same image are stored once.
+            self.assertEqual(urls[0], urls[1])
+            self.assertTrue(urls[0].startswith(settings.MEDIA_URL))
+            self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT,
+                urls[0][len(settings.MEDIA_URL):])))
+            self.assertEqual(['', ''], urls[2:])
+        finally:
+            shutil.rmtree(settings.MEDIA_ROOT)
+            settings.MEDIA_ROOT = old_media_root
@@ -1,32 +1,24 @@
 import os
+import re
+import socket
+import hashlib
+import httplib
 import tempfile
 import urllib2
 import Image
 import logging
 import datetime
 import simplejson
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
 
 from lxml import html
 
 from django.conf import settings
 
-from drumbeat.utils import get_partition_id, safe_filename
-
 log = logging.getLogger(__name__)
 
 
-def determine_image_upload_path(instance, filename):
-    return "images/projects/%(partition)d/%(filename)s" % {
-        'partition': get_partition_id(instance.pk),
-        'filename': safe_filename(filename),
-    }
-
-
-class Mock(object):
-
-    def __init__(self, pk):
-        self.pk = pk
-
 format_extensions = {
     'PNG': 'png',
     'GIF': 'gif',
@@ -43,109 +35,164 @@ mime_types_extensions = {
 
 image_mime_types = mime_types_extensions.keys()
 
+# Remote images are stored once, named after the hash of their content.
+REMOTE_IMAGES_PATH = 'images/remote'
 
-def copy_image(image_url):
+CHUNK_SIZE = 64 * 1024
+
+
+def download_image(image_url):
     """
-    Download an image into a temp file, transcode the image and save it in
-    the project image directory.
+    Return the content of the image at ``image_url``, or None if it can not
+    be downloaded, is not an image or is larger than MAX_IMAGE_SIZE.
     """
+    max_image_size = getattr(settings, 'MAX_IMAGE_SIZE', None)
+    if not max_image_size:
+        log.warn("No MAX_IMAGE_SIZE set")
+        return None
+    timeout = getattr(settings, 'REMOTE_IMAGE_TIMEOUT', 5)
     try:
-        image_fp = urllib2.urlopen(image_url, timeout=5)
-    except urllib2.URLError:
-        log.warn("Error opening %s. Returning." % (image_url,))
+        image_fp = urllib2.urlopen(image_url, timeout=timeout)
+    except (urllib2.URLError, ValueError, socket.error), e:
+        log.warn("Error opening %s: %s. Returning." % (image_url, e))
         return None
-
-    if not image_fp:
-        log.warn("Error opening %s. Returning." % (image_url,))
+    try:
+        headers = image_fp.info()
+        # check that file is not too large and is an image.
+        content_type = headers.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in image_mime_types:
+            log.warn("Content-type of %s not an allowable mime type. "
+                "Returning" % (image_url,))
+            return None
+        content_length = headers.get('Content-Length', None)
+        if content_length and int(content_length) > max_image_size:
+            log.warn("Content-length of %s exceeds max allowable size. "
+                "Returning" % (image_url,))
+            return None
+        chunks = []
+        downloaded = 0
+        while True:
+            chunk = image_fp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            downloaded += len(chunk)
+            if downloaded > max_image_size:
+                log.warn("%s exceeds max allowable size. Returning" % (
+                    image_url,))
+                return None
+            chunks.append(chunk)
+    except (socket.error, ValueError, httplib.HTTPException), e:
+        log.warn("Error downloading %s: %s. Returning." % (image_url, e))
         return None
-    headers = image_fp.info()
+    finally:
+        image_fp.close()
+    return ''.join(chunks)
 
-    max_image_size = getattr(settings, 'MAX_IMAGE_SIZE', None)
-    if not max_image_size:
-        log.warn("No MAX_IMAGE_SIZE set")
+
+def store_image(data):
+    """
+    Save the image content ``data`` in the remote images directory, unless
+    an image with the same content is there. Return its path relative to
+    MEDIA_ROOT or None if ``data`` is not an image.
+    """
+    try:
+        image = Image.open(StringIO(data))
+    except IOError:
+        return None
+    if image.format not in format_extensions:
         return None
+    digest = hashlib.sha1(data).hexdigest()
+    image_path = '%s/%s/%s.%s' % (REMOTE_IMAGES_PATH, digest[:2], digest,
+        format_extensions[image.format])
+    destination = os.path.join(settings.MEDIA_ROOT, image_path)
+    if os.path.exists(destination):
+        return image_path
+    directory = os.path.dirname(destination)
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another thread.
+            pass
+    # Written under a temporary name so other threads never see it half
+    # written.
+    tmpfile, tmpfile_name = tempfile.mkstemp(dir=directory)
+    tmpfile_fp = os.fdopen(tmpfile, 'wb')
+    try:
+        tmpfile_fp.write(data)
+    finally:
+        tmpfile_fp.close()
+    os.chmod(tmpfile_name, 0644)
+    os.rename(tmpfile_name, destination)
+    return image_path
+
 
-    # check that file is not too large and is an image.
-    if 'Content-Length' not in headers:
-        log.warn("No content-length in headers. Returning")
+def copy_image(image_url):
+    """
+    Download an image and save it in the remote images directory. Return
+    its local url or None.
+    """
+    data = download_image(image_url)
+    if data is None:
         return None
-    if int(headers['Content-Length']) > max_image_size:
-        log.warn("Content-length header exceeds max allowable size. Returning")
+    try:
+        image_path = store_image(data)
+    except (IOError, OSError), e:
+        log.warn("Error storing remote image %s: %s" % (image_url, e))
         return None
-    if headers['Content-Type'] not in image_mime_types:
-        log.warn("Content-type header not an allowable mime type. Returning")
+    if image_path is None:
+        log.warn("%s is not a valid image." % (image_url,))
         return None
+    return settings.MEDIA_URL + image_path
 
-    tmpfile, tmpfile_name = tempfile.mkstemp()
-    tmpfile_fp = os.fdopen(tmpfile, 'w+b')
-
-    downloaded = 0
-    chunk_size = 1024
-    while True:
-        chunk = image_fp.read(chunk_size)
-        if not chunk:
-            break
-        downloaded += chunk_size
-        if downloaded > max_image_size:
-            tmpfile_fp.close()
-            image_fp.close()
-            os.unlink(tmpfile_fp)
-            return None
-        tmpfile_fp.write(chunk)
-
-    tmpfile_fp.close()
-    image_fp.close()
 
-    return tmpfile_name
+def copy_images(image_urls):
+    """
+    Copy the images at ``image_urls`` with a pool of
+    REMOTE_IMAGE_FETCH_THREADS threads. Return a dict with the local url
+    of each of them (empty if the image could not be copied).
+    """
+    image_urls = list(set(url for url in image_urls if url))
+    if not image_urls:
+        return {}
+    threads = min(len(image_urls),
+        getattr(settings, 'REMOTE_IMAGE_FETCH_THREADS', 8))
+    pool = ThreadPool(threads)
+    try:
+        local_urls = pool.map(copy_image, image_urls)
+    finally:
+        pool.close()
+    return dict((url, local_url or '')
+        for url, local_url in zip(image_urls, local_urls))
+
+
+def replace_urls(content, urls):
+    """Replace in ``content`` the keys of the ``urls`` dict by their values."""
+    if not urls:
+        return content
+    replacements = {}
+    for old, new in urls.items():
+        replacements[old] = new
+        # markdown replaces & with &amp; even if it's part of a querystring
+        replacements[old.replace('&', '&amp;')] = new
+    # Longest first, so urls which are prefixes of others do not match.
+    pattern = re.compile('|'.join(re.escape(old) for old in sorted(
+        replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], content)
 
 
-def strip_remote_images(content, pk):
+def strip_remote_images(content):
     """
-    Find all img tags in content. Download the image referred to in the src
-    attribute, run it through PIL to strip out any comments, and replace
-    the attribute value with a local url.
+    Find all img tags in content, copy the images referred to in the src
+    attribute and replace the attribute value with a local url.
     """
+    if not getattr(settings, 'MEDIA_ROOT', None) or not getattr(settings,
+            'MEDIA_URL', None):
+        return None
     tree = html.fromstring(content)
     img_urls = [img.get('src', None) for img in tree.xpath('//img')]
+    return replace_urls(content, copy_images(img_urls))
 
-    media_root = getattr(settings, 'MEDIA_ROOT', None)
-    media_url = getattr(settings, 'MEDIA_URL', None)
-
-    if not media_root or not media_url:
-        return None
-
-    new_urls = []
-    for img_url in img_urls:
-        tmpfile = copy_image(img_url)
-        if tmpfile is None:
-            new_urls.append("")
-            continue
-        try:
-            image_basename = img_url.split('/')[-1]
-            image_path = determine_image_upload_path(Mock(pk), image_basename)
-            destination = os.path.join(media_root, image_path)
-
-            image = Image.open(tmpfile)
-            basename, ext = os.path.splitext(destination)
-            if (ext[1:] not in mime_types_extensions.values()):
-                destination = "%s.%s" % (
-                    basename, format_extensions[image.format])
-            image.save(destination, image.format)
-            new_urls.append(os.path.join(media_url, image_path))
-        except Exception, e:
-            log.warn("Error stripping out remote image: %s" % (e,))
-            new_urls.append("")
-        finally:
-            os.unlink(tmpfile)
-
-    for i in range(len(img_urls)):
-        # markdown replaces & with &amp; even if it's part of a querystring
-        old = img_urls[i].replace('&', '&amp;')
-        new = new_urls[i]
-        log.debug("replacing %s with %s" % (old, new))
-        content = content.replace(old, new)
-
-    return content
 
 def json_date_encoder(obj):
     if isinstance(obj, datetime.date):
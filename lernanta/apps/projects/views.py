@@ -24,6 +24,7 @@ from projects.decorators import can_view_metric_overview, can_view_metric_detail
 from projects.decorators import restrict_project_kind, hide_deleted_projects
 from projects.models import Project, Participation, PerUserTaskCompletion
 from projects import drupal
+from projects.cloning import create_project, clone_project
 
 from l10n.urlresolvers import reverse
 from relationships.models import Relationship
@@ -39,7 +40,7 @@ from tracker import models as tracker_models
 from reviews.models import Review
 from utils import json_date_encoder
 
-from drumbeat import messages
+from drumbeat import messages, autocomplete
 from users.decorators import login_required
 
 log = logging.getLogger(__name__)
@@ -297,50 +298,7 @@ def clone(request):
         form = project_forms.CloneProjectForm(request.POST)
         if form.is_valid():
             base_project = form.cleaned_data['project']
-            #CS - too much logic in view
-            project = Project(name=base_project.name,
-                category=base_project.category,
-                other=base_project.other,
-                other_description=base_project.other_description,
-                short_description=base_project.short_description,
-                long_description=base_project.long_description,
-                clone_of=base_project)
-            project.save()
-            act = Activity(actor=user,
-                verb=verbs['post'],
-                scope_object=project,
-                target_object=project)
-            act.save()
-            participation = Participation(project=project, user=user,
-                organizing=True)
-            participation.save()
-            new_rel, created = Relationship.objects.get_or_create(source=user,
-                target_project=project)
-            new_rel.deleted = False
-            new_rel.save()
-            detailed_description = Page(title=_('Full Description'),
-                slug='full-description',
-                content=base_project.detailed_description.content,
-                listed=False, author_id=user.id, project_id=project.id)
-            detailed_description.save()
-            project.detailed_description_id = detailed_description.id
-            base_sign_up = base_project.sign_up.get()
-            sign_up = Signup(public=base_sign_up.public,
-                between_participants=base_sign_up.between_participants,
-                author_id=user.id, project_id=project.id)
-            sign_up.save()
-            project.save()
-            tasks = Page.objects.filter(project=base_project, listed=True,
-                deleted=False).order_by('index')
-            for task in tasks:
-                new_task = Page(title=task.title, content=task.content,
-                    author=user, project=project)
-                new_task.save()
-            links = Link.objects.filter(project=base_project).order_by('index')
-            for link in links:
-                new_link = Link(name=link.name, url=link.url, user=user,
-                    project=project)
-                new_link.save()
+            project = clone_project(base_project, user)
             project.create()
             messages.success(request,
                 _('The %s has been cloned.') % project.kind.lower())
@@ -362,9 +320,8 @@ def matching_projects(request):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    matching_projects = Project.objects.filter(deleted=False,
-        slug__icontains=request.GET['term'])
-    json = simplejson.dumps([project.slug for project in matching_projects])
+    matching_projects = autocomplete.projects.search(request.GET['term'])
+    json = simplejson.dumps(matching_projects)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -376,46 +333,19 @@ def import_from_old_site(request):
         form = project_forms.ImportProjectForm(request.POST)
         if form.is_valid():
             course = form.cleaned_data['course']
-            #CS - too much logic in view
             project = Project(name=course['name'], kind=course['kind'],
                 short_description=course['short_description'],
                 long_description=course['long_description'],
                 imported_from=course['slug'])
-            project.save()
-            act = Activity(actor=user,
-                verb=verbs['post'],
-                scope_object=project,
-                target_object=project)
-            act.save()
-            participation = Participation(project=project, user=user,
-                organizing=True)
-            participation.save()
-            new_rel, created = Relationship.objects.get_or_create(source=user,
-                target_project=project)
-            new_rel.deleted = False
-            new_rel.save()
             if course['detailed_description']:
                 detailed_description_content = course['detailed_description']
             else:
                 detailed_description_content = render_to_string(
                     "projects/detailed_description_initial_content.html",
                     {'project': project})
-            detailed_description = Page(title=_('Full Description'),
-                slug='full-description', content=detailed_description_content,
-                listed=False, author_id=user.id, project_id=project.id)
-            detailed_description.save()
-            project.detailed_description_id = detailed_description.id
-            sign_up = Signup(between_participants=course['sign_up'],
-                author_id=user.id, project_id=project.id)
-            sign_up.save()
-            project.save()
-            for title, content in course['tasks']:
-                new_task = Page(title=title, content=content, author=user,
-                    project=project)
-                new_task.save()
-            for name, url in course['links']:
-                new_link = Link(name=name, url=url, user=user, project=project)
-                new_link.save()
+            create_project(project, user, detailed_description_content,
+                tasks=course['tasks'], links=course['links'],
+                sign_up={'between_participants': course['sign_up']})
             project.create()
             messages.success(request,
                 _('The %s has been imported.') % project.kind.lower())
@@ -646,11 +576,11 @@ def matching_non_participants(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    non_participants = UserProfile.objects.filter(deleted=False).exclude(
-        id__in=project.participants().values('user_id'))
-    matching_users = non_participants.filter(
-        username__icontains=request.GET['term'])
-    json = simplejson.dumps([user.username for user in matching_users])
+    participants = set(project.participants().values_list('user_id',
+        flat=True))
+    matching_users = autocomplete.usernames.search(request.GET['term'],
+        exclude=participants)
+    json = simplejson.dumps(matching_users)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -754,12 +684,11 @@ def matching_non_next_steps(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    non_next_steps = Project.objects.exclude(
-        slug=slug).exclude(
-        id__in=project.next_projects.values('id'))
-    matching_steps = non_next_steps.filter(deleted=False,
-        slug__icontains=request.GET['term'])
-    json = simplejson.dumps([step.slug for step in matching_steps])
+    next_steps = set(project.next_projects.values_list('id', flat=True))
+    next_steps.add(project.id)
+    matching_steps = autocomplete.projects.search(request.GET['term'],
+        exclude=next_steps)
+    json = simplejson.dumps(matching_steps)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -0,0 +1,118 @@
+"""
+Cached follow graph of each user.
+
+The ids of the users and projects a user follows and the ids of the users
+following them are kept in the cache as tuples of integers, so membership
+checks and counts do not touch the database. The cached entries are
+dropped when a relationship is saved or deleted (see the signals in
+relationships.models) or when a followed project or user changes, and
+loaded again from the database when needed. Model instances are only
+loaded when they are displayed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from relationships.models import Relationship
+
+
+CACHE_KEY = 'relationships_follow_graph_%s'
+
+
+class FollowGraph(object):
+    """Follow relationships of one user."""
+
+    def __init__(self, profile_id, following_user_ids=(),
+            following_project_ids=(), follower_ids=()):
+        self.profile_id = profile_id
+        # In the order the relationships were created.
+        self.following_user_ids = tuple(following_user_ids)
+        self.following_project_ids = tuple(following_project_ids)
+        self.follower_ids = tuple(follower_ids)
+        self._following_users = frozenset(self.following_user_ids)
+        self._following_projects = frozenset(self.following_project_ids)
+        self._followers = frozenset(self.follower_ids)
+
+    def is_following_user(self, user_id):
+        return user_id in self._following_users
+
+    def is_following_project(self, project_id):
+        return project_id in self._following_projects
+
+    def is_followed_by(self, user_id):
+        return user_id in self._followers
+
+    def following_users_count(self):
+        return len(self.following_user_ids)
+
+    def following_projects_count(self):
+        return len(self.following_project_ids)
+
+    def followers_count(self):
+        return len(self.follower_ids)
+
+    def get_mutual_ids(self):
+        """Ids of the users this user follows that follow them back."""
+        return self._following_users & self._followers
+
+    def get_common_following_ids(self, other):
+        """Ids of the users followed by this user and by ``other``."""
+        return self._following_users & other._following_users
+
+    def get_common_project_ids(self, other):
+        """Ids of the projects followed by this user and by ``other``."""
+        return self._following_projects & other._following_projects
+
+
+def get_timeout():
+    return getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def load_graph_data(profile_id):
+    following = Relationship.objects.filter(source=profile_id,
+        deleted=False).exclude(target_user__deleted=True).exclude(
+        target_project__archived=True).order_by('id').values_list(
+        'target_user_id', 'target_project_id')
+    followers = Relationship.objects.filter(target_user=profile_id,
+        deleted=False, source__deleted=False).order_by('id').values_list(
+        'source_id', flat=True)
+    following = list(following)
+    return (
+        tuple(user_id for user_id, project_id in following if user_id),
+        tuple(project_id for user_id, project_id in following
+            if project_id),
+        tuple(followers),
+    )
+
+
+def get_follow_graph(profile_id):
+    """Return the FollowGraph of the user with id ``profile_id``."""
+    key = CACHE_KEY % profile_id
+    data = cache.get(key)
+    if data is None:
+        data = load_graph_data(profile_id)
+        cache.set(key, data, get_timeout())
+    return FollowGraph(profile_id, *data)
+
+
+def hydrate(queryset, ids):
+    """The objects of ``queryset`` with the given ids, in the same order."""
+    if not ids:
+        return []
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def invalidate(profile_ids):
+    cache.delete_many([CACHE_KEY % profile_id for profile_id in profile_ids])
+
+
+def update_relationship(relationship):
+    """
+    Drop the cached graphs changed by ``relationship``. They are not patched
+    in place: concurrent read-modify-writes of the same entry would lose
+    changes.
+    """
+    profile_ids = [relationship.source_id]
+    if relationship.target_user_id:
+        profile_ids.append(relationship.target_user_id)
+    invalidate(profile_ids)
@@ -3,7 +3,7 @@ import logging
 
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.sites.models import Site
 from django.contrib.contenttypes.models import ContentType
@@ -112,3 +112,15 @@ def follow_handler(sender, **kwargs):
 
 post_save.connect(follow_handler, sender=Relationship,
     dispatch_uid='relationships_follow_handler')
+
+
+def update_follow_graph(sender, **kwargs):
+    from relationships.graph import update_relationship
+    rel = kwargs.get('instance', None)
+    if isinstance(rel, Relationship):
+        update_relationship(rel)
+
+post_save.connect(update_follow_graph, sender=Relationship,
+    dispatch_uid='relationships_follow_graph_saved')
+post_delete.connect(update_follow_graph, sender=Relationship,
+    dispatch_uid='relationships_follow_graph_deleted')
@@ -6,6 +6,7 @@ from test_utils import TestCase
 
 from activity.models import Activity
 from activity.schema import verbs
+from relationships import graph
 from relationships.models import Relationship
 from users.models import UserProfile, create_profile
 from projects.models import Project
@@ -123,3 +124,57 @@ class RelationshipsTests(TestCase):
         self.assertEqual(self.user_one, activity.actor)
         self.assertEqual(self.user_two, activity.target_object.target_user)
         self.assertEqual(verbs['follow'], activity.verb)
+
+    def test_follow_graph(self):
+        """Test the cached follow graph is updated with the relationships."""
+        graph = self.user_one.get_follow_graph()
+        self.assertEqual(0, graph.following_users_count())
+        relationship = Relationship(source=self.user_one,
+            target_user=self.user_two)
+        relationship.save()
+        Relationship(source=self.user_two, target_user=self.user_one).save()
+        graph = self.user_one.get_follow_graph()
+        self.assertTrue(graph.is_following_user(self.user_two.id))
+        self.assertTrue(graph.is_followed_by(self.user_two.id))
+        self.assertEqual(set([self.user_two.id]), graph.get_mutual_ids())
+        self.assertTrue(self.user_one.is_following(self.user_two.user))
+        relationship.deleted = True
+        relationship.save()
+        graph = self.user_one.get_follow_graph()
+        self.assertFalse(graph.is_following_user(self.user_two.id))
+        self.assertEqual(1, graph.followers_count())
+        self.assertEqual(0, self.user_two.get_follow_graph().followers_count())
+
+    def test_follow_graph_concurrent_updates(self):
+        """Test two follows saved at the same time are both kept."""
+        third = create_profile(User(username='test_three',
+            email='test_three@mozillafoundation.org'))
+        third.save()
+        self.user_two.get_follow_graph()
+        key = graph.CACHE_KEY % self.user_two.id
+        cache = graph.cache
+        second = Relationship(source=third, target_user=self.user_two)
+
+        class InterleavedCache(object):
+            """Save the second follow when the first one uses the graph."""
+            def __getattr__(self, name):
+                method = getattr(cache, name)
+
+                def call(keys, *args, **kwargs):
+                    value = method(keys, *args, **kwargs)
+                    if isinstance(keys, basestring):
+                        keys = [keys]
+                    if key in keys and second.id is None:
+                        second.save()
+                    return value
+                return call
+
+        graph.cache = InterleavedCache()
+        try:
+            Relationship(source=self.user_one,
+                target_user=self.user_two).save()
+            self.assertTrue(second.id is not None)
+        finally:
+            graph.cache = cache
+        self.assertEqual(set([self.user_one.id, third.id]),
+            set(self.user_two.get_follow_graph().follower_ids))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from drumbeat.utils import bulk_insert
+from replies.models import PageComment, DailyCommentCount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily comment counts of every page.'
+
+    @transaction.commit_on_success
+    def handle(self, *args, **options):
+        counts = {}
+        comments = PageComment.objects.filter(deleted=False,
+            page_id__isnull=False).values_list('page_content_type',
+            'page_id', 'created_on')
+        for content_type_id, page_id, created_on in comments.iterator():
+            key = (content_type_id, page_id, created_on.date())
+            counts[key] = counts.get(key, 0) + 1
+        DailyCommentCount.objects.all().delete()
+        bulk_insert([DailyCommentCount(page_content_type_id=content_type_id,
+            page_id=page_id, day=day, count=count)
+            for (content_type_id, page_id, day), count in counts.items()])
+        self.stdout.write('Stored the comment counts of %d days.\n' % len(
+            counts))
@@ -1,8 +1,9 @@
 import datetime
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.contrib.sites.models import Site
@@ -13,7 +14,8 @@ from tracker import statsd
 from notifications.models import send_notifications
 from l10n.urlresolvers import reverse
 
-from richtext.models import RichTextField
+from richtext.models import RichTextField, JSONField
+from richtext.embeds import track_embeds
 
 class PageComment(ModelBase):
     """Placeholder model for comments."""
@@ -49,6 +51,9 @@ class PageComment(ModelBase):
     # indicate that a comment was sent via email
     sent_by_email = models.BooleanField(default=False, blank=True)
 
+    # Embed html of the urls in the content, see richtext.embeds.
+    embeds = JSONField(null=True, blank=True, editable=False)
+
     def __unicode__(self):
         return _('comment at %s') % self.page_object
 
@@ -106,6 +111,56 @@ class PageComment(ModelBase):
         )
 
 
+class DailyCommentCountManager(models.Manager):
+
+    def add(self, page_content_type_id, page_id, day, delta):
+        """Add ``delta`` to the comments count of a page on ``day``."""
+        counts = self.filter(page_content_type=page_content_type_id,
+            page_id=page_id, day=day)
+        if counts.update(count=F('count') + delta) or delta < 0:
+            return
+        sid = transaction.savepoint()
+        try:
+            self.create(page_content_type_id=page_content_type_id,
+                page_id=page_id, day=day, count=delta)
+        except IntegrityError:
+            # Created by a concurrent comment.
+            transaction.savepoint_rollback(sid)
+            counts.update(count=F('count') + delta)
+        else:
+            transaction.savepoint_commit(sid)
+
+    def get_counts(self, page_content_type, page_ids, since):
+        """
+        Return a dict with the ``(day, count)`` pairs of each page in
+        ``page_ids`` since the date ``since``.
+        """
+        counts = {}
+        rows = self.filter(page_content_type=page_content_type,
+            page_id__in=page_ids, day__gte=since, count__gt=0).values_list(
+            'page_id', 'day', 'count')
+        for page_id, day, count in rows:
+            counts.setdefault(page_id, []).append((day, count))
+        return counts
+
+
+class DailyCommentCount(models.Model):
+    """
+    Number of visible comments posted on each day to a page (a task, a
+    signup answer, ...), kept up to date by the PageComment signals. Not
+    cached by cache-machine since the counters are updated in place.
+    """
+    page_content_type = models.ForeignKey(ContentType)
+    page_id = models.PositiveIntegerField()
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = DailyCommentCountManager()
+
+    class Meta:
+        unique_together = ('page_content_type', 'page_id', 'day')
+
+
 ###########
 # Signals #
 ###########
@@ -126,5 +181,36 @@ def fire_activity(sender, **kwargs):
                 target_object=instance, scope_object=instance.scope_object)
             activity.save()
 
+
+def store_deleted_state(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, PageComment) and instance.id:
+        deleted = PageComment.objects.filter(id=instance.id).values_list(
+            'deleted', flat=True)
+        instance._was_deleted = deleted[0] if deleted else None
+
+
+def update_daily_count(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    created = kwargs.get('created', False)
+    if not isinstance(instance, PageComment) or not instance.page_id:
+        return
+    if created:
+        delta = 0 if instance.deleted else 1
+    else:
+        was_deleted = getattr(instance, '_was_deleted', None)
+        if was_deleted is None or was_deleted == instance.deleted:
+            return
+        delta = -1 if instance.deleted else 1
+    if delta:
+        DailyCommentCount.objects.add(instance.page_content_type_id,
+            instance.page_id, instance.created_on.date(), delta)
+
+
 post_save.connect(fire_activity, sender=PageComment,
     dispatch_uid='replies_pagecomment_fire_activity')
+pre_save.connect(store_deleted_state, sender=PageComment,
+    dispatch_uid='replies_pagecomment_store_deleted_state')
+post_save.connect(update_daily_count, sender=PageComment,
+    dispatch_uid='replies_pagecomment_update_daily_count')
+track_embeds(PageComment)
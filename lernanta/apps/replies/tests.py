@@ -140,3 +140,19 @@ class RepliesViewsTests(TestCase):
 
         response = self.client.post('/{0}/comments/{1}/email_reply/'.format(self.locale, comment.id), data)
         self.assertEqual(response.status_code, 403)
+
+    def test_recent_activity(self):
+        for i in range(3):
+            comment = PageComment()
+            comment.page_object = self.page
+            comment.scope_object = self.project
+            comment.author = self.user
+            comment.content = "comment %d" % i
+            comment.save()
+        self.assertEqual(self.page.recent_activity()[0], 3)
+        comment.deleted = True
+        comment.save()
+        self.assertEqual(self.page.recent_activity()[0], 2)
+        comment.deleted = False
+        comment.save()
+        self.assertEqual(self.page.recent_activity()[0], 3)
@@ -0,0 +1,238 @@
+"""
+Resolution of the [youtube:...], [embed:...], ... tags of rich text.
+
+Rendering never touches the network: the html of the embedded urls is
+looked up in EmbeddedUrl (or taken from the ``embeds`` stored with pages
+and comments when they are saved) and urls not resolved yet are rendered
+as links while the richtext.tasks.ResolveEmbeds task asks the oEmbed
+provider for them.
+"""
+import re
+import hashlib
+import datetime
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.validators import URLValidator
+from django.core.exceptions import ValidationError
+from django.db.models import get_model
+from django.db.models.signals import pre_save, post_save
+from django.template.loader import render_to_string
+from django.utils.importlib import import_module
+
+from richtext.models import EmbeddedUrl
+
+
+EMBED_RE = re.compile(r"\[(?P<kind>slideshare|youtube|embed|externaltask):"
+    r"(?P<url>[^\]]+)]")
+
+# Only the format of the urls is validated, without requesting them.
+url_validate = URLValidator()
+
+PENDING_CACHE_KEY = 'richtext_embed_pending_%s'
+PENDING_TIMEOUT = 60 * 5
+
+
+def is_valid_url(url):
+    try:
+        url_validate(url)
+    except ValidationError:
+        return False
+    return True
+
+
+def is_p2pu_url(url):
+    for prefix in getattr(settings, 'P2PU_EMBEDS', ()):
+        if url.startswith(prefix):
+            return True
+    return False
+
+
+def get_embed_urls(html):
+    """The urls of ``html`` that are embedded using the oEmbed provider."""
+    urls = []
+    for match in EMBED_RE.finditer(html or ''):
+        url = match.group('url')
+        if match.group('kind') == 'externaltask' or url in urls:
+            continue
+        if is_valid_url(url) and not is_p2pu_url(url):
+            urls.append(url)
+    return urls
+
+
+def render_embeds(html, embeds):
+    """
+    Replace the embed tags of ``html``, using the embed html of the urls
+    in the ``embeds`` dict. Urls which are not in ``embeds`` are rendered
+    as links.
+    """
+    def replace(match):
+        url = match.group('url')
+        kind = match.group('kind')
+        external_task = (kind == 'externaltask')
+        if not is_valid_url(url):
+            return '[%s:Invalid Url]' % kind
+        if is_p2pu_url(url):
+            return render_to_string('richtext/_p2pu_embed.html',
+                {'url': url})
+        if not external_task and embeds.get(url):
+            return embeds[url]
+        context = {'url': url, 'external_task': external_task}
+        return render_to_string('richtext/_external_link.html', context)
+    return EMBED_RE.sub(replace, html)
+
+
+def lookup_embeds(urls):
+    """Return a dict with the known embed html of ``urls`` (one query)."""
+    if not urls:
+        return {}
+    embedded_urls = EmbeddedUrl.objects.filter(
+        original_url__in=urls).exclude(html='').order_by(
+        'created_on').values_list('original_url', 'html')
+    # The latest resolution of each url wins.
+    return dict(embedded_urls)
+
+
+def queue_embeds(urls, instance=None):
+    """
+    Ask the worker to resolve ``urls`` and, if given, to update the stored
+    embeds of ``instance`` afterwards. Urls queued recently without an
+    instance are skipped.
+    """
+    from richtext.tasks import ResolveEmbeds
+    if instance is None:
+        urls = [url for url in urls if cache.add(PENDING_CACHE_KEY %
+            hashlib.md5(url.encode('utf-8')).hexdigest(), 1, PENDING_TIMEOUT)]
+        args = (urls,)
+    else:
+        args = (urls, instance._meta.app_label,
+            instance._meta.object_name, instance.pk)
+    if urls:
+        ResolveEmbeds.apply_async(args=args)
+
+
+def embedly_provider():
+    """The default oEmbed provider, None when no key is configured."""
+    embedly_key = getattr(settings, 'EMBEDLY_KEY', False)
+    if embedly_key:
+        from embedly import Embedly
+        return Embedly(embedly_key)
+    return None
+
+
+def get_provider():
+    """
+    Return the oEmbed client, an object with an ``oembed(url, maxwidth)``
+    method, created by the callable in the EMBED_PROVIDER setting.
+    """
+    path = getattr(settings, 'EMBED_PROVIDER',
+        'richtext.embeds.embedly_provider')
+    module, name = path.rsplit('.', 1)
+    return getattr(import_module(module), name)()
+
+
+def fetch_embeds(urls):
+    """
+    Resolve ``urls`` with the oEmbed provider, in parallel, and store the
+    results in EmbeddedUrl. Return the dict of resolved embed html.
+    """
+    provider = get_provider()
+    if provider is None or not urls:
+        return {}
+
+    def oembed(url):
+        try:
+            return provider.oembed(url, maxwidth=460)
+        except Exception:
+            return None
+
+    threads = min(len(urls), getattr(settings, 'EMBED_FETCH_THREADS', 8))
+    pool = ThreadPool(threads)
+    try:
+        results = pool.map(oembed, urls)
+    finally:
+        pool.close()
+    embeds = {}
+    for url, obj in zip(urls, results):
+        if obj is None:
+            continue
+        html = getattr(obj, 'html', None) or ''
+        # Stored under the requested url, which is the one looked up.
+        extra_data = getattr(obj, 'dict', None) or {'url': url}
+        EmbeddedUrl(original_url=url, html=html,
+            extra_data=extra_data).save()
+        embeds[url] = html
+    return embeds
+
+
+def refresh_expired_embeds():
+    """Resolve again the urls resolved before EMBEDLY_CACHE_EXPIRES."""
+    expires = getattr(settings, 'EMBEDLY_CACHE_EXPIRES',
+        datetime.timedelta(weeks=4))
+    expiration_date = datetime.datetime.now() - expires
+    fresh = EmbeddedUrl.objects.filter(
+        created_on__gte=expiration_date).values_list('original_url',
+        flat=True)
+    urls = list(EmbeddedUrl.objects.filter(
+        created_on__lt=expiration_date).exclude(
+        original_url__in=fresh).values_list(
+        'original_url', flat=True).distinct())
+    refreshed = fetch_embeds(urls)
+    EmbeddedUrl.objects.filter(original_url__in=refreshed.keys(),
+        created_on__lt=expiration_date).delete()
+    return refreshed
+
+
+def refresh_instance_embeds(app_label, model_name, pk, field='content'):
+    """Store the currently known embeds of the instance."""
+    model = get_model(app_label, model_name)
+    try:
+        instance = model.objects.get(pk=pk)
+    except model.DoesNotExist:
+        return
+    embeds = lookup_embeds(get_embed_urls(getattr(instance, field)))
+    # update() skips the save signals (activities, notifications, ...).
+    model.objects.filter(pk=pk).update(embeds=embeds)
+    if hasattr(model.objects, 'invalidate'):
+        model.objects.invalidate(instance)
+
+
+###########
+# Signals #
+###########
+
+
+def resolve_instance_embeds(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    field = EMBED_FIELDS.get(sender, None)
+    if instance is None or field is None:
+        return
+    urls = get_embed_urls(getattr(instance, field))
+    embeds = lookup_embeds(urls)
+    instance.embeds = embeds
+    instance._unresolved_embeds = [url for url in urls if url not in embeds]
+
+
+def queue_instance_embeds(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    urls = getattr(instance, '_unresolved_embeds', None)
+    if urls:
+        queue_embeds(urls, instance)
+        instance._unresolved_embeds = None
+
+
+EMBED_FIELDS = {}
+
+
+def track_embeds(model, field='content'):
+    """
+    Store the embed html of the urls in ``field`` in the ``embeds`` field
+    of ``model`` every time an instance is saved.
+    """
+    EMBED_FIELDS[model] = field
+    name = '%s_%s' % (model._meta.app_label, model._meta.object_name.lower())
+    pre_save.connect(resolve_instance_embeds, sender=model,
+        dispatch_uid='richtext_resolve_embeds_%s' % name)
+    post_save.connect(queue_instance_embeds, sender=model,
+        dispatch_uid='richtext_queue_embeds_%s' % name)
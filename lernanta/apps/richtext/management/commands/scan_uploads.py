@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from richtext.uploads import scan_uploads
+
+
+class Command(BaseCommand):
+    help = ('Add the files in the upload directories to the uploads '
+        'catalog and remove the entries of the files deleted.')
+
+    def handle(self, *args, **options):
+        added, removed = scan_uploads()
+        self.stdout.write('Added %d uploads, removed %d.\n' % (added,
+            removed))
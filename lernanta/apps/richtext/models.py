@@ -1,5 +1,7 @@
+import os
 import datetime
 
+from django.conf import settings
 from django.db import models
 from django.utils import simplejson as json
 
@@ -35,7 +37,9 @@ class JSONField(models.TextField):
         "desializes values to and from JSON.")
 
     def to_python(self, value):
-        if not value:
+        # Empty dicts and lists are kept, the embeds of pages and comments
+        # are {} when none of their urls are resolved yet.
+        if value is None or value == '':
             return None
 
         if isinstance(value, basestring):
@@ -56,3 +60,26 @@ class EmbeddedUrl(ModelBase):
     extra_data = JSONField()
     created_on = models.DateTimeField(
         auto_now_add=True, default=datetime.datetime.now)
+
+
+class Upload(ModelBase):
+    """A file uploaded from the rich text editor (see richtext.uploads)."""
+    owner = models.ForeignKey('users.UserProfile', null=True, blank=True,
+        related_name='uploads')
+    # Relative to MEDIA_ROOT.
+    path = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField(default=0)
+    mime_type = models.CharField(max_length=100, blank=True)
+    image = models.BooleanField(default=False)
+    # Not auto_now_add, the scanner sets the modification time of files.
+    created_on = models.DateTimeField(default=datetime.datetime.now,
+        db_index=True)
+
+    def __unicode__(self):
+        return self.path
+
+    def get_filename(self):
+        return os.path.join(settings.MEDIA_ROOT, self.path)
+
+    def get_name(self):
+        return os.path.basename(self.path)
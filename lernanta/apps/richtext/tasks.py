@@ -0,0 +1,37 @@
+from celery.task import Task
+from celery.task.schedules import crontab
+from celery.decorators import periodic_task
+
+from ckeditor.views import create_thumbnail
+
+from richtext.embeds import (fetch_embeds, refresh_instance_embeds,
+    refresh_expired_embeds)
+
+
+class ResolveEmbeds(Task):
+    """
+    Resolve the embed html of ``urls`` and update the stored embeds of the
+    instance given by ``app_label``, ``model_name`` and ``pk``, if any.
+    """
+    name = 'richtext.tasks.ResolveEmbeds'
+
+    def run(self, urls, app_label=None, model_name=None, pk=None, **kwargs):
+        log = self.get_logger(**kwargs)
+        log.debug('resolving %d embedded urls' % len(urls))
+        fetch_embeds(urls)
+        if model_name:
+            refresh_instance_embeds(app_label, model_name, pk)
+
+
+class CreateThumbnail(Task):
+    """Create the thumbnail shown by the file browser of an upload."""
+    name = 'richtext.tasks.CreateThumbnail'
+
+    def run(self, filename, **kwargs):
+        create_thumbnail(filename)
+
+
+@periodic_task(run_every=crontab(hour=4, minute=0),
+    name='richtext.tasks.refresh_embeds')
+def refresh_embeds():
+    refresh_expired_embeds()
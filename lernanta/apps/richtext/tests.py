@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from users.models import create_profile
+from richtext.models import EmbeddedUrl, Upload
+from richtext.embeds import get_embed_urls, render_embeds, fetch_embeds
+from richtext.uploads import (record_upload, get_browsable_uploads,
+    scan_uploads)
+
+from test_utils import TestCase
+
+
+class StubEmbed(object):
+
+    def __init__(self, url):
+        self.html = '<iframe src="%s"></iframe>' % url
+        self.dict = {'url': url}
+
+
+class StubProvider(object):
+
+    def oembed(self, url, maxwidth=None):
+        if 'broken' in url:
+            raise IOError('provider unavailable')
+        return StubEmbed(url)
+
+
+def stub_provider():
+    return StubProvider()
+
+
+class EmbedTests(TestCase):
+
+    def setUp(self):
+        self.old_provider = getattr(settings, 'EMBED_PROVIDER', None)
+        settings.EMBED_PROVIDER = 'richtext.tests.stub_provider'
+
+    def tearDown(self):
+        settings.EMBED_PROVIDER = self.old_provider
+
+    def test_render_embeds(self):
+        html = ('[youtube:http://example.com/v] '
+            '[embed:http://example.com/other] [youtube:not a url]')
+        self.assertEqual(['http://example.com/v', 'http://example.com/other'],
+            get_embed_urls(html))
+        rendered = render_embeds(html,
+            {'http://example.com/v': '<iframe></iframe>'})
+        self.assertTrue(rendered.startswith('<iframe></iframe> '))
+        self.assertTrue('href="http://example.com/other"' in rendered)
+        self.assertTrue('[youtube:Invalid Url]' in rendered)
+
+    def test_fetch_embeds(self):
+        embeds = fetch_embeds(['http://example.com/a',
+            'http://example.com/broken'])
+        self.assertEqual(['http://example.com/a'], embeds.keys())
+        self.assertEqual(1, EmbeddedUrl.objects.filter(
+            original_url='http://example.com/a').count())
+
+
+class UploadTests(TestCase):
+
+    test_username = 'testuser'
+    test_email = 'test@mozillafoundation.org'
+
+    def setUp(self):
+        self.old_settings = (settings.MEDIA_ROOT,
+            settings.CKEDITOR_FILE_UPLOAD_PATH, settings.CKEDITOR_UPLOAD_PATH)
+        settings.MEDIA_ROOT = tempfile.mkdtemp()
+        settings.CKEDITOR_FILE_UPLOAD_PATH = os.path.join(
+            settings.MEDIA_ROOT, 'uploads', 'files')
+        settings.CKEDITOR_UPLOAD_PATH = os.path.join(
+            settings.MEDIA_ROOT, 'uploads', 'images')
+        django_user = User(username=self.test_username,
+            email=self.test_email)
+        self.user = create_profile(django_user)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT)
+        (settings.MEDIA_ROOT, settings.CKEDITOR_FILE_UPLOAD_PATH,
+            settings.CKEDITOR_UPLOAD_PATH) = self.old_settings
+
+    def write_file(self, root, *parts):
+        filename = os.path.join(root, *parts)
+        os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as f:
+            f.write('content')
+        return filename
+
+    def test_uploads_catalog(self):
+        filename = self.write_file(settings.CKEDITOR_FILE_UPLOAD_PATH,
+            self.test_username, '2012', '01', '02', 'notes.pdf')
+        upload = record_upload(filename, self.user)
+        self.assertEqual('application/pdf', upload.mime_type)
+        self.assertEqual(7, upload.size)
+        uploads = get_browsable_uploads(self.user.user)
+        self.assertEqual([upload], list(uploads))
+        self.assertEqual([], list(get_browsable_uploads(self.user.user,
+            'other')))
+        # Files written before the catalog existed and removed files.
+        self.write_file(settings.CKEDITOR_FILE_UPLOAD_PATH,
+            self.test_username, '2011', '05', '06', 'old.txt')
+        self.write_file(settings.CKEDITOR_UPLOAD_PATH,
+            self.test_username, '2011', '05', '06', 'image_thumb.png')
+        os.remove(filename)
+        self.assertEqual((1, 1), scan_uploads())
+        upload = Upload.objects.get()
+        self.assertEqual('old.txt', upload.get_name())
+        self.assertEqual(self.user.id, upload.owner_id)
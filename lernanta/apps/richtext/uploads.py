@@ -0,0 +1,123 @@
+"""
+Catalog of the files uploaded from the rich text editor.
+
+Uploads are recorded in the Upload table when they are written, so the
+file browser lists them with a query instead of walking the upload
+directories. ``scan_uploads`` brings the catalog in line with the files
+on disk (files uploaded before the catalog existed, or removed by hand).
+"""
+import os
+import datetime
+import mimetypes
+
+from django.conf import settings
+from django.db import transaction
+
+from drumbeat.utils import bulk_insert
+from users.models import UserProfile
+
+from richtext.models import Upload
+
+
+CHUNK_SIZE = 500
+
+
+def get_relative_path(filename):
+    return os.path.relpath(filename, settings.MEDIA_ROOT)
+
+
+def is_thumbnail(filename):
+    # Created by ckeditor for the images browser.
+    return os.path.splitext(filename)[0].endswith('_thumb')
+
+
+def record_upload(filename, owner=None, image=False):
+    """Add the file just written at ``filename`` to the catalog."""
+    values = {
+        'owner': owner,
+        'size': os.path.getsize(filename),
+        'mime_type': mimetypes.guess_type(filename)[0] or '',
+        'image': image,
+    }
+    upload, created = Upload.objects.get_or_create(
+        path=get_relative_path(filename), defaults=values)
+    if not created:
+        # A file removed by hand, still in the catalog.
+        for name, value in values.items():
+            setattr(upload, name, value)
+        upload.created_on = datetime.datetime.now()
+        upload.save()
+    return upload
+
+
+def get_browsable_uploads(user, query=None):
+    """
+    The uploaded files (not images) ``user`` can attach, newest first.
+    With CKEDITOR_RESTRICT_BY_USER, only superusers see every upload.
+    """
+    uploads = Upload.objects.filter(image=False)
+    restrict_by_user = getattr(settings, 'CKEDITOR_RESTRICT_BY_USER', False)
+    if restrict_by_user and not user.is_superuser:
+        if user.is_authenticated():
+            uploads = uploads.filter(owner=user.get_profile())
+        else:
+            uploads = uploads.filter(owner__isnull=True)
+    if query:
+        uploads = uploads.filter(path__icontains=query)
+    return uploads.select_related('owner').order_by('-created_on', '-id')
+
+
+def get_owner_username(filename, root):
+    # Uploads are stored in <root>/[<username>/]<year>/<month>/<day>/.
+    parts = os.path.relpath(filename, root).split(os.sep)
+    return parts[0] if len(parts) > 4 else None
+
+
+@transaction.commit_on_success
+def scan_uploads():
+    """
+    Add the files missing from the catalog and remove the entries of
+    deleted files. Return the number of entries added and removed.
+    """
+    roots = (
+        (settings.CKEDITOR_FILE_UPLOAD_PATH, False),
+        (settings.CKEDITOR_UPLOAD_PATH, True),
+    )
+    found = {}
+    for root, image in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                filename = os.path.join(dirpath, filename)
+                if image and is_thumbnail(filename):
+                    continue
+                found[get_relative_path(filename)] = (filename, root, image)
+    known = set(Upload.objects.values_list('path', flat=True))
+    removed = [path for path in known if path not in found]
+    for i in xrange(0, len(removed), CHUNK_SIZE):
+        Upload.objects.filter(path__in=removed[i:i + CHUNK_SIZE]).delete()
+    added = [path for path in found if path not in known]
+    usernames = set()
+    for path in added:
+        filename, root, image = found[path]
+        usernames.add(get_owner_username(filename, root))
+    usernames.discard(None)
+    usernames = list(usernames)
+    owners = {}
+    for i in xrange(0, len(usernames), CHUNK_SIZE):
+        owners.update(UserProfile.objects.filter(
+            username__in=usernames[i:i + CHUNK_SIZE]).values_list(
+            'username', 'id'))
+    uploads = []
+    for path in added:
+        filename, root, image = found[path]
+        stat = os.stat(filename)
+        uploads.append(Upload(path=path,
+            owner_id=owners.get(get_owner_username(filename, root), None),
+            size=stat.st_size, image=image,
+            mime_type=mimetypes.guess_type(filename)[0] or '',
+            created_on=datetime.datetime.fromtimestamp(stat.st_mtime)))
+        if len(uploads) == CHUNK_SIZE:
+            bulk_insert(uploads)
+            uploads = []
+    bulk_insert(uploads)
+    return len(added), len(removed)
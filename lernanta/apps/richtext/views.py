@@ -8,9 +8,13 @@ from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.utils.translation import ugettext as _
 
-from ckeditor.views import get_available_name, get_media_url, create_thumbnail
+from ckeditor.views import get_available_name, get_media_url
+
+from pagination.views import get_pagination_context
 
 from richtext.forms import FileBrowser
+from richtext.tasks import CreateThumbnail
+from richtext.uploads import record_upload, get_browsable_uploads
 
 
 @csrf_exempt
@@ -19,33 +23,13 @@ def upload_image(request):
     return upload_file(request, image_upload=True)
 
 
-def get_file_browse_urls(user=None):
-    """
-    Recursively walks all dirs under file upload dir and generates a list of
-    relative paths and full file URL's for each file found.
-    """
-    files = []
-
-    # If a user is provided and CKEDITOR_RESTRICT_BY_USER is True,
-    # limit images to user specific path, but not for superusers.
-    restrict_by_user = getattr(settings, 'CKEDITOR_RESTRICT_BY_USER', False)
-    if user and not user.is_superuser and restrict_by_user:
-        user_path = user.username
-    else:
-        user_path = ''
-
-    browse_path = os.path.join(settings.CKEDITOR_FILE_UPLOAD_PATH, user_path)
-
-    for root, dirs, filenames in os.walk(browse_path):
-        for filename in [os.path.join(root, x) for x in filenames]:
-            files.append((get_media_url(filename),
-                filename[len(browse_path):]))
-
-    return files
-
-
 def browse_file(request):
-    files = get_file_browse_urls(request.user)
+    query = request.GET.get('q', '').strip()
+    uploads = get_browsable_uploads(request.user, query)
+    context = get_pagination_context(request, uploads,
+        getattr(settings, 'CKEDITOR_BROWSE_ITEMS_PER_PAGE', 50))
+    files = [(get_media_url(upload.get_filename()), upload.get_name())
+        for upload in context['pagination_current_page'].object_list]
     if request.method == 'POST':
         form = FileBrowser(files, request.POST)
         if form.is_valid():
@@ -61,11 +45,16 @@ def browse_file(request):
     else:
         form = FileBrowser(files,
             initial=dict(CKEditorFuncNum=request.GET['CKEditorFuncNum']))
-    context = RequestContext(request, {
+    context.update({
         'files': files,
         'form': form,
+        'query': query,
+        'request': request,
+        'page_url': request.path,
+        'prefix': '',
     })
-    return render_to_response('richtext/browse.html', context)
+    return render_to_response('richtext/browse.html', context,
+        context_instance=RequestContext(request))
 
 
 def get_upload_filename(upload_name, user, image_upload=False):
@@ -117,8 +106,14 @@ def upload_file(request, image_upload=False):
             out.write(chunk)
         out.close()
 
+        if request.user.is_authenticated():
+            owner = request.user.get_profile()
+        else:
+            owner = None
+        record_upload(upload_filename, owner, image_upload)
+
         if image_upload:
-            create_thumbnail(upload_filename)
+            CreateThumbnail.apply_async(args=(upload_filename,))
 
         # Respond with Javascript sending ckeditor upload url.
         url = get_media_url(upload_filename)
@@ -1,16 +1,20 @@
 import logging
+import datetime
 
 from django.db import models
 from django.template.defaultfilters import slugify
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.conf import settings
 
 from drumbeat.models import ModelBase
 from drumbeat.utils import get_partition_id, safe_filename
+from drumbeat.utils import save_with_unique_slug
 from drumbeat import storage
 from richtext.models import RichTextField
 from users.models import UserProfile
 from badges.models import Badge
+from projects.models import Participation
 
 
 log = logging.getLogger(__name__)
@@ -79,17 +83,11 @@ class School(ModelBase):
 
     def save(self):
         """Make sure each school has a unique slug."""
-        count = 1
         if not self.slug:
-            slug = slugify(self.name)
-            self.slug = slug
-            while True:
-                existing = School.objects.filter(slug=self.slug)
-                if len(existing) == 0:
-                    break
-                self.slug = "%s-%s" % (slug, count + 1)
-                count += 1
-        super(School, self).save()
+            save_with_unique_slug(self, slugify(self.name),
+                super(School, self).save)
+        else:
+            super(School, self).save()
 
 
 def projectsets_determine_image_upload_path(instance, filename):
@@ -112,10 +110,23 @@ class ProjectSet(ModelBase):
     featured = models.BooleanField(default=False)
     image = models.ImageField(upload_to=projectsets_determine_image_upload_path,
         null=True, storage=storage.ImageStorage(), blank=True)
+    # Statistics shown in the set cards, see update_stats.
+    participants_count = models.PositiveIntegerField(default=0)
+    adopters_count = models.PositiveIntegerField(default=0)
+    badges_count = models.PositiveIntegerField(default=0)
+    stats_updated_on = models.DateTimeField(blank=True, null=True)
 
     def __unicode__(self):
         return self.name
 
+    def save(self):
+        """Make sure each project set has a unique slug."""
+        if not self.slug:
+            save_with_unique_slug(self, slugify(self.name),
+                super(ProjectSet, self).save)
+        else:
+            super(ProjectSet, self).save()
+
     @models.permalink
     def get_absolute_url(self):
         return ('school_projectset', (), {
@@ -145,19 +156,46 @@ class ProjectSet(ModelBase):
                                     deleted=False,
                                     participations__left_on__isnull=True).distinct()
 
-    def total_participants(self):
+    # The counts are aggregates: cache-machine caches count() even on
+    # no_cache() querysets, and an empty cached count is never invalidated.
+
+    def count_participants(self):
         return self._distinct_participants().filter(
             participations__adopter = False,
-            participations__organizing = False).count()
+            participations__organizing = False).aggregate(
+            total=Count('id', distinct=True))['total']
         
-    def total_adopters(self):
+    def count_adopters(self):
         return self._distinct_participants().filter(
             Q(participations__adopter=True)
-            | Q(participations__organizing=True)).count()
+            | Q(participations__organizing=True)).aggregate(
+            total=Count('id', distinct=True))['total']
 
-    def total_badges(self):
+    def count_badges(self):
         return Badge.objects.filter(
-            groups__projectsets=self).distinct().count()
+            groups__projectsets=self).aggregate(
+            total=Count('id', distinct=True))['total']
+
+    def total_participants(self):
+        return self.participants_count
+
+    def total_adopters(self):
+        return self.adopters_count
+
+    def total_badges(self):
+        return self.badges_count
+
+    def update_stats(self):
+        """Recompute the statistics, saving them if they changed."""
+        stats = (self.count_participants(), self.count_adopters(),
+            self.count_badges())
+        if self.stats_updated_on and stats == (self.participants_count,
+                self.adopters_count, self.badges_count):
+            return
+        self.participants_count, self.adopters_count, self.badges_count = (
+            stats)
+        self.stats_updated_on = datetime.datetime.now()
+        self.save()
 
 
 class ProjectSetIndex(ModelBase):
@@ -165,3 +203,61 @@ class ProjectSetIndex(ModelBase):
     projectset = models.ForeignKey('schools.ProjectSet')
     project = models.ForeignKey('projects.Project')
     index = models.IntegerField()
+
+
+###########
+# Signals #
+###########
+
+
+def update_projectsets_stats(project_ids):
+    from schools.tasks import UpdateProjectSetStats
+    projectset_ids = list(ProjectSetIndex.objects.filter(
+        project__in=project_ids).values_list(
+        'projectset_id', flat=True).distinct())
+    if projectset_ids:
+        UpdateProjectSetStats.apply_async(args=(projectset_ids,))
+
+
+def participation_changed(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, Participation):
+        update_projectsets_stats([instance.project_id])
+
+
+def projectset_membership_changed(sender, **kwargs):
+    from schools.tasks import UpdateProjectSetStats
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, ProjectSetIndex):
+        UpdateProjectSetStats.apply_async(args=([instance.projectset_id],))
+
+
+def badge_groups_changed(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    action = kwargs.get('action', None)
+    if kwargs.get('reverse', False):
+        # The badges of a project changed.
+        project_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # Remember the projects that are about to lose the badge.
+        instance._cleared_group_ids = list(instance.groups.values_list(
+            'id', flat=True))
+        return
+    elif action == 'post_clear':
+        project_ids = getattr(instance, '_cleared_group_ids', [])
+    else:
+        project_ids = kwargs.get('pk_set', None) or []
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        update_projectsets_stats(project_ids)
+
+
+post_save.connect(participation_changed, sender=Participation,
+    dispatch_uid='schools_participation_saved')
+post_delete.connect(participation_changed, sender=Participation,
+    dispatch_uid='schools_participation_deleted')
+post_save.connect(projectset_membership_changed, sender=ProjectSetIndex,
+    dispatch_uid='schools_projectsetindex_saved')
+post_delete.connect(projectset_membership_changed, sender=ProjectSetIndex,
+    dispatch_uid='schools_projectsetindex_deleted')
+m2m_changed.connect(badge_groups_changed, sender=Badge.groups.through,
+    dispatch_uid='schools_badge_groups_changed')
@@ -0,0 +1,24 @@
+from celery.task import Task
+from celery.task.schedules import crontab
+from celery.decorators import periodic_task
+
+from schools.models import ProjectSet
+
+
+class UpdateProjectSetStats(Task):
+    """Recompute the statistics of the given project sets."""
+    name = 'schools.tasks.UpdateProjectSetStats'
+
+    def run(self, projectset_ids, **kwargs):
+        log = self.get_logger(**kwargs)
+        for projectset in ProjectSet.objects.filter(id__in=projectset_ids):
+            log.debug('updating the statistics of %s' % projectset.slug)
+            projectset.update_stats()
+
+
+@periodic_task(run_every=crontab(hour=3, minute=30),
+    name='schools.tasks.update_all_projectset_stats')
+def update_all_projectset_stats():
+    # Reconcile the changes not caught by the signals (deleted users, ...).
+    for projectset in ProjectSet.objects.all():
+        projectset.update_stats()
@@ -2,7 +2,8 @@ from django.test import Client
 from django.contrib.auth.models import User
 
 from users.models import create_profile
-from schools.models import School
+from projects.models import Project, Participation
+from schools.models import School, ProjectSet, ProjectSetIndex
 
 from test_utils import TestCase
 
@@ -37,4 +38,24 @@ class SchoolTests(TestCase):
             School.objects.get(slug='the-great-school-of-test'),
             school
         )
-        
+
+    def test_projectset_stats(self):
+        projectset = ProjectSet(name='Test set', short_description='Set',
+            description='<p>Set of projects</p>')
+        projectset.save()
+        project = Project(name='Test Project',
+            short_description='This is a test project.',
+            long_description='This is a test project.')
+        project.save()
+        ProjectSetIndex(projectset=projectset, project=project,
+            index=0).save()
+        projectset.update_stats()
+        self.assertEqual(0, projectset.total_adopters())
+        Participation(project=project, user=self.user,
+            organizing=True).save()
+        projectset.update_stats()
+        projectset = ProjectSet.objects.get(id=projectset.id)
+        self.assertEqual(0, projectset.total_participants())
+        self.assertEqual(1, projectset.total_adopters())
+        self.assertEqual(0, projectset.total_badges())
+        self.assertTrue(projectset.stats_updated_on is not None)
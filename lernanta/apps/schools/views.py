@@ -9,9 +9,8 @@ from django.contrib.contenttypes.models import ContentType
 from commonware.decorators import xframe_sameorigin
 
 from users.decorators import login_required
-from drumbeat import messages
+from drumbeat import messages, autocomplete
 from projects.models import Project, Participation
-from users.models import UserProfile
 from l10n.urlresolvers import reverse
 from content.models import Page
 from replies.models import PageComment
@@ -312,11 +311,10 @@ def matching_non_organizers(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    non_organizers = UserProfile.objects.filter(deleted=False).exclude(
-        id__in=school.organizers.values('user_id'))
-    matching_users = non_organizers.filter(
-        username__icontains=request.GET['term'])
-    json = simplejson.dumps([user.username for user in matching_users])
+    organizers = set(school.organizers.values_list('id', flat=True))
+    matching_users = autocomplete.usernames.search(request.GET['term'],
+        exclude=organizers)
+    json = simplejson.dumps(matching_users)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -355,11 +353,12 @@ def matching_non_featured(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    school_projects = Project.objects.filter(school=school)
-    non_featured = school_projects.exclude(id__in=school.featured.values('id'))
-    matching_projects = non_featured.filter(
-        slug__icontains=request.GET['term'])
-    json = simplejson.dumps([project.slug for project in matching_projects])
+    school_projects = set(Project.objects.filter(
+        school=school).values_list('id', flat=True))
+    featured = set(school.featured.values_list('id', flat=True))
+    matching_projects = autocomplete.projects.search(request.GET['term'],
+        include=school_projects - featured)
+    json = simplejson.dumps(matching_projects)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -412,10 +411,10 @@ def matching_non_member(request, slug):
     if len(request.GET['term']) == 0:
         raise http.Http404
 
-    matching_projects = Project.objects.filter(deleted=False,
-        slug__icontains=request.GET['term']).exclude(
-        id__in=school.projects.all().values('id'))
-    json = simplejson.dumps([project.slug for project in matching_projects])
+    members = set(school.projects.values_list('id', flat=True))
+    matching_projects = autocomplete.projects.search(request.GET['term'],
+        exclude=members)
+    json = simplejson.dumps(matching_projects)
 
     return http.HttpResponse(json, mimetype="application/json")
 
@@ -0,0 +1,365 @@
+import math
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Q
+from django.contrib.contenttypes.models import ContentType
+from django.utils.html import strip_tags
+from django.utils.text import truncate_words
+
+from search.models import SearchDocument, SearchPosting
+from search.utils import tokenize
+
+from projects.models import Project
+from content.models import Page
+from replies.models import PageComment
+from schools.models import School
+from users.models import UserProfile
+
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+SNIPPET_WORDS = 30
+
+
+class SearchIndex(object):
+    """Describes how the instances of a model are fed into the index."""
+    model = None
+    # Name used to restrict searches to this kind of object.
+    kind = None
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def get_language(self, obj):
+        return settings.LANGUAGE_CODE
+
+    def get_fields(self, obj):
+        """Return a list of (text, weight) pairs to index."""
+        return []
+
+    def get_project(self, obj):
+        return None
+
+    def is_visible(self, obj):
+        return True
+
+    def get_snippet(self, obj):
+        return u''
+
+
+class ProjectIndex(SearchIndex):
+    model = Project
+    kind = 'projects'
+
+    def get_language(self, obj):
+        return obj.language
+
+    def get_fields(self, obj):
+        return [(obj.name, 3), (obj.short_description, 2),
+            (obj.long_description, 1)]
+
+    def get_project(self, obj):
+        return obj
+
+    def is_visible(self, obj):
+        return not obj.test
+
+    def get_snippet(self, obj):
+        return obj.short_description
+
+
+class PageIndex(SearchIndex):
+    model = Page
+    kind = 'tasks'
+
+    def get_queryset(self):
+        return Page.objects.select_related('project')
+
+    def get_language(self, obj):
+        return obj.project.language
+
+    def get_fields(self, obj):
+        return [(obj.title, 3), (obj.sub_header, 2), (obj.content, 1)]
+
+    def get_project(self, obj):
+        return obj.project
+
+    def is_visible(self, obj):
+        return obj.listed and not obj.deleted
+
+    def get_snippet(self, obj):
+        return obj.sub_header or obj.content
+
+
+class UserProfileIndex(SearchIndex):
+    model = UserProfile
+    kind = 'people'
+
+    def get_language(self, obj):
+        return obj.preflang
+
+    def get_fields(self, obj):
+        return [(obj.username, 3), (obj.full_name, 3), (obj.location, 1),
+            (obj.bio, 1)]
+
+    def is_visible(self, obj):
+        return not obj.deleted
+
+    def get_snippet(self, obj):
+        return obj.bio
+
+
+class SchoolIndex(SearchIndex):
+    model = School
+    kind = 'schools'
+
+    def get_fields(self, obj):
+        return [(obj.name, 3), (obj.short_name, 3), (obj.description, 1)]
+
+    def get_snippet(self, obj):
+        return obj.description
+
+
+class PageCommentIndex(SearchIndex):
+    model = PageComment
+    kind = 'comments'
+
+    def get_project(self, obj):
+        if isinstance(obj.scope_object, Project):
+            return obj.scope_object
+        return None
+
+    def get_language(self, obj):
+        project = self.get_project(obj)
+        if project:
+            return project.language
+        return obj.author.preflang
+
+    def get_fields(self, obj):
+        return [(obj.content, 1)]
+
+    def is_visible(self, obj):
+        # Only comments posted inside a project are public.
+        return not obj.deleted and self.get_project(obj) is not None
+
+    def get_snippet(self, obj):
+        return obj.content
+
+
+INDEXES = {}
+
+
+def register_index(search_index):
+    INDEXES[search_index.model] = search_index
+
+
+def get_indexed_models():
+    return INDEXES.keys()
+
+
+def get_index(model):
+    return INDEXES.get(model, None)
+
+
+def get_kinds():
+    return sorted(search_index.kind for search_index in INDEXES.values())
+
+
+for search_index in (ProjectIndex(), PageIndex(), UserProfileIndex(),
+        SchoolIndex(), PageCommentIndex()):
+    register_index(search_index)
+
+
+def analyze(search_index, obj):
+    """Return the weighted term frequencies of ``obj``."""
+    language = search_index.get_language(obj)
+    frequencies = {}
+    for text, weight in search_index.get_fields(obj):
+        for term in tokenize(text, language):
+            frequencies[term] = frequencies.get(term, 0) + weight
+    return frequencies
+
+
+def index_object(obj):
+    """
+    Add ``obj`` to the index or refresh its postings. Only the postings of
+    the terms whose frequency changed are rewritten. Runs inside the
+    transaction of the caller, if any.
+    """
+    search_index = get_index(obj.__class__)
+    if not search_index:
+        return None
+    frequencies = analyze(search_index, obj)
+    project = search_index.get_project(obj)
+    ct = ContentType.objects.get_for_model(obj)
+    document, created = SearchDocument.objects.get_or_create(
+        content_type=ct, object_id=obj.pk)
+    values = {
+        'language': search_index.get_language(obj) or '',
+        'length': sum(frequencies.values()),
+        'visible': search_index.is_visible(obj),
+        'project_id': project.id if project else None,
+    }
+    old_frequencies = {}
+    if not created:
+        old_frequencies = dict(SearchPosting.objects.filter(
+            document=document).values_list('term', 'frequency'))
+    if created or frequencies != old_frequencies or [name
+            for name, value in values.items()
+            if getattr(document, name) != value]:
+        for name, value in values.items():
+            setattr(document, name, value)
+        document.indexed_on = datetime.datetime.now()
+        document.save()
+    changed = [term for term, frequency in old_frequencies.iteritems()
+        if frequencies.get(term) != frequency]
+    if changed:
+        SearchPosting.objects.filter(document=document,
+            term__in=changed).delete()
+    new_postings = [(term, document.id, frequency)
+        for term, frequency in frequencies.iteritems()
+        if old_frequencies.get(term) != frequency]
+    if new_postings:
+        # Django 1.3 has no bulk insert so issue a single executemany.
+        cursor = connection.cursor()
+        cursor.executemany('INSERT INTO %s (term, document_id, frequency) '
+            'VALUES (%%s, %%s, %%s)' % SearchPosting._meta.db_table,
+            new_postings)
+        transaction.commit_unless_managed()
+    return document
+
+
+def unindex_object(obj):
+    ct = ContentType.objects.get_for_model(obj)
+    documents = SearchDocument.objects.filter(content_type=ct,
+        object_id=obj.pk)
+    SearchPosting.objects.filter(document__in=documents).delete()
+    documents.delete()
+
+
+def rebuild_index(models=None):
+    """Index again every object of ``models`` (all indexed models by
+    default). Returns the number of indexed objects."""
+    count = 0
+    for model in (models or get_indexed_models()):
+        search_index = get_index(model)
+        for obj in search_index.get_queryset().iterator():
+            index_object(obj)
+            count += 1
+        # Drop documents of objects removed without signals (raw SQL,
+        # queryset deletes, ...).
+        stale = SearchDocument.objects.filter(
+            content_type=ContentType.objects.get_for_model(model)).exclude(
+            object_id__in=model.objects.values('id'))
+        SearchPosting.objects.filter(document__in=stale).delete()
+        stale.delete()
+    return count
+
+
+def visible_documents(kinds=None):
+    documents = SearchDocument.objects.filter(visible=True).filter(
+        Q(project__isnull=True) | Q(project__deleted=False,
+            project__not_listed=False))
+    if kinds:
+        content_types = [ContentType.objects.get_for_model(search_index.model)
+            for search_index in INDEXES.values()
+            if search_index.kind in kinds]
+        documents = documents.filter(content_type__in=content_types)
+    return documents
+
+
+def rank(terms, documents):
+    """
+    Score ``documents`` matching any of ``terms`` with BM25. Returns a list
+    of (score, content_type_id, object_id) sorted by decreasing score.
+    """
+    stats = documents.aggregate(count=Count('id'),
+        avg_length=Avg('length'))
+    total = stats['count']
+    avg_length = float(stats['avg_length'] or 1)
+    postings = SearchPosting.objects.filter(term__in=terms,
+        document__in=documents.values('id')).values_list('term',
+        'frequency', 'document_id', 'document__length',
+        'document__content_type', 'document__object_id')
+    document_frequency = {}
+    matches = {}
+    for term, frequency, document_id, length, ct_id, object_id in postings:
+        document_frequency[term] = document_frequency.get(term, 0) + 1
+        match = matches.setdefault(document_id, (length, ct_id, object_id, []))
+        match[3].append((term, frequency))
+    idf = {}
+    for term, df in document_frequency.iteritems():
+        idf[term] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+    results = []
+    for length, content_type_id, object_id, frequencies in matches.values():
+        norm = K1 * (1 - B + B * length / avg_length)
+        score = 0.0
+        for term, frequency in frequencies:
+            score += idf[term] * frequency * (K1 + 1) / (frequency + norm)
+        results.append((score, content_type_id, object_id))
+    results.sort(key=lambda result: (-result[0], result[1], result[2]))
+    return results
+
+
+class SearchHit(object):
+
+    def __init__(self, obj, score, search_index):
+        self.object = obj
+        self.score = score
+        self.kind = search_index.kind
+        snippet = strip_tags(search_index.get_snippet(obj) or u'')
+        self.snippet = truncate_words(snippet, SNIPPET_WORDS)
+
+
+class SearchResults(object):
+    """
+    Ranked search results. Behaves like a sequence so it can be given to
+    the paginator; objects are only loaded for the requested slice.
+    """
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+
+    def count(self):
+        return len(self.ranking)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.hydrate(self.ranking[item])
+        return self.hydrate([self.ranking[item]])[0]
+
+    def hydrate(self, ranking):
+        ids_by_type = {}
+        for score, content_type_id, object_id in ranking:
+            ids_by_type.setdefault(content_type_id, []).append(object_id)
+        objects = {}
+        for content_type_id, ids in ids_by_type.iteritems():
+            model = ContentType.objects.get_for_id(
+                content_type_id).model_class()
+            for pk, obj in model.objects.in_bulk(ids).iteritems():
+                objects[(content_type_id, pk)] = obj
+        hits = []
+        for score, content_type_id, object_id in ranking:
+            obj = objects.get((content_type_id, object_id), None)
+            if obj is not None:
+                hits.append(SearchHit(obj, score,
+                    get_index(obj.__class__)))
+        return hits
+
+
+def search(query, language=None, kinds=None):
+    """
+    Run ``query`` against the visible documents, optionally restricted to
+    some ``kinds`` of objects (see ``get_kinds``).
+    """
+    terms = list(set(tokenize(query, language)))
+    if not terms:
+        return SearchResults([])
+    return SearchResults(rank(terms, visible_documents(kinds)))
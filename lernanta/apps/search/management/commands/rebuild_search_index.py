@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import get_model
+
+from search import indexes
+
+
+class Command(BaseCommand):
+    args = '[app_label.ModelName ...]'
+    help = ('Rebuild the search index for the given models '
+        '(all indexed models by default).')
+
+    def handle(self, *args, **options):
+        models = []
+        for name in args:
+            try:
+                app_label, model_name = name.split('.')
+            except ValueError:
+                raise CommandError('Use the app_label.ModelName format.')
+            model = get_model(app_label, model_name)
+            if not indexes.get_index(model):
+                raise CommandError('%s is not indexed.' % name)
+            models.append(model)
+        count = indexes.rebuild_index(models)
+        self.stdout.write('Indexed %d objects.\n' % count)
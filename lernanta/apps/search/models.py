@@ -0,0 +1,75 @@
+import datetime
+
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes import generic
+
+from search.utils import MAX_TERM_LENGTH
+
+
+class SearchDocument(models.Model):
+    """
+    An indexed object. Documents are not cached by cache-machine since they
+    are rewritten every time the indexed object changes.
+    """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = generic.GenericForeignKey('content_type', 'object_id')
+    language = models.CharField(max_length=16, blank=True)
+    # Sum of the weighted term frequencies, used for BM25 length
+    # normalization.
+    length = models.PositiveIntegerField(default=0)
+    # Visibility of the object itself. Objects living inside a project are
+    # also hidden when the project is deleted or not listed.
+    visible = models.BooleanField(default=True)
+    project = models.ForeignKey('projects.Project', null=True, blank=True,
+        related_name='search_documents')
+    indexed_on = models.DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        unique_together = (('content_type', 'object_id'),)
+
+    def __unicode__(self):
+        return u'%s %s' % (self.content_type, self.object_id)
+
+
+class SearchPosting(models.Model):
+    """Frequency of a term inside a document."""
+    term = models.CharField(max_length=MAX_TERM_LENGTH, db_index=True)
+    document = models.ForeignKey('search.SearchDocument',
+        related_name='postings')
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = (('term', 'document'),)
+
+
+###########
+# Signals #
+###########
+
+
+# The handlers receive the signals of every model and import the indexes
+# on first use: search.indexes imports the indexed models, which can't be
+# done while the models are loaded.
+
+
+def update_search_index(sender, **kwargs):
+    from search import indexes
+    instance = kwargs.get('instance', None)
+    if instance is not None and indexes.get_index(sender):
+        indexes.index_object(instance)
+
+
+def remove_from_search_index(sender, **kwargs):
+    from search import indexes
+    instance = kwargs.get('instance', None)
+    if instance is not None and indexes.get_index(sender):
+        indexes.unindex_object(instance)
+
+
+post_save.connect(update_search_index,
+    dispatch_uid='search_update_search_index')
+post_delete.connect(remove_from_search_index,
+    dispatch_uid='search_remove_from_search_index')
@@ -0,0 +1,90 @@
+from django.test import Client
+from django.contrib.auth.models import User
+
+from users.models import create_profile
+from projects.models import Project
+from content.models import Page
+
+from search import indexes
+from search.models import SearchPosting
+from search.utils import tokenize
+
+from test_utils import TestCase
+
+
+class SearchTests(TestCase):
+
+    test_username = 'testuser'
+    test_email = 'test@mozillafoundation.org'
+    test_password = 'testpass'
+
+    def setUp(self):
+        self.client = Client()
+        self.locale = 'en'
+        django_user = User(
+            username=self.test_username,
+            email=self.test_email,
+        )
+        self.user = create_profile(django_user)
+        self.user.set_password(self.test_password)
+        self.user.save()
+        self.project = Project(name='Open Knitting',
+            short_description='Learn to knit in the open',
+            long_description='Needles, yarn and patterns.',
+        )
+        self.project.save()
+        self.page = Page(author=self.user, project=self.project,
+            title='Casting on', content='Your first row of stitches.')
+        self.page.save()
+
+    def test_tokenize(self):
+        self.assertEqual([u'cafe', u'ole'],
+            tokenize(u'<p>The Caf\xe9 &amp; the ol\xe9</p>', 'en'))
+        self.assertEqual([u'el', u'cafe'], tokenize(u'El caf\xe9', 'en'))
+        self.assertEqual([u'cafe'], tokenize(u'El caf\xe9', 'es'))
+        self.assertEqual([u'\u5b66', u'\u4e60', u'\u5b66\u4e60'],
+            tokenize(u'\u5b66\u4e60', 'zh-cn'))
+
+    def test_signals_index_objects(self):
+        hits = indexes.search('stitches')[:10]
+        self.assertEqual([self.page], [hit.object for hit in hits])
+        hits = indexes.search('knitting')[:10]
+        self.assertEqual(self.project, hits[0].object)
+
+    def test_ranking(self):
+        other = Page(author=self.user, project=self.project,
+            title='Knitting knitting knitting', content='Knitting.')
+        other.save()
+        hits = indexes.search('knitting', kinds=['tasks'])[:10]
+        self.assertEqual([other], [hit.object for hit in hits])
+
+    def test_visibility(self):
+        self.page.deleted = True
+        self.page.save()
+        self.assertEqual(0, len(indexes.search('stitches')))
+        self.page.deleted = False
+        self.page.save()
+        self.project.not_listed = True
+        self.project.save()
+        self.assertEqual(0, len(indexes.search('stitches')))
+
+    def test_incremental_index(self):
+        postings = lambda: dict(SearchPosting.objects.filter(
+            document__object_id=self.page.id,
+            document__content_type__model='page').values_list('term', 'id'))
+        before = postings()
+        self.page.save()
+        # The postings of unchanged terms are kept.
+        self.assertEqual(before, postings())
+        self.page.content = 'Your first row of purls.'
+        self.page.save()
+        after = postings()
+        self.assertTrue('purls' in after)
+        self.assertFalse('stitches' in after)
+        self.assertEqual(before['row'], after['row'])
+
+    def test_search_view(self):
+        response = self.client.get('/%s/search/' % self.locale,
+            {'q': 'casting'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.page.get_absolute_url())
@@ -0,0 +1,76 @@
+import re
+import unicodedata
+
+from django.utils.encoding import force_unicode
+from django.utils.html import strip_tags
+
+
+# Longest term stored in the index (see SearchPosting.term).
+MAX_TERM_LENGTH = 64
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# CJK Unified Ideographs, Hiragana, Katakana and Hangul syllables. Text in
+# these scripts is not separated by spaces so it gets split into unigrams
+# and bigrams instead of words.
+CJK_RE = re.compile(u'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff'
+    u'\uac00-\ud7af\uf900-\ufaff]+', re.UNICODE)
+
+ENTITY_RE = re.compile(r'&#?\w+;')
+
+STOPWORDS = {
+    'en': frozenset(u"""a an and are as at be but by for from has have i in
+        into is it its of on or our that the their this to was we were will
+        with you your""".split()),
+    'es': frozenset(u"""a al como con de del el en es esta este la las lo
+        los mas o para por que se su sus un una y""".split()),
+    'nl': frozenset(u"""aan als bij de dat die een en het in is je met niet
+        of op te van voor wat ze zijn""".split()),
+    'sv': frozenset(u"""att av de den det en ett for har i med och om pa
+        som till var vi""".split()),
+}
+
+
+def get_stopwords(language):
+    """Return the stop words for a language code like 'es' or 'zh-cn'."""
+    if not language:
+        return frozenset()
+    return STOPWORDS.get(language.lower().split('-', 1)[0], frozenset())
+
+
+def strip_accents(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return u''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def split_cjk(run):
+    """Split a run of CJK characters into unigrams and bigrams."""
+    terms = list(run)
+    terms.extend(run[i:i + 2] for i in xrange(len(run) - 1))
+    return terms
+
+
+def tokenize(text, language=None):
+    """
+    Split ``text`` into a list of normalized index terms. Markup is
+    removed, words are lowercased and stripped of accents and the stop
+    words of ``language`` are dropped.
+    """
+    if not text:
+        return []
+    text = ENTITY_RE.sub(' ', strip_tags(force_unicode(text)))
+    stopwords = get_stopwords(language)
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        cjk_runs = CJK_RE.findall(word)
+        if cjk_runs:
+            for run in cjk_runs:
+                terms.extend(split_cjk(run))
+            word = CJK_RE.sub(u'', word)
+            if not word:
+                continue
+        word = strip_accents(word)
+        if word in stopwords or word.isdigit() and len(word) < 2:
+            continue
+        terms.append(word[:MAX_TERM_LENGTH])
+    return terms
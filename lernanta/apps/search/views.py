@@ -1,7 +1,26 @@
 from django.shortcuts import render_to_response
 from django.template import RequestContext
+from django.utils.translation import get_language
+
+from l10n.urlresolvers import reverse
+from pagination.views import get_pagination_context
+
+from search import indexes
 
 
 def search(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind', '')
+    kinds = [kind] if kind in indexes.get_kinds() else None
+    context = {
+        'query': query,
+        'kind': kind,
+        'kinds': indexes.get_kinds(),
+        'search_url': reverse('search'),
+    }
+    if query:
+        results = indexes.search(query, language=get_language(), kinds=kinds)
+        context['results_count'] = len(results)
+        context.update(get_pagination_context(request, results))
     return render_to_response('search/search.html',
-        {}, context_instance=RequestContext(request))
+        context, context_instance=RequestContext(request))
@@ -1,16 +1,17 @@
 from django.utils.http import urlquote
 from django.contrib.auth import REDIRECT_FIELD_NAME
 
-from messages.models import Message
 from l10n.urlresolvers import reverse
+from drumbeatmail.models import get_inbox_summary
 
 
 def messages(request):
     if request.user.is_authenticated():
-        messages = Message.objects.select_related('sender').filter(
-            recipient=request.user,
-            recipient_deleted_at__isnull=True)[:3]
-        return {'preview_messages': messages}
+        summary = get_inbox_summary(request.user)
+        return {
+            'preview_messages': summary['latest'],
+            'messages_inbox_count': summary['unread_count'],
+        }
     else:
         return {}
 
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from relationships.models import Relationship
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Recompute the follower and following counts of every user and '
+        'the popular users list.')
+
+    def handle(self, *args, **options):
+        relationships = Relationship.objects.filter(deleted=False)
+        followers = dict(relationships.filter(source__deleted=False,
+            target_user__isnull=False).values_list('target_user').annotate(
+            Count('id')).order_by())
+        following = dict(relationships.filter(
+            target_user__deleted=False).values_list('source').annotate(
+            Count('id')).order_by())
+        profiles = UserProfile.objects.values_list('id', 'followers_count',
+            'following_count')
+        updated = []
+        for profile_id, followers_count, following_count in profiles:
+            if (followers.get(profile_id, 0), following.get(profile_id, 0)) != (
+                    followers_count, following_count):
+                updated.append(profile_id)
+        UserProfile.objects.update_follow_counts(updated)
+        UserProfile.objects.refresh_popular()
+        self.stdout.write('Updated the counts of %d users.\n' % len(updated))
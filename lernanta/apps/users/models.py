@@ -7,22 +7,26 @@ import os
 
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.encoding import smart_str
 from django.utils.http import urlquote_plus
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext
 from django.utils.safestring import mark_safe
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.core.cache import cache
+from django.utils.datastructures import SortedDict
 
 from taggit.models import GenericTaggedItemBase, Tag
 from south.modelsinspector import add_ignored_fields
 
 from drumbeat import storage
-from drumbeat.utils import get_partition_id, safe_filename
+from drumbeat.utils import get_partition_id, safe_filename, bulk_insert
 from drumbeat.models import ModelBase
 from relationships.models import Relationship
+from relationships.graph import get_follow_graph, hydrate
+from relationships.graph import invalidate as invalidate_follow_graphs
 from projects.models import Project, Participation
 from notifications.models import send_notifications
 from activity.schema import object_types
@@ -40,6 +44,17 @@ add_ignored_fields(["^users\.managers"])
 GRAVATAR_TEMPLATE = ("https://secure.gravatar.com/avatar/%(gravatar_hash)s"
                      "?s=%(size)s&amp;d=%(default)s&amp;r=%(rating)s")
 
+CURRENT_PROJECTS_CACHE_KEY = 'users_current_projects_%s'
+
+# (name, condition, params) of the participations that give a role.
+PARTICIPATION_ROLES = (
+    ('is_organizing', 'pp.organizing = %s', (True,)),
+    ('is_adopting', 'pp.adopter = %s', (True,)),
+    ('is_participating', 'pp.organizing = %s', (False,)),
+    ('is_learning', 'pp.organizing = %s AND pp.adopter = %s',
+        (False, False)),
+)
+
 
 def determine_upload_path(instance, filename):
     chunk_size = 1000  # max files per directory
@@ -81,12 +96,39 @@ class TaggedProfile(GenericTaggedItemBase):
 
 class UserProfileManager(caching.base.CachingManager):
 
-    def get_popular(self, limit=0):
-        users = Relationship.objects.values('target_user_id').annotate(
-            models.Count('id')).filter(target_user__featured=False,
-            target_user__deleted=False).order_by('-id__count')[:limit]
-        user_ids = [u['target_user_id'] for u in users]
-        return UserProfile.objects.filter(id__in=user_ids)
+    def get_popular(self, limit=None):
+        """The most followed users, as last computed by refresh_popular."""
+        popular = PopularUser.objects.filter(user__featured=False,
+            user__deleted=False).select_related('user')
+        if limit:
+            popular = popular[:limit]
+        return [p.user for p in popular]
+
+    @transaction.commit_on_success
+    def refresh_popular(self, limit=None):
+        """Store the ``limit`` most followed users in PopularUser."""
+        if limit is None:
+            limit = getattr(settings, 'POPULAR_USERS_COUNT', 100)
+        profile_ids = self.filter(deleted=False, featured=False,
+            followers_count__gt=0).order_by('-followers_count',
+            'id').values_list('id', flat=True)[:limit]
+        PopularUser.objects.all().delete()
+        bulk_insert([PopularUser(user_id=profile_id, rank=rank)
+            for rank, profile_id in enumerate(profile_ids, 1)])
+
+    def update_follow_counts(self, profile_ids):
+        """Recompute the follower and following counts of the profiles."""
+        for profile_id in set(profile_ids):
+            followers = Relationship.objects.filter(target_user=profile_id,
+                deleted=False, source__deleted=False).aggregate(
+                count=models.Count('id'))['count']
+            following = Relationship.objects.filter(source=profile_id,
+                deleted=False, target_user__deleted=False).aggregate(
+                count=models.Count('id'))['count']
+            self.filter(id=profile_id).update(followers_count=followers,
+                following_count=following)
+            # update() does not flush the cached queries.
+            self.invalidate(self.model(id=profile_id))
 
 
 class UserProfile(ModelBase):
@@ -115,6 +157,9 @@ class UserProfile(ModelBase):
         default=settings.LANGUAGE_CODE)
     deleted = models.BooleanField(default=False)
     last_active = models.DateTimeField(null=True, blank=True)
+    # Maintained by the relationships signals, see update_follow_counts.
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
 
     user = models.ForeignKey(User, null=True, editable=False, blank=True)
 
@@ -127,63 +172,113 @@ class UserProfile(ModelBase):
             return ugettext('Anonym')
         return self.full_name or self.username
 
+    def get_follow_graph(self):
+        """Return the cached FollowGraph of this user."""
+        return get_follow_graph(self.id)
+
     def following(self, model=None):
         """
         Return a list of objects this user is following. All objects returned
         will be ```Project``` or ```UserProfile``` instances. Optionally filter
         by type by including a ```model``` parameter.
         """
+        graph = self.get_follow_graph()
         if (model == 'Project' or isinstance(model, Project) or
             model == Project):
-            relationships = Relationship.objects.select_related(
-                'target_project').filter(source=self, deleted=False).exclude(
-                target_project__isnull=True)
-            return [rel.target_project for rel in relationships
-                    if not rel.target_project.archived]
-        relationships = Relationship.objects.select_related(
-            'target_user').filter(source=self,
-            target_user__deleted=False, deleted=False).exclude(
-            target_user__isnull=True)
-        return [rel.target_user for rel in relationships]
+            return hydrate(Project.objects.filter(archived=False),
+                graph.following_project_ids)
+        return hydrate(UserProfile.objects.filter(deleted=False),
+            graph.following_user_ids)
 
     def followers(self):
         """Return a list of this users followers."""
-        relationships = Relationship.objects.select_related(
-            'source').filter(target_user=self, source__deleted=False,
-            deleted=False)
-        return [rel.source for rel in relationships]
+        return hydrate(UserProfile.objects.filter(deleted=False),
+            self.get_follow_graph().follower_ids)
 
     def is_following(self, model):
-        """Determine whether this user is following ```model```."""
-        return model in self.following(model=model)
+        """
+        Determine whether this user is following ```model```, a project or
+        a user (either the profile or the django user, which share ids).
+        """
+        graph = self.get_follow_graph()
+        if isinstance(model, Project):
+            return graph.is_following_project(model.id)
+        return graph.is_following_user(model.id)
+
+    def get_followed_projects(self):
+        """
+        Return the (non archived) projects this user is following with the
+        role of the user in each of them: 'organizing' (or adopted for
+        challenges), 'participating', 'following' or None for challenges
+        which are only followed. Roles are computed in the same query.
+        """
+        relationships = Relationship.objects.select_related(
+            'target_project').filter(source=self, deleted=False,
+            target_project__archived=False).exclude(
+            target_project__isnull=True)
+        subquery = ('EXISTS (SELECT 1 FROM %s pp WHERE pp.project_id = '
+            '%s.target_project_id AND pp.user_id = %%s AND '
+            'pp.left_on IS NULL AND ') % (Participation._meta.db_table,
+            Relationship._meta.db_table)
+        select = SortedDict()
+        select_params = []
+        for name, condition, params in PARTICIPATION_ROLES:
+            select[name] = subquery + condition + ')'
+            select_params.extend((self.id,) + params)
+        # The roles are not invalidated by cache-machine.
+        relationships = relationships.extra(select=select,
+            select_params=select_params).no_cache()
+        projects = []
+        for rel in relationships:
+            project = rel.target_project
+            if project.category == Project.CHALLENGE:
+                if self.deleted:
+                    # Deleted users only follow, and followed challenges
+                    # are not listed.
+                    role = None
+                elif rel.is_organizing or rel.is_adopting:
+                    role = 'organizing'
+                elif rel.is_learning:
+                    role = 'participating'
+                else:
+                    role = None
+            elif self.deleted:
+                role = 'following'
+            elif rel.is_organizing:
+                role = 'organizing'
+            elif rel.is_participating:
+                role = 'participating'
+            else:
+                role = 'following'
+            projects.append((project, role))
+        return projects
 
     def get_current_projects(self, only_public=False):
-        projects = self.following(model=Project)
+        timeout = getattr(settings, 'CURRENT_PROJECTS_CACHE_TIMEOUT', 0)
+        key = CURRENT_PROJECTS_CACHE_KEY % self.id
+        projects = cache.get(key) if timeout else None
+        if projects is None:
+            projects = self.get_followed_projects()
+            if timeout:
+                cache.set(key, projects, timeout)
         projects_organizing = []
         projects_participating = []
         projects_following = []
-        count = len(projects)
-        for project in projects:
+        count = 0
+        for project, role in projects:
             if only_public and project.not_listed:
-                count -= 1
                 continue
-            is_challenge = (project.category == Project.CHALLENGE)
-            if is_challenge:
-                organizers = project.adopters()
-                participants = project.non_adopter_participants()
-            else:
-                organizers = project.organizers()
-                participants = project.non_organizer_participants()
-            if organizers.filter(user=self).exists():
-                if is_challenge:
+            count += 1
+            if role == 'organizing':
+                if project.category == Project.CHALLENGE:
                     project.relation_text = _('(adopted)')
                 else:
                     project.relation_text = _('(organizing)')
                 projects_organizing.append(project)
-            elif participants.filter(user=self).exists():
+            elif role == 'participating':
                 project.relation_text = _('(participating)')
                 projects_participating.append(project)
-            elif not is_challenge:
+            elif role == 'following':
                 project.relation_text = _('(following)')
                 projects_following.append(project)
         data = {
@@ -195,7 +290,8 @@ class UserProfile(ModelBase):
         return data
 
     def get_past_projects(self, only_public=False):
-        participations = Participation.objects.filter(user=self)
+        participations = Participation.objects.filter(
+            user=self).select_related('project')
         current = participations.filter(project__archived=False,
             left_on__isnull=True)
         participations = participations.exclude(
@@ -271,6 +367,18 @@ class UserProfile(ModelBase):
         return hsh == get_hexdigest(algo, salt, raw_password)
 
 
+class PopularUser(models.Model):
+    """
+    The most followed users which are neither featured nor deleted,
+    refreshed periodically by users.tasks.update_popular_users.
+    """
+    user = models.ForeignKey(UserProfile, related_name='popularity')
+    rank = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        ordering = ('rank',)
+
+
 def create_profile(user, username=None):
     """Make a UserProfile for this django.contrib.auth.models.User."""
     if UserProfile.objects.all().count() == 0:
@@ -294,13 +402,100 @@ def create_profile(user, username=None):
 ###########
 
 
+def invalidate_current_projects(profile_ids):
+    cache.delete_many([CURRENT_PROJECTS_CACHE_KEY % profile_id
+        for profile_id in profile_ids])
+
+
 def post_save_userprofile(sender, **kwargs):
     instance = kwargs.get('instance', None)
     created = kwargs.get('created', False)
     is_profile = isinstance(instance, UserProfile)
     if created and is_profile:
         statsd.Statsd.increment('users')
+    elif is_profile:
+        invalidate_current_projects([instance.id])
+        if instance.deleted:
+            # Deleted users are left out of the graphs and the counts of
+            # others.
+            related_ids = list(Relationship.objects.filter(
+                target_user=instance).values_list('source_id', flat=True))
+            related_ids.extend(Relationship.objects.filter(
+                source=instance, target_user__isnull=False).values_list(
+                'target_user_id', flat=True))
+            invalidate_follow_graphs(related_ids)
+            UserProfile.objects.update_follow_counts(related_ids)
+
+
+def membership_changed(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, Relationship) and instance.target_project_id:
+        invalidate_current_projects([instance.source_id])
+    elif isinstance(instance, Relationship) and instance.target_user_id:
+        UserProfile.objects.update_follow_counts([instance.source_id,
+            instance.target_user_id])
+    elif isinstance(instance, Participation):
+        invalidate_current_projects([instance.user_id])
+
+
+# The fields of Project kept in the caches of its followers.
+PROJECT_CACHED_FIELDS = ('name', 'slug', 'category', 'archived', 'not_listed',
+    'deleted', 'school')
+
+
+def get_project_state(project):
+    return tuple(getattr(project, Project._meta.get_field(name).attname)
+        for name in PROJECT_CACHED_FIELDS)
+
+
+def get_changed_project_followers(project):
+    """
+    Return the ids of the followers of ``project`` if one of the
+    PROJECT_CACHED_FIELDS changed when it was last saved, an empty list
+    otherwise. The followers are listed once per save for all the caches.
+    """
+    follower_ids = getattr(project, '_changed_follower_ids', None)
+    if follower_ids is None:
+        if getattr(project, '_cached_state', None) == get_project_state(
+                project):
+            follower_ids = []
+        else:
+            follower_ids = list(Relationship.objects.filter(
+                target_project=project).values_list('source_id', flat=True))
+        project._changed_follower_ids = follower_ids
+    return follower_ids
+
+
+def store_project_state(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    if isinstance(instance, Project):
+        instance._cached_state = None
+        instance._changed_follower_ids = None
+        if instance.id:
+            state = Project.objects.filter(id=instance.id).values_list(
+                *PROJECT_CACHED_FIELDS)
+            instance._cached_state = state[0] if state else None
+
+
+def project_changed(sender, **kwargs):
+    instance = kwargs.get('instance', None)
+    created = kwargs.get('created', False)
+    if isinstance(instance, Project) and not created:
+        follower_ids = get_changed_project_followers(instance)
+        invalidate_current_projects(follower_ids)
+        # Archived projects are left out of the graphs.
+        invalidate_follow_graphs(follower_ids)
 
 
 post_save.connect(post_save_userprofile, sender=UserProfile,
     dispatch_uid='users_post_save_userprofile')
+for model in (Relationship, Participation):
+    name = model._meta.object_name.lower()
+    post_save.connect(membership_changed, sender=model,
+        dispatch_uid='users_%s_saved' % name)
+    post_delete.connect(membership_changed, sender=model,
+        dispatch_uid='users_%s_deleted' % name)
+pre_save.connect(store_project_state, sender=Project,
+    dispatch_uid='users_store_project_state')
+post_save.connect(project_changed, sender=Project,
+    dispatch_uid='users_project_changed')
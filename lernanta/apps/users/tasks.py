@@ -1,8 +1,11 @@
 import datetime
 
 from celery.task import Task
+from celery.task.schedules import crontab
+from celery.decorators import periodic_task
 
 from messages.models import Message
+from users.models import UserProfile
 
 class SendPrivateMessages(Task):
     """
@@ -23,3 +26,9 @@ class SendPrivateMessages(Task):
                 parent.replied_at = datetime.datetime.now()
                 parent.save()
             msg.save()
+
+
+@periodic_task(run_every=crontab(minute=15),
+    name='users.tasks.update_popular_users')
+def update_popular_users():
+    UserProfile.objects.refresh_popular()
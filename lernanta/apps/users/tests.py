@@ -5,7 +5,10 @@ from django.contrib.auth.models import User
 
 from l10n.urlresolvers import reverse
 from drumbeat.utils import get_partition_id
-from users.models import create_profile
+from users.models import UserProfile, create_profile
+from users.models import get_changed_project_followers
+from projects.models import Project, Participation
+from relationships.models import Relationship
 
 from test_utils import TestCase
 
@@ -137,3 +140,75 @@ class TestLogins(TestCase):
             'username': 'butterfly',
         })
         self.assertEqual(404, notfound.status_code)
+
+    def test_current_projects(self):
+        organizing = Project(name='Organizing Project',
+            short_description='Organized by the user.',
+            long_description='Organized by the user.')
+        organizing.save()
+        following = Project(name='Following Project',
+            short_description='Followed by the user.',
+            long_description='Followed by the user.')
+        following.save()
+        Participation(project=organizing, user=self.user,
+            organizing=True).save()
+        for project in (organizing, following):
+            Relationship(source=self.user, target_project=project).save()
+        current = self.user.get_current_projects()
+        self.assertEqual([organizing], current['organizing'])
+        self.assertEqual([following], current['following'])
+        self.assertEqual(2, current['count'])
+        Participation(project=following, user=self.user).save()
+        current = self.user.get_current_projects()
+        self.assertEqual([following], current['participating'])
+        following.not_listed = True
+        following.save()
+        current = self.user.get_current_projects(only_public=True)
+        self.assertEqual(1, current['count'])
+
+    def test_project_follower_caches(self):
+        project = Project(name='Followed Project',
+            short_description='Followed by the user.',
+            long_description='Followed by the user.')
+        project.save()
+        Relationship(source=self.user, target_project=project).save()
+        project.long_description = 'Edited.'
+        project.save()
+        self.assertEqual([], get_changed_project_followers(project))
+        project.archived = True
+        project.save()
+        self.assertEqual([self.user.id],
+            get_changed_project_followers(project))
+
+    def test_deleted_user_projects(self):
+        course = Project(name='Course', short_description='Course',
+            long_description='Course')
+        course.save()
+        challenge = Project(name='Challenge', short_description='Challenge',
+            long_description='Challenge', category=Project.CHALLENGE)
+        challenge.save()
+        for project in (course, challenge):
+            Participation(project=project, user=self.user,
+                organizing=True).save()
+            Relationship(source=self.user, target_project=project).save()
+        self.user.deleted = True
+        self.user.save()
+        self.assertEqual([(course, 'following'), (challenge, None)],
+            sorted(self.user.get_followed_projects(),
+            key=lambda (project, role): project.id))
+
+    def test_follow_counts(self):
+        other = create_profile(User(username='otheruser',
+            email='other@mozillafoundation.org'))
+        relationship = Relationship(source=other, target_user=self.user)
+        relationship.save()
+        self.assertEqual(1, UserProfile.objects.get(
+            id=self.user.id).followers_count)
+        self.assertEqual(1, UserProfile.objects.get(
+            id=other.id).following_count)
+        UserProfile.objects.refresh_popular()
+        self.assertEqual([self.user], UserProfile.objects.get_popular(20))
+        relationship.deleted = True
+        relationship.save()
+        self.assertEqual(0, UserProfile.objects.get(
+            id=self.user.id).followers_count)
@@ -345,14 +345,31 @@ def user_list(request):
     }, context_instance=RequestContext(request))
 
 
+USER_LIST_ORDERINGS = {
+    'popular': ('-followers_count', 'id'),
+    'recent': ('-created_on', 'id'),
+}
+
+
 def user_tagged_list(request, tag_slug):
     """Display a list of users that are tagged with the tag and tag type. """
     tag = get_object_or_404(ProfileTag, slug=tag_slug)
-    users = UserProfile.objects.filter(deleted=False, tags__slug=tag_slug)
-    return render_to_response('users/user_list.html', {
+    order = request.GET.get('order', 'popular')
+    if order not in USER_LIST_ORDERINGS:
+        order = 'popular'
+    users = UserProfile.objects.filter(deleted=False,
+        tags__slug=tag_slug).order_by(*USER_LIST_ORDERINGS[order])
+    context = {
         'tagged': users,
         'tag': tag,
-    }, context_instance=RequestContext(request))
+        'order': order,
+        'page_url': request.path,
+        'prefix': 'tagged_',
+    }
+    context.update(get_pagination_context(request, users, 24,
+        prefix='tagged_'))
+    return render_to_response('users/user_list.html', context,
+        context_instance=RequestContext(request))
 
 
 def confirm_registration(request, token, username):
@@ -710,12 +727,10 @@ def check_username(request):
         f.clean(username)
     except ValidationError:
         return http.HttpResponse()
-    try:
-        UserProfile.objects.get(username=username)
+    if UserProfile.objects.filter(username__iexact=username).exists():
+        return http.HttpResponse()
+    if drupal.get_user(username):
         return http.HttpResponse()
-    except UserProfile.DoesNotExist:
-        if drupal.get_user(username):
-            return http.HttpResponse()
     return http.HttpResponse(status=404)
 
 
@@ -58,6 +58,9 @@ USE_L10N = True
 SUPPORTED_NONLOCALES = ('media', 'static', '.well-known', 'pubsub', 'broadcasts',
 'ajax', 'alpha',)
 
+# Number of reversed urls kept by l10n.urlresolvers.reverse.
+REVERSE_CACHE_SIZE = 2000
+
 # Absolute path to the directory that holds media.
 # Example: "/home/media/media.lawrence.com/"
 MEDIA_ROOT = path('media')
@@ -184,7 +187,6 @@ TEMPLATE_CONTEXT_PROCESSORS = (
     'django.core.context_processors.static',
     'django.contrib.messages.context_processors.messages',
     'drumbeat.context_processors.django_conf',
-    'messages.context_processors.inbox',
     'users.context_processors.messages',
     'users.context_processors.redirect_urls',
 )
@@ -210,6 +212,12 @@ AUTHENTICATION_BACKENDS = (
 AUTH_PROFILE_MODULE = 'users.UserProfile'
 
 MAX_IMAGE_SIZE = 1024 * 700
+# Longest side, in pixels, of the resized copies of the uploaded images.
+IMAGE_DERIVATIVE_SIZES = (60, 160, 240)
+# Concurrent downloads and timeout, in seconds, when copying the remote
+# images of imported content.
+REMOTE_IMAGE_FETCH_THREADS = 8
+REMOTE_IMAGE_TIMEOUT = 5
 MAX_UPLOAD_SIZE = 1024 * 1024 * 50
 MAX_PROJECT_FILES = 6
 
@@ -217,6 +225,25 @@ CACHE_BACKEND = 'caching.backends.memcached://localhost:11211'
 CACHE_PREFIX = 'lernanta'
 CACHE_COUNT_TIMEOUT = 60
 
+# In-memory autocomplete indexes are loaded again after this many seconds
+# to pick up changes done by other processes.
+AUTOCOMPLETE_MAX_AGE = 300
+AUTOCOMPLETE_LIMIT = 20
+
+# Seconds the followed projects of a user (and the role of the user in
+# them) are cached. Zero disables the cache.
+CURRENT_PROJECTS_CACHE_TIMEOUT = 60 * 5
+# Seconds the follow graph of a user is kept in the cache.
+FOLLOW_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+# Number of users kept in the popular users table.
+POPULAR_USERS_COUNT = 100
+# Seconds the serialized pages of the messages inbox are cached.
+DRUMBEATMAIL_CACHE_TIMEOUT = 60 * 60
+# Concurrent requests made to the oEmbed provider when resolving embeds.
+EMBED_FETCH_THREADS = 8
+# Page versions stored as a delta of each full snapshot of a page.
+PAGE_VERSION_SNAPSHOT_INTERVAL = 20
+
 # Email goes to the console by default.  s/console/smtp/ for regular delivery
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'admin@p2pu.org'
@@ -237,12 +264,20 @@ SOUTH_TESTS_MIGRATE = False
 FEED_URLS = {
     'splash': 'http://info.p2pu.org/feed/',
 }
+FEED_FETCH_THREADS = 4
+FEED_FETCH_TIMEOUT = 10
+# Minimum number of seconds between two requests to the same host.
+FEED_HOST_DELAY = 1
+# Only the beginning of pages and feeds is read to discover feeds and hubs.
+FEED_DISCOVERY_MAX_BYTES = 64 * 1024
 
 # Ckeditor
 CKEDITOR_MEDIA_PREFIX = "/static/ckeditor/"
 CKEDITOR_UPLOAD_PATH = path("media/uploads/images")
 CKEDITOR_FILE_UPLOAD_PATH = path("media/uploads/files")
 CKEDITOR_RESTRICT_BY_USER = True
+# Files listed in each page of the file browser.
+CKEDITOR_BROWSE_ITEMS_PER_PAGE = 50
 CKEDITOR_IMAGE_UPLOAD_EXTENSIONS = [
     '.jpg', '.jpeg', '.gif', '.png', '.tif', '.tiff'
 ]